@@ -0,0 +1,233 @@
+import time
+
+import numpy as np
+
+from common import *
+from solver import *
+from linear_model import *
+
+# Column generation over the configurations of linear_model.py (configuration_columns = "generated").
+# The columns of all configurations are only kept as a sparse matrix; the solver starts with a few
+# configurations per recipe, planet and qualities. After each LP solve the duals y of the rows price
+# the other columns (reduced cost c_j - y A_j) and the cheapest negative ones of each group are added,
+# until no column with negative reduced cost is left. Integer problems are solved on the columns
+# generated so far without further pricing.
+
+
+def configuration_groups(model: LinearModel):
+    # group id of each recipe column (-1 for all other columns) and the initial columns:
+    # per group the configurations with the highest productivity, the highest quality bonus and
+    # the fewest machines. These reach every balance row any configuration of the group reaches,
+    # so the first restricted problem is feasible if the full one is.
+    recipe_cols = model.recipe_columns()
+    groups = np.full(model.num_cols, -1)
+    active = model.columns["kind"] == COLUMN_INPUT
+    for g, (_, group) in enumerate(group_columns(model.columns[recipe_cols], ["recipe", "planet", "quality", "machine_quality"])):
+        group = recipe_cols[group]
+        groups[group] = g
+        active[group[np.argmax(model.productivity[group])]] = True
+        active[group[np.argmax(model.quality_bonus[group])]] = True
+        active[group[np.argmin(model.machines_per_craft[group])]] = True
+    link = model.columns["link"]
+    active[link[active & (link >= 0)]] = True
+    return groups, link, active
+
+
+class GeneratedProblem(MatrixProblem):
+    # the arrays of MatrixProblem hold the full problem, the solver only sees the restricted one
+    def __init__(self, A, sense, rhs, c, lb, ub, groups, link, active, columns_per_group=10, tolerance=1e-9):
+        super().__init__(A, sense, rhs, c, lb, ub)
+        self.groups = np.asarray(groups)
+        self.link = np.asarray(link)
+        self.columns_per_group = columns_per_group
+        self.tolerance = tolerance
+        self.active = np.flatnonzero(active)
+        self.position = np.full(self.num_cols, -1)
+        self.position[self.active] = np.arange(len(self.active))
+        self.restricted = None
+
+    def set_objective(self, c):
+        super().set_objective(c)
+        if self.restricted is not None:
+            self.restricted.set_objective(self.c[self.active])
+
+    def set_bounds(self, cols, lb, ub):
+        super().set_bounds(cols, lb, ub)
+        if self.restricted is not None:
+            cols = np.asarray(cols)
+            cols = cols[self.position[cols] >= 0]
+            self.restricted.set_bounds(self.position[cols], self.lb[cols], self.ub[cols])
+
+    def set_integer(self, cols, integer=True):
+        super().set_integer(cols, integer)
+        if self.restricted is not None:
+            cols = np.asarray(cols)
+            cols = cols[self.position[cols] >= 0]
+            self.restricted.set_integer(self.position[cols], self.integer[cols])
+
+    def set_start(self, x):
+        super().set_start(x)
+        if self.restricted is not None and self.start is not None:
+            self.restricted.set_start(self.start[self.active])
+
+    def set_rows(self, rows, sense, rhs):
+        super().set_rows(rows, sense, rhs)
+        if self.restricted is not None:
+            self.restricted.set_rows(rows, self.sense[rows], self.rhs[rows])
+
+    def set_coefficients(self, rows, cols, values):
+        super().set_coefficients(rows, cols, values)
+        if self.restricted is not None:
+            rows, cols = np.asarray(rows), np.asarray(cols)
+            values = np.broadcast_to(np.array(values, dtype=float), len(rows))
+            active = self.position[cols] >= 0
+            self.restricted.set_coefficients(rows[active], self.position[cols[active]], values[active])
+
+    def add_rows(self, A, sense, rhs):
+        rows = super().add_rows(A, sense, rhs)
+        if self.restricted is not None:
+            self.restricted.add_rows(self.A[rows][:, self.active], self.sense[rows], self.rhs[rows])
+        return rows
+
+    def add_columns(self, A, c, lb, ub, integer=False):
+        # columns added from outside are never priced, they are part of the restricted problem right away
+        cols = super().add_columns(A, c, lb, ub, integer)
+        self.groups = np.concatenate([self.groups, np.full(len(cols), -1)])
+        self.link = np.concatenate([self.link, np.full(len(cols), -1)])
+        self.position = np.concatenate([self.position, np.full(len(cols), -1)])
+        self.activate(cols)
+        return cols
+
+    def activate(self, cols):
+        self.position[cols] = np.arange(len(self.active), len(self.active) + len(cols))
+        self.active = np.concatenate([self.active, cols])
+        if self.restricted is not None:
+            self.restricted.add_columns(self.A[:, cols], self.c[cols], self.lb[cols], self.ub[cols], self.integer[cols])
+
+    def price(self, duals):
+        # cheapest columns with negative reduced cost of each group, with their machine count columns
+        reduced_cost = self.c - self.A.T @ duals
+        tolerance = self.tolerance * (1 + np.abs(duals).max(initial=0))
+        candidates = np.flatnonzero((self.groups >= 0) & (self.position < 0) & (reduced_cost < -tolerance))
+        groups = self.groups[candidates]
+        order = np.lexsort([reduced_cost[candidates], groups])
+        rank = np.arange(len(order)) - np.searchsorted(groups[order], groups[order])
+        cols = np.sort(candidates[order[rank < self.columns_per_group]])
+        link = self.link[cols]
+        return np.concatenate([cols, link[link >= 0]])
+
+    def check(self):
+        if self.restricted is None:
+            cols = self.active
+            self.restricted = MatrixProblem(self.A[:, cols], self.sense, self.rhs, self.c[cols], self.lb[cols], self.ub[cols])
+            self.restricted.set_integer(np.arange(len(cols)), self.integer[cols])
+            if self.start is not None:
+                self.restricted.set_start(self.start[cols])
+        iterations = 0
+        while True:
+            res = self.restricted.check()
+            if not is_satisfied(res) or self.restricted.duals is None:
+                break
+            cols = self.price(self.restricted.duals)
+            if len(cols) == 0:
+                break
+            iterations += 1
+            self.activate(cols)
+        print(f"Column generation: {len(self.active)} of {self.num_cols} columns after {iterations} pricing rounds")
+
+        self.x = self.duals = self.objective_value = None
+        if is_satisfied(res):
+            self.x = np.zeros(self.num_cols)
+            self.x[self.active] = self.restricted.x
+            self.duals = self.restricted.duals
+            self.objective_value = float(self.c @ self.x)
+        return res
+
+
+# Progressive solve over the quality levels (quality_resolution = "progressive").
+# The columns of level l are those whose recipe and machine quality is at most l. The restricted problem
+# starts with level 0 and gets the columns of the next level after each solve, so every level is warm started
+# from the basis of the previous one. Columns that stayed at zero with a reduced cost above drop_cost get an
+# upper bound of 0. After the last level these are priced with the final duals and the ones with negative
+# reduced cost get their bounds back, until none is left; the result is the optimum of the full problem.
+
+def quality_levels(model: LinearModel):
+    return np.maximum(model.columns["quality"], model.columns["machine_quality"])
+
+
+class ProgressiveProblem(GeneratedProblem):
+    def __init__(self, A, sense, rhs, c, lb, ub, levels, drop_cost=1e-2, warm_start=0.1, tolerance=1e-9):
+        levels = np.asarray(levels)
+        super().__init__(A, sense, rhs, c, lb, ub, np.full(len(levels), -1), np.full(len(levels), -1), levels == levels.min(), tolerance=tolerance)
+        self.levels = levels
+        self.drop_cost = drop_cost
+        self.warm_start = warm_start
+        self.dropped = np.zeros(self.num_cols, dtype=bool)
+        self.walked = False
+
+    def add_columns(self, A, c, lb, ub, integer=False):
+        cols = super().add_columns(A, c, lb, ub, integer)
+        self.levels = np.concatenate([self.levels, np.full(len(cols), self.levels.min())])
+        self.dropped = np.concatenate([self.dropped, np.zeros(len(cols), dtype=bool)])
+        return cols
+
+    def set_bounds(self, cols, lb, ub):
+        # bounds set from outside replace the dropped ones
+        super().set_bounds(cols, lb, ub)
+        self.dropped[cols] = False
+
+    def restore(self, cols):
+        self.dropped[cols] = False
+        self.restricted.set_bounds(self.position[cols], self.lb[cols], self.ub[cols])
+
+    def check(self):
+        if self.restricted is None:
+            cols = self.active
+            self.restricted = MatrixProblem(self.A[:, cols], self.sense, self.rhs, self.c[cols], self.lb[cols], self.ub[cols])
+            self.restricted.set_integer(np.arange(len(cols)), self.integer[cols])
+            if self.start is not None:
+                self.restricted.set_start(self.start[cols])
+        if self.integer.any():
+            # no duals to price the dropped columns with
+            self.restore(np.flatnonzero(self.dropped))
+        # the levels are only walked through once, later solves start from the last one
+        levels = [self.levels.max()] if self.walked else np.unique(self.levels)
+        self.walked = True
+        for level in levels:
+            cols = np.flatnonzero((self.position < 0) & (self.levels <= level))
+            if len(cols) > self.warm_start * len(self.active):
+                # HiGHS skips its presolve on a warm start, a fresh solve is faster once the model grows a lot
+                self.restricted.backend = None
+            if len(cols) > 0:
+                self.activate(cols)
+            t0 = time.time()
+            res = self.restricted.check()
+            print(f"Quality level {level}: {len(self.active) - self.dropped.sum()} of {self.num_cols} columns, {time.time() - t0:.2f} seconds")
+            if level == self.levels.max() or not is_satisfied(res) or self.restricted.duals is None:
+                continue
+            reduced_cost = self.c[self.active] - self.restricted.A.T @ self.restricted.duals
+            drop = self.active[(self.restricted.x <= self.tolerance) & (reduced_cost > self.drop_cost * max(1, abs(self.restricted.objective_value)))]
+            drop = drop[~self.dropped[drop] & (self.ub[drop] > 0)]
+            self.dropped[drop] = True
+            self.restricted.set_bounds(self.position[drop], self.lb[drop], 0)
+
+        # the dropped columns may still be part of the optimum of the full problem
+        rounds = 0
+        while is_satisfied(res) and self.restricted.duals is not None and self.dropped.any():
+            cols = np.flatnonzero(self.dropped)
+            reduced_cost = self.c[cols] - self.A[:, cols].T @ self.restricted.duals
+            cols = cols[reduced_cost < -self.tolerance * (1 + np.abs(self.restricted.duals).max(initial=0))]
+            if len(cols) == 0:
+                break
+            rounds += 1
+            self.restore(cols)
+            res = self.restricted.check()
+        print(f"Progressive solve: {self.dropped.sum()} columns dropped, {rounds} rounds to restore the others")
+
+        self.x = self.duals = self.objective_value = None
+        if is_satisfied(res):
+            self.x = np.zeros(self.num_cols)
+            self.x[self.active] = self.restricted.x
+            self.duals = self.restricted.duals
+            self.objective_value = float(self.c @ self.x)
+        return res
@@ -152,6 +152,7 @@ class Recipe:
     name: str
     crafting_time : float = 1
     productivity : float = 0
+    productivity_research : Optional[str] = None # key of item_productivity the productivity is taken from
     accepts_productivity : bool = True
     accepts_quality : bool = True # whether the recipe can be crafted at different quality levels
     accepts_quality_module : bool = True # whether the recipe can use quality modules
@@ -348,6 +349,7 @@ def define_recipes():
                 inputs={"copper_ore_vein": 1},
                 outputs={"copper_ore": 1},
                 productivity=item_productivity["mining"],
+                productivity_research="mining",
                 crafting_time=1
             ),
             Recipe(
@@ -356,6 +358,7 @@ def define_recipes():
                 inputs={"iron_ore_vein": 1},
                 outputs={"iron_ore": 1},
                 productivity=item_productivity["mining"],
+                productivity_research="mining",
                 crafting_time=1
             ),
             Recipe(
@@ -364,6 +367,7 @@ def define_recipes():
                 inputs={"coal_vein": 1},
                 outputs={"coal": 1},
                 productivity=item_productivity["mining"],
+                productivity_research="mining",
                 crafting_time=1
             ),
             Recipe(
@@ -372,6 +376,7 @@ def define_recipes():
                 inputs={"calcite_vein": 1},
                 outputs={"calcite": 1},
                 productivity=item_productivity["mining"],
+                productivity_research="mining",
                 crafting_time=1
             ),
             Recipe(
@@ -380,6 +385,7 @@ def define_recipes():
                 inputs={"scrap_vein": 1},
                 outputs={"scrap": 1},
                 productivity=item_productivity["mining"],
+                productivity_research="mining",
                 crafting_time=0.5
             ),
         ]
@@ -393,6 +399,7 @@ def define_recipes():
             inputs={"tungsten_ore_vein": 1},
             outputs={"tungsten_ore": 1},
             productivity=item_productivity["mining"],
+            productivity_research="mining",
             crafting_time=0.2
         ),
         Recipe(
@@ -414,6 +421,7 @@ def define_recipes():
                 "copper_cable": 0.03,
             },
             productivity=item_productivity["scrap"],
+            productivity_research="scrap",
             accepts_productivity=False,
             crafting_time=0.2
         ),
@@ -440,6 +448,7 @@ def define_recipes():
             inputs={"iron_plate": 5},
             outputs={"steel_plate": 1},
             productivity=item_productivity["steel_plate"],
+            productivity_research="steel_plate",
             crafting_time=16
         ),
         Recipe(
@@ -500,6 +509,7 @@ def define_recipes():
             inputs={"molten_iron": 30},
             outputs={"steel_plate": 1},
             productivity=item_productivity["steel_plate"],
+            productivity_research="steel_plate",
             crafting_time=3.2
         ),
         Recipe(
@@ -522,6 +532,7 @@ def define_recipes():
             inputs={"molten_copper": 80, "molten_iron": 250, "plastic": 5},
             outputs={"low_density_structure": 1},
             productivity=item_productivity["low_density_structure"],
+            productivity_research="low_density_structure",
             can_recycle=RecyclingMode.NONE,
             crafting_time=15
         ),
@@ -649,6 +660,7 @@ def define_recipes():
             inputs={"coal": 1, "petroleum_gas": 20},
             outputs={"plastic": 2},
             productivity=item_productivity["plastic"],
+            productivity_research="plastic",
             can_recycle=RecyclingMode.BAD,
             crafting_time=1
         ),
@@ -731,6 +743,7 @@ def define_recipes():
             inputs={"copper_plate": 20, "steel_plate": 2, "plastic": 5},
             outputs={"low_density_structure": 1},
             productivity=item_productivity["low_density_structure"],
+            productivity_research="low_density_structure",
             crafting_time=15
         ),
         Recipe(
@@ -746,6 +759,7 @@ def define_recipes():
             inputs={"solid_fuel": 10, "light_oil": 10},
             outputs={"rocket_fuel": 1},
             productivity=item_productivity["rocket_fuel"],
+            productivity_research="rocket_fuel",
             crafting_time=15
         ),
         Recipe(
@@ -1021,6 +1035,7 @@ def define_recipes():
             inputs={"low_density_structure": 1, "rocket_fuel": 1, "processing_unit": 1},
             outputs={"rocket_part": 1},
             productivity=item_productivity["rocket_part"],
+            productivity_research="rocket_part",
             forced_quality=0,
             crafting_time=3,
             accepts_quality=False
@@ -1062,6 +1077,7 @@ def define_recipes():
                 inputs={"advanced_circuit": 2, "electronic_circuit": 20, "sulfuric_acid": 5},
                 outputs={"processing_unit": 1},
                 productivity=item_productivity["processing_unit"],
+                productivity_research="processing_unit",
                 can_recycle=recycling_mode,
                 crafting_time=10
             ),
@@ -1341,6 +1357,101 @@ objective = "inputs_cost_matrix"
 # objective = "constrained"
 # objective = "generate_cost_matrix"
 
+# how the model is constructed
+builder = "loop" # one solver variable and constraint at a time (quality_linear.py)
+# builder = "matrix" # vectorized into one sparse matrix (linear_model.py, quality_matrix.py)
+
+# skip recipes on planets where they can not contribute to a goal (not for objective overhead)
+prune_recipes = True
+# skip recipe qualities and leftover item qualities above the highest quality a goal can use (not for objective overhead)
+prune_qualities = True
+
+# only for builder = "matrix": skip module/beacon configurations that can never beat another one of the same recipe
+prune_configurations = "dominance" # duplicates and configurations with less output for more machines/modules
+# prune_configurations = "hull" # additionally convex combinations of other configurations (objectives inputs and constrained)
+# prune_configurations = None
+
+# only for builder = "matrix": which configurations the solver sees
+configuration_columns = "all" # every configuration that survives the pruning
+# configuration_columns = "generated" # column generation: start with a few configurations per recipe and add those priced out by the duals of the balance rows
+
+# only for builder = "matrix": how the solve reaches max_quality
+quality_resolution = "direct" # one solve with all qualities
+# quality_resolution = "progressive" # solve with quality caps 0, 1, ..., each level warm started from the previous one (column_generation.py)
+
+# only for builder = "matrix": how the module/beacon configurations enter the model
+configuration_model = "enumerated" # one column per configuration (linear_model.py)
+# configuration_model = "compact" # experimental: integer module counts per recipe with linearized products, only the configurations it picks are enumerated (compact_model.py), on the shipped goal worse than the enumeration at the time limit
+compact_amount_bound = 1000 # largest recipe amount of one recipe, planet and quality in the compact model, the compact model is only exact below it
+
+# only for builder = "matrix": split the LP into smaller ones (decomposition.py)
+decomposition = None # one model
+# decomposition = "scc" # objective inputs: strongly connected components of the recipe graph, unit costs bottom up, demand top down
+# decomposition = "planets" # Dantzig-Wolfe with one block per planet and the space logistics and goals in the master
+decomposition_processes = 1 # price the planets of decomposition = "planets" in this many worker processes
+
+# only for builder = "matrix": reduce the final matrix before each solve (empty, redundant, duplicate and singleton rows, fixed and useless columns)
+matrix_presolve = True
+
+# only for builder = "matrix": scale rows, columns, objective and right hand side to similar magnitudes before each solve and print their ranges
+matrix_scaling = True
+
+# only for builder = "matrix": how the objectives inputs, overhead and constrained combine their criteria
+objective_combination = "weighted" # one weighted sum, e.g. overhead + machines * 10
+# objective_combination = "lexicographic" # in order of priority (e.g. inputs, then machines, then space travel), each only among the optima of the ones before; the configuration pruning keeps their machine usage
+lexicographic_tolerance = 1e-6 # relative share of a criterion that may be given up for the later ones
+
+# only for builder = "matrix" and the objectives inputs, overhead and constrained: after the solve, set a parameter
+# to each of the values and solve again, changing only the coefficients that depend on it (what_if.py),
+# warm started only with matrix_presolve and matrix_scaling off, exact only with prune_configurations = None
+# (the configurations are pruned for the original value, otherwise the objectives are upper bounds)
+what_if = None
+# what_if = ("mining", [0.6, 0.7, 0.8, 0.9, 1.0]) # a key of item_productivity
+# what_if = ("beacon_sharedness", [1 / 4, 1 / 2, 1])
+
+# only for builder = "matrix" and the objectives inputs, overhead and constrained: after the solve, trace the optimal
+# objective between two values of one parameter with its exact breakpoints and the recipes used in between (parametric.py)
+parametric = None
+# parametric = ("goal", 0, 1 / 60, 10) # amount of the first goal (objective inputs)
+# parametric = ("machines", 0, 100) # weight of the machine cost added to the objective
+# parametric = ("space_travel", 0, 1000) # weight of the rocket launches added to the objective
+
+# only for builder = "matrix": search the module and beacon tiers (level, quality) for goal or each list of goal_batch
+# instead of using the ones above: the LP objectives solve every combination, inputs_cost_matrix prunes those whose
+# LP bound is not below the best solution with whole machine counts (module_search.py)
+module_search = None
+# module_search = {
+#     "speed": [(level, q) for level in range(1, 4) for q in range(len(rarities))],
+#     "productivity": [(level, q) for level in range(1, 4) for q in range(len(rarities))],
+#     "quality": [(level, q) for level in range(1, 4) for q in range(len(rarities))],
+#     "beacon": list(range(len(rarities))),
+# }
+module_search_processes = 8
+
+# only for builder = "matrix": how generate_cost_matrix gets its costs
+cost_matrix_mode = "explicit" # one solve per planet, item and quality
+# cost_matrix_mode = "duals" # from the optimal basis of one solve with all items demanded (Gurobi, HiGHS), explicit solves where it is not optimal for an item alone
+
+# how inputs_cost_matrix gets whole machine counts from its preoptimization
+integer_phase = "mip" # integer machine counts, proven optimal within the time limit
+# integer_phase = "rounding" # round the machine counts up and repair with LP solves only, also for backends without integer support (only builder = "matrix")
+rounding_polish_steps = 20 # machines to try taking away after the rounding
+
+# before the integer phase of inputs_cost_matrix, turn the preoptimized recipe caps into finite upper bounds (all columns with builder = "matrix", recipes and machine counts with the loop builder)
+bound_propagation = True
+
+# only for builder = "matrix": build the columns of each planet in this many worker processes and merge them
+build_processes = 1
+# build_processes = 8
+
+# keep the speed, productivity and quality bonus of all module/beacon configurations in a file for later runs
+effect_table_file = None
+# effect_table_file = "effects.json"
+
+# only for builder = "matrix": keep built models in this directory and memory-map them in later runs with the same catalog and pruning
+model_cache_dir = None
+# model_cache_dir = "model_cache"
+
 # goal_item = "electronic_circuit"
 # goal_quality = 2
 # goal_item = "advanced_circuit"
@@ -1427,6 +1538,7 @@ item_productivity = {
     "asteroids": 0.4,
     "scrap": 0.6,
     "mining": 0.5,
+    "rocket_part": 0,
 }
 
 allow_space_crafting = False
@@ -1482,6 +1594,15 @@ science_to_consider = [
 #     for s in science_to_consider
 # ]
 
+# only for builder = "matrix" and the objectives inputs and constrained: solve each of these goal lists on one model
+# built for all of them instead of goal, only the right hand sides of the goal rows change between the solves
+goal_batch = None
+# goal_batch = [
+#     [{"item": s, "planet": None, "quality": q, "amount": 1}]
+#     for s in science_to_consider
+#     for q in range(max_quality+1)
+# ]
+
 
 # planet -> item -> cost scaling factor
 inputs_per_planet = {
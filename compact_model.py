@@ -0,0 +1,508 @@
+import math
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from common import *
+from solver import *
+from linear_model import *
+from presolve import ConfigurationPruning, RecipePruning, objective_uses_machines
+
+# Compact alternative to one column per module/beacon configuration (configuration_model = "compact").
+# Per group (recipe, planet, recipe quality, machine quality) the module counts are integer variables
+# n_t = sum_b 2^b bit_tb (t = quality, productivity, speed), the beacon count l is one-hot (beacons enter
+# through their square root) and the recipe amount x and the machine count m are split by l.
+# For a fixed l, productivity, quality and speed are affine in the counts:
+#   pi = pi0_l + sum_t p_t n_t,  kappa = kappa0_l + sum_t k_t n_t,  sigma = sigma0_l + sum_t s_t n_t
+# so the outputs x pi, x kappa, x kappa pi and the machines m sigma are linear in the products x n_t,
+# x n_t n_u and m n_t. These are sums of products of a bounded variable with a bit, which the McCormick
+# inequalities represent exactly as long as the amount stays below compact_amount_bound (the bound of the
+# McCormick products; a solution at the bound gets a warning, the optimum may need more). The quality bonus
+# is clamped at 0, so x is split again into x_on (kappa >= 0) and x_off (kappa <= 0, nothing is upgraded)
+# by a binary mode.
+# The model grows with log(module slots) per group instead of with the number of configurations.
+# Its solution picks one configuration per group, and only the picked configurations become columns
+# of the enumerated model that quality_matrix.py solves and reports as usual.
+# Experimental: on the shipped goal (objective inputs, HiGHS) the pruned enumeration is optimal at 0.0479 in
+# 0.6 seconds, the compact model stops at the 60 second time limit with 0.059 (0.07 in other runs). benchmark()
+# measures this gap for the configured objective and goal.
+
+compact_modules = {"quality": quality_module, "productivity": productivity_module, "speed": speed_module}
+
+
+def type_limits(recipe):
+    # largest count of each module type and of beacons, in the same way as recipe_configurations
+    slots = recipe.machine.module_slots
+    limits = {
+        "quality": slots if not(all(out in fluids for out in recipe.outputs)) and recipe.accepts_quality_module else 0,
+        "productivity": slots if recipe.accepts_productivity else 0,
+        "speed": slots if recipe.accepts_speed else 0,
+    }
+    return limits, max_beacons_per_machine if recipe.accepts_speed else 0
+
+
+def beacon_speed_modules(num_beacons):
+    # effective speed modules of num_beacons beacons, see configuration_effects
+    return math.sqrt(num_beacons) * beacon.distribution_efficiency * 2
+
+
+def check_affine_effects(recipe, limits):
+    # the productivity clamp at 1 and the speed clamp at 0.2 of configuration_effects must never bind
+    if any(compact_modules[t].productivity_bonus < 0 for t in limits if limits[t] > 0) or recipe.productivity + recipe.machine.productivity < 0:
+        raise ValueError(f"{recipe.name}: the compact model needs non-negative productivity bonuses")
+    slowest = 1 + recipe.machine.module_slots * min([0] + [compact_modules[t].speed_bonus for t in limits if limits[t] > 0])
+    if slowest < 0.2:
+        raise ValueError(f"{recipe.name}: the compact model needs a speed bonus of at least 0.2 in every configuration")
+
+
+class CompactModel:
+    def __init__(self, amount_bound, integer_machines, with_machines):
+        self.amount_bound = amount_bound
+        self.integer_machines = integer_machines
+        self.with_machines = with_machines
+        self.lb, self.ub, self.integer = [], [], []
+        self.entry_rows, self.entry_cols, self.entry_vals = [], [], []
+        self.sense, self.rhs = [], []
+        self.items: list[str] = []
+        self.item_index: dict[str, int] = {}
+        self.balance_index: dict[tuple[int, int, int], int] = {}
+        self.inputs = [] # (column, planet, item)
+        self.groups = [] # dicts with the keys and columns of each group
+        self.A = None
+
+    @property
+    def num_rows(self):
+        return len(self.sense)
+
+    @property
+    def num_cols(self):
+        return len(self.lb)
+
+    def column(self, ub=np.inf, integer=False):
+        self.lb.append(0)
+        self.ub.append(ub)
+        self.integer.append(integer)
+        return len(self.lb) - 1
+
+    def add_terms(self, row, terms):
+        for col, value in terms:
+            if value != 0:
+                self.entry_rows.append(row)
+                self.entry_cols.append(col)
+                self.entry_vals.append(value)
+
+    def row(self, terms, sense, rhs=0):
+        self.sense.append(sense)
+        self.rhs.append(rhs)
+        self.add_terms(self.num_rows - 1, terms)
+        return self.num_rows - 1
+
+    def balance_row(self, planet, item, quality) -> Optional[int]:
+        if self.A is not None:
+            if item not in self.item_index:
+                return None
+            return self.balance_index.get((model_planets.index(planet), self.item_index[item], quality))
+        if item not in self.item_index:
+            self.item_index[item] = len(self.items)
+            self.items.append(item)
+        key = (model_planets.index(planet), self.item_index[item], quality)
+        if key not in self.balance_index:
+            self.balance_index[key] = self.row([], ">")
+        return self.balance_index[key]
+
+    def row_expression(self, rows) -> sp.csr_matrix:
+        rows = [r for r in rows if r is not None]
+        if not rows:
+            return sp.csr_matrix((1, self.num_cols))
+        return sp.csr_matrix(self.A[rows].sum(axis=0))
+
+    def product(self, v, bound, bit):
+        # w = v * bit for 0 <= v <= bound and a binary bit
+        w = self.column(bound)
+        self.row([(w, 1), (v, -1)], "<")
+        self.row([(w, 1), (bit, -bound)], "<")
+        self.row([(w, 1), (v, -1), (bit, -bound)], ">", -bound)
+        return w
+
+    def split(self, bound, levels, beacon_choice, integer=False):
+        # a variable and its parts per beacon count, of which only the chosen one may be nonzero
+        if beacon_choice is None:
+            v = self.column(math.ceil(bound) if integer else bound, integer)
+            return v, [v]
+        total = self.column(math.ceil(bound) if integer else bound, integer)
+        parts = [self.column(bound) for _ in levels]
+        self.row([(total, 1)] + [(v, -1) for v in parts], "=", 0)
+        for v, g in zip(parts, beacon_choice):
+            self.row([(v, 1), (g, -bound)], "<")
+        return total, parts
+
+    def times_count(self, v, bound, bits):
+        # v * n for n = sum_b 2^b bits[b], as terms
+        return [(self.product(v, bound, bit), 2 ** b) for b, bit in enumerate(bits)]
+
+    def times_counts(self, terms, bound, bits):
+        # (sum of terms) * n, each term bounded by bound
+        return [(w, value * factor) for col, value in terms for w, factor in self.times_count(col, bound, bits)]
+
+    def add_group(self, ri, recipe, planet, q, mq, item_quality_cap):
+        accepts_quality, _ = recipe_quality_range(recipe)
+        limits, max_beacons = type_limits(recipe)
+        check_affine_effects(recipe, limits)
+        types = [t for t in compact_modules if limits[t] > 0]
+        p = {t: compact_modules[t].productivity_bonus for t in types}
+        k = {t: compact_modules[t].quality_bonus for t in types}
+        s = {t: compact_modules[t].speed_bonus for t in types}
+        levels = range(max_beacons+1)
+        pi0 = [1 + recipe.productivity + recipe.machine.productivity + speed_module.productivity_bonus * beacon_speed_modules(l) for l in levels]
+        kappa0 = [speed_module.quality_bonus * beacon_speed_modules(l) for l in levels]
+        sigma0 = [1 + speed_module.speed_bonus * beacon_speed_modules(l) for l in levels]
+        U = self.amount_bound
+
+        # module counts and beacons
+        bits = {t: [self.column(1, True) for _ in range(limits[t].bit_length())] for t in types}
+        for t in types:
+            if limits[t] != 2 ** len(bits[t]) - 1:
+                self.row([(bit, 2 ** b) for b, bit in enumerate(bits[t])], "<", limits[t])
+        self.row([(bit, 2 ** b) for t in types for b, bit in enumerate(bits[t])], "<", recipe.machine.module_slots)
+        beacon_choice = [self.column(1, True) for _ in levels] if max_beacons > 0 else None
+        if beacon_choice is not None:
+            self.row([(g, 1) for g in beacon_choice], "=", 1)
+
+        # quality modes: only x_on upgrades, with kappa >= 0, only x_off may have kappa < 0
+        lowest = min(kappa0) + sum(min(0, k[t]) * limits[t] for t in types)
+        highest = max(kappa0) + sum(max(0, k[t]) * limits[t] for t in types)
+        modes = []
+        if accepts_quality and highest > 0:
+            modes.append("on")
+        if not accepts_quality or highest <= 0 or lowest < 0:
+            modes.append("off")
+        if modes == ["on", "off"]:
+            off = self.column(1, True)
+            kappa = [(bit, k[t] * 2 ** b) for t in types for b, bit in enumerate(bits[t])]
+            if beacon_choice is not None:
+                kappa += [(g, kappa0[l]) for l, g in enumerate(beacon_choice)]
+            self.row(kappa + [(off, -lowest)], ">", 0)
+            self.row(kappa + [(off, highest)], "<", highest)
+
+        # recipe amounts per mode, in total and per beacon count
+        amounts = {mode: self.split(U, levels, beacon_choice) for mode in modes}
+        if modes == ["on", "off"]:
+            self.row([(amounts["on"][0], 1), (off, U)], "<", U)
+            self.row([(amounts["off"][0], 1), (off, -U)], "<")
+
+        products = {}
+        def times(v, t, bound):
+            if (v, t) not in products:
+                products[(v, t)] = self.times_count(v, bound, bits[t])
+            return products[(v, t)]
+
+        def times_levels(split, t, coefficients, bound=U):
+            # sum_l coefficients[l] v_l n_t, with the total if the coefficients do not depend on the beacons
+            total, parts = split
+            if len(set(coefficients)) == 1:
+                return [(w, coefficients[0] * f) for w, f in times(total, t, bound)] if coefficients[0] != 0 else []
+            return [(w, c * f) for v, c in zip(parts, coefficients) if c != 0 for w, f in times(v, t, bound)]
+
+        # x pi, x kappa and x kappa pi
+        total = [(amounts[mode][0], 1) for mode in modes]
+        with_productivity = []
+        with_quality = []
+        with_both = []
+        for mode in modes:
+            parts = amounts[mode][1]
+            with_productivity += [(x, pi0[l]) for l, x in enumerate(parts)]
+            with_productivity += [term for t in types for term in times_levels(amounts[mode], t, [p[t]] * len(levels))]
+            if mode == "off":
+                continue
+            with_quality += [(x, kappa0[l]) for l, x in enumerate(parts)]
+            with_quality += [term for t in types for term in times_levels(amounts[mode], t, [k[t]] * len(levels))]
+            with_both += [(x, kappa0[l] * pi0[l]) for l, x in enumerate(parts)]
+            with_both += [term for t in types for term in times_levels(amounts[mode], t, [kappa0[l] * p[t] + pi0[l] * k[t] for l in levels])]
+            for t in types:
+                for u in types:
+                    if k[t] * p[u] != 0:
+                        with_both += [(w, k[t] * p[u] * f) for w, f in self.times_counts(times(amounts[mode][0], t, U), U, bits[u])]
+
+        # balance rows, in the same way as output_coefficients and planet_blocks
+        input_planet = recipe.forced_input_planet if recipe.forced_input_planet is not None else planet
+        output_planet = recipe.forced_output_planet if recipe.forced_output_planet is not None else planet
+        for resource, resource_amount in recipe.inputs.items():
+            resource_quality = recipe.forced_input_quality.get(resource, q) if resource not in fluids else 0
+            self.add_terms(self.balance_row(input_planet, resource, resource_quality), [(x, -resource_amount * f) for x, f in total])
+        D = quality_kernel(max_quality)
+        for resource, resource_amount in recipe.outputs.items():
+            in_amount = recipe.inputs.get(resource, 0)
+            # max(amount, in + (amount - in) * pi) with pi >= 1
+            fixed, scaled = (in_amount, resource_amount - in_amount) if resource_amount > in_amount else (resource_amount, 0)
+            base = [(x, fixed * f) for x, f in total] + [(x, scaled * f) for x, f in with_productivity]
+            upgrade = [(x, fixed * f) for x, f in with_quality] + [(x, scaled * f) for x, f in with_both]
+            output_quality = recipe.forced_output_quality.get(resource, q) if resource not in fluids else 0
+            is_forced_quality = resource in recipe.forced_output_quality or resource in fluids
+            if accepts_quality and not is_forced_quality:
+                entries = [(q2, (base if q2 == q else []) + [(x, D[q, q2] * f) for x, f in upgrade]) for q2 in range(q, max_quality+1)]
+            else:
+                entries = [(output_quality, base)]
+            for q2, terms in entries:
+                if item_quality_cap is not None and q2 > item_quality_cap(resource, output_planet):
+                    continue
+                self.add_terms(self.balance_row(output_planet, resource, q2), terms)
+
+        # machines, modules and beacons
+        machines = []
+        usage = {"speed": [], "quality": [], "productivity": [], "beacons": []}
+        if self.with_machines:
+            speed = recipe.machine.qspeed[mq]
+            bound = U * recipe.crafting_time / (speed * (1 + recipe.machine.module_slots * min([0] + [s[t] for t in types])))
+            integer = self.integer_machines and recipe.machine.underlying_item is not None
+            machine_split = self.split(bound, levels, beacon_choice, integer)
+            m, parts = machine_split
+            self.row(
+                [(v, speed * sigma0[l]) for l, v in enumerate(parts)]
+                + [term for t in types for term in times_levels(machine_split, t, [speed * s[t]] * len(levels), bound)]
+                + [(x, -recipe.crafting_time) for x, _ in total],
+                ">", 0
+            )
+            machines.append((m, 1))
+            for t in types:
+                usage[t] += times(m, t, bound)
+            usage["speed"] += [(v, l * beacon_sharedness * 2) for l, v in enumerate(parts)]
+            usage["beacons"] += [(v, l * beacon_sharedness) for l, v in enumerate(parts)]
+
+        self.groups.append({
+            "recipe": ri, "planet": planet, "quality": q, "machine_quality": mq,
+            "bits": bits, "beacons": beacon_choice, "amounts": [x for x, _ in total],
+            "machines": machines, "usage": usage,
+        })
+
+    def finish(self):
+        self.A = sp.csr_matrix((self.entry_vals, (self.entry_rows, self.entry_cols)), shape=(self.num_rows, self.num_cols))
+        self.A.sum_duplicates()
+        self.sense = np.array(self.sense)
+        self.rhs = np.array(self.rhs, dtype=float)
+        self.lb = np.array(self.lb, dtype=float)
+        self.ub = np.array(self.ub, dtype=float)
+        self.integer = np.array(self.integer, dtype=bool)
+
+    def group_vector(self, key, per_group):
+        # sum over the groups of per_group(group) times the terms in group[key]
+        c = np.zeros(self.num_cols)
+        for group in self.groups:
+            factor = per_group(group)
+            for col, value in group[key]:
+                c[col] += factor * value
+        return c
+
+    def machine_cost(self):
+        c = self.group_vector("machines", lambda group: 1)
+        for name in ["speed", "quality", "productivity", "beacons"]:
+            c += self.usage_vector(name, lambda group: 1)
+        return c
+
+    def usage_vector(self, name, per_group):
+        c = np.zeros(self.num_cols)
+        for group in self.groups:
+            factor = per_group(group)
+            for col, value in group["usage"][name]:
+                c[col] += factor * value
+        return c
+
+    def input_cost(self):
+        c = np.zeros(self.num_cols)
+        for col, planet, item in self.inputs:
+            c[col] = inputs_per_planet[planet][item]
+        return c
+
+    def amortized_cost(self):
+        # same prices as amortized_cost in linear_model.py
+        def machine_price(group):
+            machine = all_recipes[group["recipe"]].machine
+            if machine.underlying_item is None:
+                return 0
+            return cost_matrix[group["planet"]][machine.underlying_item][group["machine_quality"]]
+        c = self.group_vector("machines", machine_price)
+        for name, module in [("speed", speed_module), ("quality", quality_module), ("productivity", productivity_module), ("beacons", beacon)]:
+            c += self.usage_vector(name, lambda group: cost_matrix[group["planet"]][module.underlying_item][module.underlying_quality])
+        c = self.input_cost() + c / (3600 * hours_of_amortization)
+        if reduce_space_travel:
+            c += self.group_vector("machines", lambda group: 100000 * (
+                all_recipes[group["recipe"]].machine is rocket and group["planet"] in all_planets and group["machine_quality"] == 0
+            ))
+        return c
+
+    def availability_rows(self):
+        # module, beacon and machine limits of the constrained objective, see quality_matrix.py
+        rows = []
+        for name, available in [
+            ("speed", available_speed_modules),
+            ("quality", available_quality_modules),
+            ("productivity", available_prod_modules),
+            ("beacons", available_beacons),
+        ]:
+            for planet in model_planets:
+                rows.append((self.usage_vector(name, lambda group: group["planet"] == planet), available[planet]))
+        by_machine = defaultdict(list)
+        for i, group in enumerate(self.groups):
+            by_machine[(group["recipe"], group["planet"], group["machine_quality"])].append(i)
+        for (ri, planet, mq), indices in by_machine.items():
+            c = np.zeros(self.num_cols)
+            for i in indices:
+                for col, value in self.groups[i]["machines"]:
+                    c[col] += value
+            rows.append((c, available_machines[planet][all_recipes[ri].machine.name][mq]))
+        return sp.csr_matrix(np.array([c for c, _ in rows])), np.array([rhs for _, rhs in rows], dtype=float)
+
+    def configurations(self, x, tolerance=1e-9):
+        # (recipe, recipe quality) -> configurations (quality, productivity, speed modules, beacons) of the used groups
+        chosen = defaultdict(set)
+        for group in self.groups:
+            if x[group["amounts"]].sum() <= tolerance:
+                continue
+            counts = {t: int(round(sum(x[bit] * 2 ** b for b, bit in enumerate(bits)))) for t, bits in group["bits"].items()}
+            num_beacons = int(np.argmax(x[group["beacons"]])) if group["beacons"] is not None else 0
+            chosen[(group["recipe"], group["quality"])].add((counts.get("quality", 0), counts.get("productivity", 0), counts.get("speed", 0), num_beacons))
+        return chosen
+
+    def capped_groups(self, x, tolerance=1e-6):
+        # groups with a recipe amount at amount_bound, the optimum may need more there
+        return sum(any(x[col] >= self.amount_bound * (1 - tolerance) for col in group["amounts"]) for group in self.groups)
+
+    def report(self):
+        print(f"Compact model with {self.num_cols} columns ({self.integer.sum()} integer), {self.num_rows} rows and {self.A.nnz} nonzeros for {len(self.groups)} recipe groups")
+
+
+# cost functions of the compact model for objective_setup in quality_matrix.py, there are none for overhead
+compact_costs = {
+    "input": CompactModel.input_cost,
+    "amortized": CompactModel.amortized_cost,
+    "machine": CompactModel.machine_cost,
+    "availability": CompactModel.availability_rows,
+}
+
+
+def build_compact_model(recipes: RecipePruning, amount_bound=None, integer_machines=None, objective_name=None) -> CompactModel:
+    objective_name = objective if objective_name is None else objective_name
+    if integer_machines is None:
+        integer_machines = objective_name == "inputs_cost_matrix"
+    model = CompactModel(
+        compact_amount_bound if amount_bound is None else amount_bound,
+        integer_machines,
+        objective_uses_machines(objective_name),
+    )
+    for planet, planet_resources in inputs_per_planet.items():
+        for resource in planet_resources:
+            col = model.column()
+            model.inputs.append((col, planet, resource))
+            model.add_terms(model.balance_row(planet, resource, 0), [(col, 1)])
+    for ri, recipe in enumerate(all_recipes):
+        planets, recipe_caps, quality_range = recipe_setup(ri, recipe, recipes, recipes.recipe_quality_cap)
+        for planet in planets:
+            for q in quality_range:
+                if q > recipe_caps[planet]:
+                    continue
+                # without machines in the objective or the rows, the machine qualities are all the same
+                machine_qualities = range(min(max_quality, recipe.machine.max_quality) + 1) if model.with_machines else [0]
+                for mq in machine_qualities:
+                    model.add_group(ri, recipe, planet, q, mq, recipes.item_quality_cap)
+    model.finish()
+    return model
+
+
+def compact_problem(model: CompactModel, objective_name=None):
+    # the compact model with goals and the objective, like main in quality_matrix.py
+    from quality_matrix import objective_setup
+
+    problem = MatrixProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    problem.set_integer(np.flatnonzero(model.integer))
+    c, rows = objective_setup(model, objective_name, costs=compact_costs)
+    for A, sense, rhs in rows:
+        problem.add_rows(A, sense, rhs)
+    problem.set_objective(c)
+    return problem
+
+
+class CompactSelection:
+    # select_configurations hook for build_model: only the configurations chosen by the compact model
+    def __init__(self, chosen):
+        self.chosen = chosen
+
+    def cache_key(self):
+        return sorted((key, sorted(configurations)) for key, configurations in self.chosen.items())
+
+    def __call__(self, ri, recipe, q, configurations, effects):
+        chosen = self.chosen.get((ri, q), set())
+        return np.array([i for i, configuration in enumerate(configurations) if tuple(int(n) for n in configuration) in chosen], dtype=int)
+
+    def report(self):
+        print(f"Compact model chose {sum(len(c) for c in self.chosen.values())} configurations for {len(self.chosen)} recipe qualities")
+
+
+def compact_selection(recipes: RecipePruning) -> Optional[CompactSelection]:
+    # solves the compact model, None if it has no solution
+    t0 = time.time()
+    model = build_compact_model(recipes)
+    model.report()
+    problem = compact_problem(model)
+    t1 = time.time()
+    print(f"Building the compact model took {t1-t0:.2f} seconds")
+    res = problem.check()
+    print(f"Solving the compact model took {time.time()-t1:.2f} seconds")
+    # at the time limit without a solution, highs returns zeros
+    chosen = model.configurations(problem.x) if is_satisfied(res) else None
+    if not chosen:
+        return None
+    print(f"Compact objective: {problem.objective_value}")
+    warn_capped(model, problem.x)
+    print("configuration_model = \"compact\" is experimental, at the time limit its configurations can be worse than the enumerated optimum (python compact_model.py compares both)")
+    return CompactSelection(chosen)
+
+
+def warn_capped(model: CompactModel, x):
+    capped = model.capped_groups(x)
+    if capped:
+        print(f"Warning: {capped} recipe groups of the compact model are at compact_amount_bound = {model.amount_bound}, raise it, the optimum may need more")
+
+
+def benchmark():
+    # both model variants for the configured objective and goal, solved once without presolve or integer phase
+    from quality_matrix import model_costs, objective_setup
+
+    recipes = RecipePruning()
+    print("Enumerated:")
+    t0 = time.time()
+    pruning = ConfigurationPruning(recipes=recipes)
+    model = build_model(select_configurations=pruning, select_recipes=recipes, recipe_quality_cap=recipes.recipe_quality_cap, item_quality_cap=recipes.item_quality_cap)
+    print(f"  {model.num_cols} columns ({(model.columns['kind'] == COLUMN_MACHINE).sum()} integer), {model.num_rows} rows and {model.A.nnz} nonzeros")
+    problem = MatrixProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    problem.set_integer(np.flatnonzero(model.columns["kind"] == COLUMN_MACHINE))
+    c, rows = objective_setup(model, costs={name: model_costs[name] for name in compact_costs})
+    for A, sense, rhs in rows:
+        problem.add_rows(A, sense, rhs)
+    problem.set_objective(c)
+    t1 = time.time()
+    res = problem.check()
+    t2 = time.time()
+    enumerated = problem.objective_value if is_satisfied(res) else None
+    print(f"  build {t1-t0:.2f} s, solve {t2-t1:.2f} s, objective {enumerated}")
+
+    print("Compact:")
+    model = build_compact_model(recipes)
+    print(f"  {model.num_cols} columns ({model.integer.sum()} integer), {model.num_rows} rows and {model.A.nnz} nonzeros")
+    problem = compact_problem(model)
+    t3 = time.time()
+    res = problem.check()
+    t4 = time.time()
+    solved = is_satisfied(res) and model.configurations(problem.x)
+    compact = problem.objective_value if solved else None
+    print(f"  build {t3-t2:.2f} s, solve {t4-t3:.2f} s, objective {compact}")
+    if solved:
+        warn_capped(model, problem.x)
+    # both are exact as long as no recipe amount reaches compact_amount_bound, otherwise a worse compact objective
+    # is the incumbent at the time limit
+    if enumerated is not None and compact is not None:
+        gap = (compact - enumerated) / max(abs(enumerated), eps)
+        print(f"Compact objective {gap:.1%} above the enumerated one, {(t4 - t2) / max(t2 - t0, eps):.0f} times the time")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,406 @@
+import multiprocessing
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+from common import *
+from solver import *
+
+# Decomposition of a matrix problem along the strongly connected components of its rows (decomposition = "scc").
+# Row i points to row k if a column consumes i (negative entry) and produces k (positive entry). All outputs of
+# a column are joined into one component, so each column belongs to the component of its outputs and only
+# consumes rows of its own or earlier components. In topological order of the components:
+# - bottom up, every row consumed by a later component gets the cost of one unit of it, with the rows of earlier
+#   components at their unit cost: the cheapest column for a single row, a small LP per row otherwise
+# - top down, every component meets the demand of the goals and of the later components at least cost with
+#   the same prices and passes its own consumption on to the earlier components
+# The composed solution is always feasible. It is optimal unless two later components could share the
+# output of one component more cheaply than their unit costs say (joint production across components), so
+# it is only returned with the duals of the components (the unit costs for the exported rows) as a proof:
+# no column with a negative reduced cost and the same objective. Unit costs are no duals when a column of an
+# earlier component produces several exported rows, then the problem is solved as a whole.
+# Only for problems  min c x  s.t.  A x >= b,  x >= 0  with c >= 0 (objective inputs), others are solved whole.
+
+
+def unit_costs(A: sp.csc_matrix, row, cols, cost):
+    # cost of one unit of the row with each of the columns, inf if it does not produce it
+    output = A[row, cols].toarray().ravel()
+    return np.where(output > 0, cost[cols] / np.where(output > 0, output, 1), np.inf)
+
+
+class SCCDecomposition:
+    def __init__(self, A: sp.csr_matrix):
+        produces = sp.csr_matrix((A > 0).astype(float))
+        consumes = sp.csr_matrix((A < 0).astype(float))
+        edges = (consumes @ produces.T).tocoo()
+        joint = produces @ produces.T
+        self.num_components, self.component = connected_components(edges + joint, directed=True, connection="strong")
+
+        # component of each column, -1 if it produces nothing
+        first_output = np.asarray(produces.T.argmax(axis=1)).ravel()
+        self.column_component = np.where(np.asarray(produces.sum(axis=0)).ravel() > 0, self.component[first_output], -1)
+
+        # topological order of the components (Kahn)
+        src, dst = self.component[edges.row], self.component[edges.col]
+        between = src != dst
+        pairs = np.unique(np.stack([src[between], dst[between]], axis=1), axis=0)
+        indegree = np.bincount(pairs[:, 1], minlength=self.num_components)
+        successors = [[] for _ in range(self.num_components)]
+        for a, b in pairs:
+            successors[a].append(b)
+        order = list(np.flatnonzero(indegree == 0))
+        for a in order:
+            for b in successors[a]:
+                indegree[b] -= 1
+                if indegree[b] == 0:
+                    order.append(b)
+        self.order = np.array(order, dtype=int)
+        self.pairs = pairs
+        self.rows = [np.flatnonzero(self.component == k) for k in range(self.num_components)]
+        self.columns = [np.flatnonzero(self.column_component == k) for k in range(self.num_components)]
+
+    def upstream(self, rows):
+        # components the given rows depend on, including their own
+        predecessors = [[] for _ in range(self.num_components)]
+        for a, b in self.pairs:
+            predecessors[b].append(a)
+        reached = np.zeros(self.num_components, dtype=bool)
+        stack = list(np.unique(self.component[rows]))
+        reached[stack] = True
+        while stack:
+            for a in predecessors[stack.pop()]:
+                if not reached[a]:
+                    reached[a] = True
+                    stack.append(a)
+        return reached
+
+    def report(self):
+        sizes = np.array([len(rows) for rows in self.rows])
+        print(f"Decomposition into {self.num_components} components, {(sizes > 1).sum()} with several rows (largest {sizes.max()} of {len(self.component)} rows)")
+
+
+class DecomposedProblem(MatrixProblem):
+    # the arrays of MatrixProblem hold the whole problem, each check solves it component by component
+    def decomposable(self):
+        return (self.sense == ">").all() and (self.lb == 0).all() and np.isinf(self.ub).all() \
+            and (self.c >= 0).all() and not self.integer.any()
+
+    def component_problem(self, decomposition, k, cost):
+        rows, cols = decomposition.rows[k], decomposition.columns[k]
+        usable = np.isfinite(cost[cols])
+        problem = MatrixProblem(
+            self.A[rows][:, cols], np.full(len(rows), ">"), np.zeros(len(rows)),
+            np.where(usable, cost[cols], 0), np.zeros(len(cols)), np.where(usable, np.inf, 0),
+        )
+        return problem
+
+    def check(self):
+        if not self.decomposable():
+            print("Decomposition needs min c x, A x >= b, x >= 0 with c >= 0, solving as a whole")
+            return super().check()
+        decomposition = SCCDecomposition(self.A)
+        decomposition.report()
+        A = self.A.tocsc()
+        component = decomposition.component
+        column_component = decomposition.column_component
+        # only components the goals depend on are solved
+        needed = decomposition.upstream(np.flatnonzero(self.rhs > 0))
+        # consumption of rows of earlier components, rows consumed by a later needed component
+        coo = A.tocoo()
+        external = (coo.data < 0) & (component[coo.row] != column_component[coo.col])
+        inputs = sp.csc_matrix((-coo.data[external], (coo.row[external], coo.col[external])), shape=A.shape)
+        exported = np.zeros(self.num_rows, dtype=bool)
+        exported[coo.row[external & needed[column_component[coo.col]]]] = True
+
+        # bottom up: unit cost of every exported row
+        price = np.zeros(self.num_rows)
+        cost = self.c.copy()
+        for k in decomposition.order[needed[decomposition.order]]:
+            rows, cols = decomposition.rows[k], decomposition.columns[k]
+            with np.errstate(invalid="ignore"):
+                cost[cols] = self.c[cols] + inputs[:, cols].T @ price
+            priced = rows[exported[rows]]
+            if len(priced) == 0:
+                continue
+            if len(rows) == 1:
+                price[rows[0]] = unit_costs(A, rows[0], cols, cost).min(initial=np.inf)
+                continue
+            problem = self.component_problem(decomposition, k, cost)
+            for r in priced:
+                rhs = (rows == r).astype(float)
+                problem.set_rows(np.arange(len(rows)), ">", rhs)
+                res = problem.check()
+                price[r] = problem.objective_value if is_satisfied(res) else np.inf
+
+        # top down: demand of the goals and of later components, with the duals of each component for the check
+        x = np.zeros(self.num_cols)
+        y = np.zeros(self.num_rows)
+        demand = self.rhs.copy()
+        for k in decomposition.order[::-1]:
+            rows, cols = decomposition.rows[k], decomposition.columns[k]
+            if (demand[rows] <= 0).all():
+                continue
+            unit = unit_costs(A, rows[0], cols, cost) if len(rows) == 1 else None
+            if unit is not None and np.isfinite(unit.min(initial=np.inf)):
+                best = np.argmin(unit)
+                x[cols[best]] = demand[rows[0]] / A[rows[0], cols[best]]
+                y[rows[0]] = unit[best]
+            else:
+                problem = self.component_problem(decomposition, k, cost)
+                problem.set_rows(np.arange(len(rows)), ">", np.maximum(demand[rows], 0))
+                res = problem.check()
+                if not is_satisfied(res):
+                    self.x = self.duals = self.objective_value = None
+                    return res
+                x[cols] = problem.x
+                if problem.duals is not None:
+                    y[rows] = problem.duals
+            demand += inputs[:, cols] @ x[cols]
+
+        # the later components paid the unit costs for the rows they consume
+        y[exported] = np.where(np.isfinite(price[exported]), price[exported], 0)
+        if not self.is_optimal_pair(x, y):
+            print("The unit costs do not prove the composed solution optimal, solving as a whole")
+            res = super().check()
+            if is_satisfied(res):
+                print(f"Composed objective {self.c @ x:.6g}, whole objective {self.objective_value:.6g}")
+            return res
+        self.x = x
+        self.duals = y
+        self.objective_value = float(self.c @ x)
+        return optimal
+
+    def is_optimal_pair(self, x, y, tolerance=1e-7):
+        # x feasible and y dual feasible (no column with negative reduced cost) with the same objective
+        reduced = self.c - self.A.T @ y
+        upper, lower = float(self.c @ x), float(y @ self.rhs)
+        return self.is_feasible(x) and (y >= -tolerance).all() and (reduced >= -tolerance * (1 + np.abs(self.c))).all() \
+            and upper - lower <= tolerance * (1 + abs(upper))
+
+
+# Dantzig-Wolfe decomposition by planet (decomposition = "planets").
+# The columns are split into blocks (the planet of each column). Rows touched by the columns of a single block
+# belong to it, the others (the space logistics of send/receive recipes, goals without planet) are linking
+# rows of a master problem, which combines points x_p and rays r_q of the blocks:
+#   min sum c x_p l_p + sum c r_q m_q  s.t.  sum L x_p l_p + sum L r_q m_q (sense) b,  sum_p of block k l_p = 1
+# With the duals y of the linking rows and mu_k of the convexity rows, each block first looks for a ray with
+# negative reduced cost  min (c - L' y) r  s.t. its own rows with right hand side 0 and sum r <= 1,
+# and otherwise for a point  min (c - L' y) x - mu_k  s.t. its own rows.  These are added to the master until
+# none is found or the master objective is within the gap of the best Lagrangian bound y b + sum of the block
+# optima. If it stalls or reaches max_iterations with the gap still open, the problem is solved as a whole
+# instead of returning a master that is not proven optimal. The duals are smoothed towards those of the best
+# bound to keep them from jumping between the many optimal duals of a degenerate master (Wentges). The first points of a block are its cheapest solution on its
+# own and its cheapest solution of the linking rows without the other blocks, which is often already the
+# optimum. The blocks are priced in decomposition_processes worker processes. Artificial columns with a large
+# cost keep the master feasible until the blocks agree.
+
+_blocks = None # (block rows, columns, block matrix, linking matrix, cost) in the worker processes, see price_block
+_block_problems = {}
+_sense = _rhs = _link_rows = None
+
+def init_blocks(blocks, sense, rhs, link_rows):
+    global _blocks, _block_problems, _sense, _rhs, _link_rows
+    _blocks = blocks
+    _block_problems = {}
+    _sense, _rhs, _link_rows = sense, rhs, link_rows
+
+def block_problem(k, kind):
+    # the rows of block k with right hand side 0 and sum x <= 1 for rays, as they are for points,
+    # and with the linking rows for a point that satisfies them alone
+    if (k, kind) not in _block_problems:
+        rows, cols, A, L, c = _blocks[k]
+        n = len(cols)
+        if kind == "ray":
+            problem = MatrixProblem(
+                sp.vstack([A, sp.csr_matrix(np.ones((1, n)))], format="csr"),
+                np.concatenate([_sense[rows], ["<"]]), np.concatenate([np.zeros(len(rows)), [1]]),
+                c, np.zeros(n), np.full(n, np.inf),
+            )
+        elif kind == "point":
+            problem = MatrixProblem(A, _sense[rows], _rhs[rows], c, np.zeros(n), np.full(n, np.inf))
+        else:
+            problem = MatrixProblem(
+                sp.vstack([A, L], format="csr"), np.concatenate([_sense[rows], _sense[_link_rows]]),
+                np.concatenate([_rhs[rows], _rhs[_link_rows]]), c, np.zeros(n), np.full(n, np.inf),
+            )
+        _block_problems[k, kind] = problem
+    return _block_problems[k, kind]
+
+def solve_block(k, kind, cost):
+    problem = block_problem(k, kind)
+    problem.set_objective(cost)
+    if not is_satisfied(problem.check()):
+        # a warm start after an unbounded or infeasible solve can fail, try once more with a fresh solver
+        problem.backend = None
+        if not is_satisfied(problem.check()):
+            return None, None
+    return problem.objective_value, problem.x
+
+def price_block(k, duals, tolerance=1e-9):
+    # columns (block, is a ray, reduced cost without the convexity dual, solution) of block k under the duals
+    # of the linking rows: the cheapest ray if it has a negative reduced cost, otherwise the cheapest point
+    rows, cols, A, L, c = _blocks[k]
+    cost = c - L.T @ duals
+    value, x = solve_block(k, "ray", cost)
+    if value is not None and value < -tolerance:
+        return [(k, True, value, x)]
+    value, x = solve_block(k, "point", cost)
+    return [(k, False, value, x)]
+
+def seed_block(k):
+    # first points of block k for its convexity row: on its own and, if there is one, satisfying the linking rows
+    rows, cols, A, L, c = _blocks[k]
+    columns = []
+    for kind in ["alone", "point"]:
+        value, x = solve_block(k, kind, c)
+        if value is None:
+            # unbounded or infeasible, any point will do
+            value, x = solve_block(k, kind, np.zeros(len(cols)))
+        if x is not None:
+            columns.append((k, False, np.inf, x))
+    return columns
+
+
+class DantzigWolfeProblem(MatrixProblem):
+    # the arrays of MatrixProblem hold the whole problem, each check runs the decomposition on them
+    def __init__(self, A, sense, rhs, c, lb, ub, blocks, processes=None, penalty=1e3, max_iterations=200, stall_iterations=20, smoothing=0.5, gap=1e-6):
+        super().__init__(A, sense, rhs, c, lb, ub)
+        self.blocks = np.asarray(blocks)
+        self.processes = decomposition_processes if processes is None else processes
+        self.penalty = penalty
+        self.max_iterations = max_iterations
+        self.stall_iterations = stall_iterations
+        self.smoothing = smoothing
+        self.gap = gap
+
+    def decomposable(self):
+        return (self.lb == 0).all() and np.isinf(self.ub).all() and not self.integer.any()
+
+    def split(self):
+        # linking rows and per block (block rows, columns, block matrix, linking matrix, cost)
+        A = self.A.tocsc()
+        coo = A.tocoo()
+        labels, block_of_column = np.unique(self.blocks, return_inverse=True)
+        touched = sp.csr_matrix((np.ones(len(coo.row)), (coo.row, block_of_column[coo.col])), shape=(self.num_rows, len(labels)))
+        touched.data[:] = 1
+        linking = np.asarray(touched.sum(axis=1)).ravel() != 1
+        block_of_row = np.asarray(touched.argmax(axis=1)).ravel()
+        link_rows = np.flatnonzero(linking)
+        blocks = []
+        for b in range(len(labels)):
+            cols = np.flatnonzero(block_of_column == b)
+            rows = np.flatnonzero(~linking & (block_of_row == b))
+            blocks.append((rows, cols, self.A[rows][:, cols], sp.csc_matrix(A[link_rows][:, cols]), self.c[cols]))
+        return link_rows, blocks
+
+    def check(self):
+        if not self.decomposable():
+            print("Planet decomposition needs 0 <= x without integer columns, solving as a whole")
+            return super().check()
+        link_rows, blocks = self.split()
+        num_blocks = len(blocks)
+        print(f"Planet decomposition with {num_blocks} blocks and {len(link_rows)} linking rows of {self.num_rows}")
+
+        # master: linking rows, then one convexity row per block, artificial columns for the linking rows
+        link_sense = self.sense[link_rows]
+        artificial = np.concatenate([np.flatnonzero(link_sense != "<"), np.flatnonzero(link_sense != ">")])
+        signs = np.concatenate([np.ones((link_sense != "<").sum()), -np.ones((link_sense != ">").sum())])
+        master = MatrixProblem(
+            sp.csr_matrix((signs, (artificial, np.arange(len(artificial)))), shape=(len(link_rows) + num_blocks, len(artificial))),
+            np.concatenate([link_sense, np.full(num_blocks, "=")]), np.concatenate([self.rhs[link_rows], np.ones(num_blocks)]),
+            np.full(len(artificial), self.penalty * max(1, np.abs(self.c).max(initial=0))),
+            np.zeros(len(artificial)), np.full(len(artificial), np.inf),
+        )
+        solutions = [] # (block, solution) of the master columns after the artificial ones
+
+        def price(function, args):
+            if self.processes > 1:
+                priced = pool.starmap(function, args)
+            else:
+                priced = [function(*a) for a in args]
+            return [column for columns in priced for column in columns]
+
+        def add(priced):
+            # rays have no entry in the convexity rows
+            points = [j for j, (_, ray, _, _) in enumerate(priced) if not ray]
+            columns = sp.vstack([
+                sp.hstack([blocks[k][3] @ sp.csc_matrix(x[:, None]) for k, _, _, x in priced], format="csr"),
+                sp.csr_matrix((np.ones(len(points)), ([priced[j][0] for j in points], points)), shape=(num_blocks, len(priced))),
+            ], format="csc")
+            master.add_columns(columns, [blocks[k][4] @ x for k, _, _, x in priced], 0, np.inf)
+            solutions.extend((k, x) for k, _, _, x in priced)
+
+        pool = None
+        if self.processes > 1:
+            context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+            pool = context.Pool(self.processes, initializer=init_blocks, initargs=(blocks, self.sense, self.rhs, link_rows))
+        init_blocks(blocks, self.sense, self.rhs, link_rows)
+        try:
+            # every block needs a point for its convexity row
+            priced = price(seed_block, [(k,) for k in range(num_blocks)])
+            if len({k for k, _, _, _ in priced}) < num_blocks:
+                print("Planet decomposition: the rows of a planet have no solution")
+                self.x = self.duals = self.objective_value = None
+                return None
+            add(priced)
+            history = []
+            bound, center = -np.inf, None
+            converged = False
+            for iteration in range(self.max_iterations):
+                res = master.check()
+                if not is_satisfied(res):
+                    self.x = self.duals = self.objective_value = None
+                    return res
+                duals, convexity = master.duals[:len(link_rows)], master.duals[len(link_rows):]
+                tolerance = 1e-9 * max(1, abs(master.objective_value))
+                # price at duals smoothed towards those of the best bound so far, at the master duals if
+                # the smoothed ones find no column that improves the master
+                candidates = [duals] if center is None else [self.smoothing * center + (1 - self.smoothing) * duals, duals]
+                for prices in candidates:
+                    priced = price(price_block, [(k, prices) for k in range(num_blocks)])
+                    if not any(ray for _, ray, _, _ in priced):
+                        # Lagrangian bound of the whole problem
+                        value = prices @ self.rhs[link_rows] + sum(value for _, _, value, _ in priced)
+                        if value > bound:
+                            bound, center = value, prices
+                    improving = [
+                        (k, ray, value, x) for k, ray, value, x in priced
+                        if blocks[k][4] @ x - duals @ (blocks[k][3] @ x) - (0 if ray else convexity[k]) < -tolerance
+                    ]
+                    if improving:
+                        break
+                if not improving or master.objective_value - bound <= self.gap * max(1, abs(master.objective_value)):
+                    converged = True
+                    break
+                # degenerate masters can keep finding rays without moving, stop if neither the objective nor
+                # the bound improved in stall_iterations
+                history.append((master.objective_value, bound))
+                if len(history) > self.stall_iterations:
+                    (objective, old_bound), (objective_now, bound_now) = history[-self.stall_iterations-1], history[-1]
+                    if objective - objective_now <= self.gap * max(1, abs(objective_now)) and bound_now <= old_bound:
+                        print(f"Planet decomposition stalled, no improvement in {self.stall_iterations} iterations")
+                        break
+                add(improving)
+            else:
+                print(f"Planet decomposition stopped after {self.max_iterations} iterations")
+        finally:
+            if pool is not None:
+                pool.close()
+        print(f"Planet decomposition took {iteration+1} iterations and {len(solutions)} block solutions, objective {master.objective_value:.6g}, bound {bound:.6g}")
+        if not converged:
+            # the master is not proven optimal while the gap to the bound is open
+            print("Planet decomposition did not close the gap, solving as a whole")
+            return super().check()
+
+        if (master.x[:len(artificial)] > 1e-9).any():
+            print("Planet decomposition found no solution without artificial columns")
+            self.x = self.duals = self.objective_value = None
+            return None
+        x = np.zeros(self.num_cols)
+        for (k, solution), weight in zip(solutions, master.x[len(artificial):]):
+            x[blocks[k][1]] += weight * solution
+        self.x = x
+        self.duals = None
+        self.objective_value = float(self.c @ x)
+        return res
@@ -0,0 +1,702 @@
+import hashlib
+import math
+import itertools
+import json
+import multiprocessing
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+from common import *
+
+# Vectorized construction of the model built by the loop in quality_linear.py.
+# Every variable is a column with an integer id, every constraint a row of one CSR matrix:
+#   minimize c x  s.t.  A x (sense) rhs,  lb <= x <= ub
+# The keys of each column (recipe, planet, qualities, module counts) are kept in a structured
+# array so that names and results can be reconstructed from the column id alone.
+
+model_planets = all_planets + ["space"]
+
+COLUMN_INPUT = 0
+COLUMN_RECIPE = 1
+COLUMN_MACHINE = 2 # integer machine count of a recipe column (objective inputs_cost_matrix)
+
+ROW_BALANCE = 0 # planet, item, quality >= 0
+ROW_MACHINE = 1 # machine count >= machines needed by the recipe column
+
+# coefficients below this share of the largest one of their column are set to 0
+coefficient_tolerance = 1e-12
+
+column_dtype = np.dtype([
+    ("kind", np.int8),
+    ("recipe", np.int32), # index into all_recipes, -1 for inputs
+    ("item", np.int32), # index into model.items, only for inputs
+    ("planet", np.int8), # index into model_planets
+    ("quality", np.int8),
+    ("machine_quality", np.int8),
+    ("quality_modules", np.int8),
+    ("productivity_modules", np.int8),
+    ("speed_modules", np.int8),
+    ("beacons", np.int8),
+    ("link", np.int32), # recipe column <-> machine count column, -1 if there is none
+])
+
+row_dtype = np.dtype([
+    ("kind", np.int8),
+    ("planet", np.int8),
+    ("item", np.int32),
+    ("quality", np.int8),
+    ("column", np.int32), # machine count column for ROW_MACHINE
+])
+
+
+@dataclass
+class LinearModel:
+    A: sp.csr_matrix
+    sense: np.ndarray
+    rhs: np.ndarray
+    lb: np.ndarray
+    ub: np.ndarray
+    columns: np.ndarray # column_dtype
+    rows: np.ndarray # row_dtype
+    items: list[str]
+    # per column, only meaningful for recipe columns
+    machines_per_craft: np.ndarray # machines needed per recipe amount
+    productivity: np.ndarray
+    quality_bonus: np.ndarray
+    item_index: dict[str, int] = field(default_factory=dict)
+    balance_index: dict[tuple[int, int, int], int] = field(default_factory=dict) # (planet, item, quality) -> row
+
+    @property
+    def num_rows(self):
+        return self.A.shape[0]
+
+    @property
+    def num_cols(self):
+        return self.A.shape[1]
+
+    def recipe_columns(self):
+        return np.flatnonzero(self.columns["kind"] == COLUMN_RECIPE)
+
+    def balance_rows(self):
+        return np.flatnonzero(self.rows["kind"] == ROW_BALANCE)
+
+    def balance_row(self, planet, item, quality) -> Optional[int]:
+        if item not in self.item_index:
+            return None
+        return self.balance_index.get((model_planets.index(planet), self.item_index[item], quality))
+
+    def row_expression(self, rows) -> sp.csr_matrix:
+        # sum of the given rows as a 1 x n matrix
+        rows = [r for r in rows if r is not None]
+        if not rows:
+            return sp.csr_matrix((1, self.num_cols))
+        return sp.csr_matrix(self.A[rows].sum(axis=0))
+
+    def machine_vector(self, per_machine: np.ndarray) -> np.ndarray:
+        # turns a value per machine of each recipe column into a vector over columns:
+        # either on the integer machine count column or scaled on the recipe column itself
+        c = np.zeros(self.num_cols)
+        recipe_cols = self.recipe_columns()
+        link = self.columns["link"][recipe_cols]
+        values = per_machine[recipe_cols]
+        linked = link >= 0
+        np.add.at(c, link[linked], values[linked])
+        np.add.at(c, recipe_cols[~linked], values[~linked] * self.machines_per_craft[recipe_cols[~linked]])
+        return c
+
+    def machine_matrix(self, row_of_column: np.ndarray, per_machine: np.ndarray, num_rows: int) -> sp.csr_matrix:
+        # like machine_vector, but each recipe column contributes to the row given by row_of_column (-1 for none)
+        recipe_cols = self.recipe_columns()
+        recipe_cols = recipe_cols[row_of_column[recipe_cols] >= 0]
+        link = self.columns["link"][recipe_cols]
+        linked = link >= 0
+        carrier = np.where(linked, link, recipe_cols)
+        values = per_machine[recipe_cols] * np.where(linked, 1, self.machines_per_craft[recipe_cols])
+        return sp.csr_matrix((values, (row_of_column[recipe_cols], carrier)), shape=(num_rows, self.num_cols))
+
+    def column_name(self, j: int) -> str:
+        col = self.columns[j]
+        planet = model_planets[col["planet"]]
+        if col["kind"] == COLUMN_INPUT:
+            return f"resource_{self.items[col['item']]}_{planet}_q0"
+        recipe = all_recipes[col["recipe"]]
+        if col["kind"] == COLUMN_RECIPE:
+            prefix = f"recipe_{col['recipe']}_{recipe.name.replace(' ', '-')}"
+        else:
+            prefix = f"machine_count_{col['recipe']}_{recipe.machine.name.replace(' ', '-')}"
+        return f"{prefix}_{planet}_qr{col['quality']}_qm{col['machine_quality']}_nq{col['quality_modules']}_np{col['productivity_modules']}_ns{col['speed_modules']}_nb{col['beacons']}"
+
+    def row_name(self, i: int) -> str:
+        row = self.rows[i]
+        if row["kind"] == ROW_MACHINE:
+            return f"link_{self.column_name(row['column'])}"
+        return f"balance_{self.items[row['item']]}_{model_planets[row['planet']]}_q{row['quality']}"
+
+
+_configuration_cache = {}
+
+def module_configurations(max_quality_modules, module_slots, accepts_productivity, accepts_speed, max_beacons):
+    # (num_quality_modules, num_productivity_modules, num_speed_modules, num_beacons) in the order of the loop builder
+    key = (max_quality_modules, module_slots, accepts_productivity, accepts_speed, max_beacons)
+    if key not in _configuration_cache:
+        configurations = []
+        for num_quality_modules in range(max_quality_modules+1):
+            max_prod_modules = module_slots - num_quality_modules if accepts_productivity else 0
+            for num_productivity_modules in range(max_prod_modules+1):
+                max_speed_modules = module_slots - num_quality_modules - num_productivity_modules if accepts_speed else 0
+                for num_speed_modules, num_beacons in itertools.product(range(max_speed_modules+1), range(max_beacons+1)):
+                    configurations.append((num_quality_modules, num_productivity_modules, num_speed_modules, num_beacons))
+        _configuration_cache[key] = np.array(configurations, dtype=np.int8).reshape(-1, 4)
+    return _configuration_cache[key]
+
+
+def configuration_effects(recipe, configurations):
+    # speed, productivity and quality bonus of each configuration, same clamping as the loop builder
+    nq, npr, ns, nb = (configurations[:, i].astype(float) for i in range(4))
+    effective_num_speed_modules = ns + np.sqrt(nb) * beacon.distribution_efficiency * 2
+
+    speed_bonus = 1 + speed_module.speed_bonus * effective_num_speed_modules \
+        + quality_module.speed_bonus * nq \
+        + productivity_module.speed_bonus * npr
+    speed_bonus = np.maximum(0.2, speed_bonus)
+
+    productivity_bonus = 1 + recipe.productivity + recipe.machine.productivity \
+        + productivity_module.productivity_bonus * npr \
+        + quality_module.productivity_bonus * nq \
+        + speed_module.productivity_bonus * effective_num_speed_modules
+    productivity_bonus = np.maximum(1.0, productivity_bonus)
+
+    quality_bonus = quality_module.quality_bonus * nq \
+        + productivity_module.quality_bonus * npr \
+        + speed_module.quality_bonus * effective_num_speed_modules
+    quality_bonus = np.maximum(0, quality_bonus)
+
+    return speed_bonus, productivity_bonus, quality_bonus
+
+
+class EffectTable:
+    # effects of every module/beacon configuration a recipe can use, shared by both builders and the reports:
+    # (configurations, speed bonus, productivity bonus, quality bonus, machines per second of crafting time
+    # at each machine quality). They only depend on the machine, the configurations and the base productivity.
+    # Stored in effect_table_file if set and reused as long as modules, beacons and limits are the same
+    def __init__(self):
+        self.fingerprint = repr((speed_module, quality_module, productivity_module, beacon, max_beacons_per_machine, max_quality))
+        self.entries = {}
+        self.changed = False
+
+    @staticmethod
+    def key(recipe):
+        max_quality_modules = recipe.machine.module_slots if not(all(out in fluids for out in recipe.outputs)) and recipe.accepts_quality_module else 0
+        return repr((recipe.machine.name, recipe.machine.qspeed, max_quality_modules, recipe.accepts_productivity, recipe.accepts_speed, recipe.productivity + recipe.machine.productivity))
+
+    def lookup(self, recipe):
+        key = self.key(recipe)
+        if key not in self.entries:
+            configurations = recipe_configurations(recipe)
+            speed_bonus, productivity_bonus, quality_bonus = configuration_effects(recipe, configurations)
+            qspeed = np.array(recipe.machine.qspeed[:min(max_quality, recipe.machine.max_quality)+1], dtype=float)
+            self.entries[key] = (configurations, speed_bonus, productivity_bonus, quality_bonus, 1 / (qspeed[:, None] * speed_bonus[None, :]))
+            self.changed = True
+        return self.entries[key]
+
+    def load(self, filename):
+        with open(filename, "r") as f:
+            data = json.load(f)
+        if data["fingerprint"] != self.fingerprint:
+            return
+        for key, (configurations, speed_bonus, productivity_bonus, quality_bonus, machine_time) in data["entries"].items():
+            self.entries[key] = (
+                np.array(configurations, dtype=np.int8).reshape(-1, 4),
+                np.array(speed_bonus), np.array(productivity_bonus), np.array(quality_bonus),
+                np.array(machine_time).reshape(-1, len(speed_bonus)),
+            )
+
+    def save(self, filename):
+        entries = {key: [values.tolist() for values in entry] for key, entry in self.entries.items()}
+        with open(filename, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, f)
+        self.changed = False
+
+
+_effect_table = None
+
+def effect_table() -> EffectTable:
+    global _effect_table
+    if _effect_table is None:
+        _effect_table = EffectTable()
+        if effect_table_file is not None and os.path.exists(effect_table_file):
+            _effect_table.load(effect_table_file)
+    return _effect_table
+
+def save_effect_table():
+    if effect_table_file is not None and effect_table().changed:
+        effect_table().save(effect_table_file)
+
+
+def recipe_quality_range(recipe):
+    accepts_quality = not(all(out in fluids for out in recipe.outputs)) and not(all(inp in fluids for inp in recipe.inputs)) and recipe.accepts_quality
+    quality_range = list(range(max_quality+1)) if accepts_quality else [0]
+    if recipe.forced_quality is not None:
+        quality_range = [recipe.forced_quality]
+    return accepts_quality, quality_range
+
+
+def recipe_planets(recipe):
+    return [
+        planet for planet in recipe.allowed_planets
+        if planet in recipe.machine.allowed_planets and planet not in exclude_planets
+    ]
+
+
+def recipe_configurations(recipe):
+    max_quality_modules = recipe.machine.module_slots if not(all(out in fluids for out in recipe.outputs)) and recipe.accepts_quality_module else 0
+    max_beacons = max_beacons_per_machine if recipe.accepts_speed else 0
+    return module_configurations(max_quality_modules, recipe.machine.module_slots, recipe.accepts_productivity, recipe.accepts_speed, max_beacons)
+
+
+_quality_kernel_cache = {}
+
+def quality_kernel(max_quality):
+    # the share of an output crafted at quality q that ends up at quality q2 is T[q, q2] = I + quality_bonus * D:
+    # quality_bonus / 10^(q2-q-1), times 0.9 below the highest quality, and the rest stays at q.
+    # Rows for all rarities, recipes with a forced quality may be above max_quality
+    if max_quality not in _quality_kernel_cache:
+        D = np.zeros((len(rarities), len(rarities)))
+        for q in range(max_quality+1):
+            for q2 in range(q+1, max_quality+1):
+                D[q, q2] = 0.1 ** (q2-q-1) * (0.9 if q2 != max_quality else 1)
+            D[q, q] = -D[q].sum()
+        _quality_kernel_cache[max_quality] = D
+    return _quality_kernel_cache[max_quality]
+
+def quality_distribution(q, quality_bonus):
+    # share of the output at each quality for a recipe crafted at quality q, shape quality_bonus.shape + (len(rarities),)
+    quality_bonus = np.asarray(quality_bonus, dtype=float)
+    distribution = quality_bonus[..., None] * quality_kernel(max_quality)[q]
+    distribution[..., q] += 1
+    # a quality bonus of 100% leaves 1 - 0.9 - 0.1 at q, a rounding residue instead of 0
+    distribution[np.abs(distribution) < coefficient_tolerance] = 0
+    return distribution
+
+
+def output_coefficients(recipe, q, accepts_quality, productivity_bonus, quality_bonus):
+    # (resource, output quality, amount per recipe amount for each configuration)
+    distribution = quality_distribution(q, quality_bonus) if accepts_quality else None
+    for resource, resource_amount in recipe.outputs.items():
+        in_amount = recipe.inputs.get(resource, 0)
+        base_amount = np.maximum(resource_amount, in_amount + (resource_amount - in_amount) * productivity_bonus)
+
+        output_quality = recipe.forced_output_quality.get(resource, q) if resource not in fluids else 0
+        is_forced_quality = resource in recipe.forced_output_quality or resource in fluids
+        if accepts_quality and not is_forced_quality:
+            yield resource, q, base_amount * distribution[:, q]
+            for q2 in range(q+1, max_quality+1):
+                yield resource, q2, base_amount * distribution[:, q2]
+        else:
+            yield resource, output_quality, base_amount
+
+
+def recipe_templates(ri, recipe, quality_range, select_configurations):
+    # columns and coefficients per recipe quality, the same on every planet
+    accepts_quality, _ = recipe_quality_range(recipe)
+    configurations, *effects, machine_time = effect_table().lookup(recipe)
+    num_machine_qualities = min(max_quality, recipe.machine.max_quality) + 1
+    machine_qualities = np.arange(num_machine_qualities)
+    templates = []
+    for q in quality_range:
+        keep = np.arange(len(configurations)) if select_configurations is None else select_configurations(ri, recipe, q, configurations, effects)
+        q_configurations = configurations[keep]
+        _, productivity_bonus, recipe_quality_bonus = (effect[keep] for effect in effects)
+        num_configurations = len(q_configurations)
+        block_size = num_machine_qualities * num_configurations
+        if block_size == 0:
+            continue
+
+        block = np.zeros(block_size, dtype=column_dtype)
+        block["kind"] = COLUMN_RECIPE
+        block["recipe"] = ri
+        block["item"] = -1
+        block["quality"] = q
+        block["machine_quality"] = np.repeat(machine_qualities, num_configurations)
+        for i, name in enumerate(["quality_modules", "productivity_modules", "speed_modules", "beacons"]):
+            block[name] = np.tile(q_configurations[:, i], num_machine_qualities)
+        block["link"] = -1
+        # machines per recipe amount, shape (machine quality, configuration)
+        machine_factor = (recipe.crafting_time * machine_time[:, keep]).ravel()
+
+        def per_column(values):
+            return np.broadcast_to(values, (num_machine_qualities, num_configurations)).ravel()
+
+        inputs = [
+            (resource, recipe.forced_input_quality.get(resource, q) if resource not in fluids else 0, per_column(-resource_amount))
+            for resource, resource_amount in recipe.inputs.items()
+        ]
+        outputs = [
+            (resource, output_quality, per_column(amount))
+            for resource, output_quality, amount in output_coefficients(recipe, q, accepts_quality, productivity_bonus, recipe_quality_bonus)
+        ]
+        templates.append((q, block, machine_factor, per_column(productivity_bonus), per_column(recipe_quality_bonus), inputs, outputs))
+    return templates
+
+
+def recipe_setup(ri, recipe, select_recipes, recipe_quality_cap):
+    # planets the recipe gets columns on, the highest quality per planet and the qualities of its templates
+    _, quality_range = recipe_quality_range(recipe)
+    planets = recipe_planets(recipe)
+    if select_recipes is not None:
+        planets = [planet for planet in planets if select_recipes(ri, planet)]
+    recipe_caps = {planet: recipe_quality_cap(ri, planet) if recipe_quality_cap is not None else len(rarities) for planet in planets}
+    quality_range = [q for q in quality_range if q <= max(recipe_caps.values(), default=-1)]
+    return planets, recipe_caps, quality_range
+
+
+def planet_blocks(ri, recipe, planet, templates, recipe_cap, item_quality_cap):
+    # one block per template on the planet: (recipe index, planet, columns, machines per craft, productivity,
+    # quality bonus, balance entries as (planet, item, quality, values)), columns without link and planet yet
+    input_planet = recipe.forced_input_planet if recipe.forced_input_planet is not None else planet
+    output_planet = recipe.forced_output_planet if recipe.forced_output_planet is not None else planet
+    blocks = []
+    for q, block, machine_factor, block_productivity, block_quality_bonus, inputs, outputs in templates:
+        if q > recipe_cap:
+            continue
+        entries = []
+        for resource_planet, resource_entries, is_output in [(input_planet, inputs, False), (output_planet, outputs, True)]:
+            for resource, resource_quality, values in resource_entries:
+                # surplus above the highest useful quality can not be used
+                if is_output and item_quality_cap is not None and resource_quality > item_quality_cap(resource, resource_planet):
+                    continue
+                entries.append((resource_planet, resource, resource_quality, values))
+        blocks.append((ri, planet, block, machine_factor, block_productivity, block_quality_bonus, entries))
+    return blocks
+
+
+def build_planet(planet, select_configurations, select_recipes, recipe_quality_cap, item_quality_cap):
+    # all blocks of one planet, run in a worker process by build_model
+    if hasattr(select_configurations, "for_planet"):
+        select_configurations = select_configurations.for_planet(planet)
+    blocks = []
+    for ri, recipe in enumerate(all_recipes):
+        planets, recipe_caps, quality_range = recipe_setup(ri, recipe, select_recipes, recipe_quality_cap)
+        if planet not in planets:
+            continue
+        templates = recipe_templates(ri, recipe, quality_range, select_configurations)
+        blocks += planet_blocks(ri, recipe, planet, templates, recipe_caps[planet], item_quality_cap)
+    return blocks, select_configurations
+
+
+def build_model(integer_machines=None, select_configurations=None, select_recipes=None, recipe_quality_cap=None, item_quality_cap=None, processes=None) -> LinearModel:
+    # select_configurations(ri, recipe, q, configurations, effects) returns the indices of the
+    # configurations that get columns for the recipe at quality q, all of them if not given.
+    # select_recipes(ri, planet) tells whether the recipe gets columns on the planet,
+    # recipe_quality_cap(ri, planet) and item_quality_cap(item, planet) the highest quality of its
+    # columns and of the balance rows.
+    # With processes > 1 the planets are built in worker processes and merged in the same order, the
+    # hooks have to be picklable then and select_configurations may provide for_planet and merge
+    if integer_machines is None:
+        integer_machines = objective == "inputs_cost_matrix"
+    if processes is None:
+        processes = build_processes
+
+    blocks = []
+    if processes > 1:
+        # the effects are computed once here, forked workers inherit them and they end up in effect_table_file
+        for recipe in all_recipes:
+            effect_table().lookup(recipe)
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        with context.Pool(processes) as pool:
+            results = pool.starmap(build_planet, [
+                (planet, select_configurations, select_recipes, recipe_quality_cap, item_quality_cap) for planet in model_planets
+            ])
+        by_recipe_planet = defaultdict(list)
+        for built, planet_selection in results:
+            for block in built:
+                by_recipe_planet[(block[0], block[1])].append(block)
+            if hasattr(select_configurations, "merge"):
+                select_configurations.merge(planet_selection)
+        # the order of the serial build: recipes, their planets, qualities
+        for ri, recipe in enumerate(all_recipes):
+            for planet in recipe_planets(recipe):
+                blocks += by_recipe_planet[(ri, planet)]
+    else:
+        for ri, recipe in enumerate(all_recipes):
+            planets, recipe_caps, quality_range = recipe_setup(ri, recipe, select_recipes, recipe_quality_cap)
+            if not planets:
+                continue
+            templates = recipe_templates(ri, recipe, quality_range, select_configurations)
+            for planet in planets:
+                blocks += planet_blocks(ri, recipe, planet, templates, recipe_caps[planet], item_quality_cap)
+    model = assemble_model(blocks, integer_machines)
+    save_effect_table()
+    return model
+
+
+def assemble_model(blocks, integer_machines) -> LinearModel:
+    # input columns, then the blocks with their machine count columns, balance rows in order of first use
+    items: list[str] = []
+    item_index: dict[str, int] = {}
+    balance_index: dict[tuple[int, int, int], int] = {}
+    balance_keys: list[tuple[int, int, int]] = []
+
+    def item_id(item):
+        if item not in item_index:
+            item_index[item] = len(items)
+            items.append(item)
+        return item_index[item]
+
+    def balance_row(planet, item, quality):
+        key = (model_planets.index(planet), item_id(item), quality)
+        if key not in balance_index:
+            balance_index[key] = len(balance_keys)
+            balance_keys.append(key)
+        return balance_index[key]
+
+    # coordinate form of A, columns and link rows are collected blockwise
+    entry_rows, entry_cols, entry_vals = [], [], []
+    column_blocks = []
+    machines_per_craft, productivity, quality_bonus = [], [], []
+    link_rows = [] # (machine column, recipe column, machines per craft) blocks
+    num_cols = 0
+
+    input_columns = []
+    for planet, planet_resources in inputs_per_planet.items():
+        for resource, scaling in planet_resources.items():
+            input_columns.append((item_id(resource), model_planets.index(planet)))
+            entry_rows.append(np.array([balance_row(planet, resource, 0)]))
+            entry_cols.append(np.array([num_cols]))
+            entry_vals.append(np.array([1.0]))
+            num_cols += 1
+    block = np.zeros(len(input_columns), dtype=column_dtype)
+    block["kind"] = COLUMN_INPUT
+    block["recipe"] = -1
+    block["link"] = -1
+    block["item"] = [i for i, _ in input_columns]
+    block["planet"] = [p for _, p in input_columns]
+    column_blocks.append(block)
+    for values in (machines_per_craft, productivity, quality_bonus):
+        values.append(np.zeros(len(input_columns)))
+
+    for ri, planet, block, machine_factor, block_productivity, block_quality_bonus, entries in blocks:
+        recipe = all_recipes[ri]
+        block_size = len(block)
+        cols = np.arange(num_cols, num_cols + block_size)
+        num_cols += block_size
+
+        block = block.copy()
+        block["planet"] = model_planets.index(planet)
+        machines_per_craft.append(machine_factor)
+        productivity.append(block_productivity)
+        quality_bonus.append(block_quality_bonus)
+
+        if integer_machines and recipe.machine.underlying_item is not None:
+            machine_cols = np.arange(num_cols, num_cols + block_size)
+            num_cols += block_size
+            block["link"] = machine_cols
+            machine_block = block.copy()
+            machine_block["kind"] = COLUMN_MACHINE
+            machine_block["link"] = cols
+            column_blocks.append(block)
+            column_blocks.append(machine_block)
+            link_rows.append((machine_cols, cols, machine_factor))
+            machines_per_craft.append(np.zeros(block_size))
+            productivity.append(np.zeros(block_size))
+            quality_bonus.append(np.zeros(block_size))
+        else:
+            column_blocks.append(block)
+
+        for resource_planet, resource, resource_quality, values in entries:
+            entry_rows.append(np.full(block_size, balance_row(resource_planet, resource, resource_quality)))
+            entry_cols.append(cols)
+            entry_vals.append(values)
+
+    num_balance = len(balance_keys)
+    rows = np.zeros(num_balance, dtype=row_dtype)
+    rows["kind"] = ROW_BALANCE
+    rows["column"] = -1
+    if balance_keys:
+        rows["planet"], rows["item"], rows["quality"] = np.array(balance_keys).T
+
+    # machine count - machines per craft * recipe amount >= 0
+    num_rows = num_balance
+    link_row_blocks = []
+    for machine_cols, recipe_cols, factor in link_rows:
+        link = np.arange(num_rows, num_rows + len(machine_cols))
+        num_rows += len(machine_cols)
+        entry_rows += [link, link]
+        entry_cols += [machine_cols, recipe_cols]
+        entry_vals += [np.ones(len(machine_cols)), -factor]
+        block = np.zeros(len(machine_cols), dtype=row_dtype)
+        block["kind"] = ROW_MACHINE
+        block["planet"] = -1
+        block["item"] = -1
+        block["quality"] = -1
+        block["column"] = machine_cols
+        link_row_blocks.append(block)
+
+    A = sp.csr_matrix(
+        (np.concatenate(entry_vals), (np.concatenate(entry_rows), np.concatenate(entry_cols))),
+        shape=(num_rows, num_cols)
+    )
+    A.sum_duplicates()
+    # inputs and outputs of the same item cancel up to rounding, such residue would dominate the scaling
+    column_max = np.zeros(num_cols)
+    np.maximum.at(column_max, A.indices, np.abs(A.data))
+    A.data[np.abs(A.data) < coefficient_tolerance * column_max[A.indices]] = 0
+    A.eliminate_zeros()
+
+    return LinearModel(
+        A=A,
+        sense=np.full(num_rows, ">"),
+        rhs=np.zeros(num_rows),
+        lb=np.zeros(num_cols),
+        ub=np.full(num_cols, np.inf),
+        columns=np.concatenate(column_blocks),
+        rows=np.concatenate([rows] + link_row_blocks),
+        items=items,
+        machines_per_craft=np.concatenate(machines_per_craft),
+        productivity=np.concatenate(productivity),
+        quality_bonus=np.concatenate(quality_bonus),
+        item_index=item_index,
+        balance_index=balance_index,
+    )
+
+
+#region Model cache
+# A built model is stored in model_cache_dir as one .npy file per array and loaded memory-mapped (copy on write)
+# by later runs with the same catalog, modules, beacons, qualities and selection hooks. Goal, availability
+# and objective rows are not part of the model, so a changed goal only needs new rows as long as the
+# pruning keeps the same recipes and qualities.
+
+model_arrays = ["sense", "rhs", "lb", "ub", "columns", "rows", "machines_per_craft", "productivity", "quality_bonus"]
+
+def model_fingerprint(key) -> str:
+    # everything build_model depends on besides the hooks, whose state is passed as key
+    catalog = (
+        all_recipes, speed_module, quality_module, productivity_module, beacon, beacon_sharedness,
+        max_beacons_per_machine, max_quality, exclude_planets, item_productivity, inputs_per_planet, key,
+    )
+    return hashlib.sha256(repr(catalog).encode()).hexdigest()[:16]
+
+def save_model(model: LinearModel, directory):
+    os.makedirs(directory, exist_ok=True)
+    for name in model_arrays:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(model, name))
+    for name in ["data", "indices", "indptr"]:
+        np.save(os.path.join(directory, f"A_{name}.npy"), getattr(model.A, name))
+    # written last, a directory without it is incomplete
+    with open(os.path.join(directory, "model.json"), "w") as f:
+        json.dump({
+            "shape": model.A.shape,
+            "items": model.items,
+            "balance_index": [[*key, row] for key, row in model.balance_index.items()],
+        }, f)
+
+def load_model(directory) -> Optional[LinearModel]:
+    if not os.path.exists(os.path.join(directory, "model.json")):
+        return None
+    with open(os.path.join(directory, "model.json"), "r") as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="c") for name in model_arrays}
+    data, indices, indptr = (np.load(os.path.join(directory, f"A_{name}.npy"), mmap_mode="c") for name in ["data", "indices", "indptr"])
+    return LinearModel(
+        A=sp.csr_matrix((data, indices, indptr), shape=tuple(meta["shape"]), copy=False),
+        items=meta["items"],
+        item_index={item: i for i, item in enumerate(meta["items"])},
+        balance_index={(planet, item, quality): row for planet, item, quality, row in meta["balance_index"]},
+        **arrays,
+    )
+
+def cached_build_model(key, **kwargs) -> tuple[LinearModel, bool]:
+    # build_model(**kwargs) or the model stored for key, and whether it was loaded
+    if model_cache_dir is None:
+        return build_model(**kwargs), False
+    directory = os.path.join(model_cache_dir, model_fingerprint(key))
+    model = load_model(directory)
+    if model is not None:
+        print(f"Loaded model from {directory}")
+        return model, True
+    model = build_model(**kwargs)
+    save_model(model, directory)
+    return model, False
+#endregion
+
+
+#region Objectives
+hours_of_amortization = 1
+
+def input_cost(model: LinearModel) -> np.ndarray:
+    c = np.zeros(model.num_cols)
+    for j in np.flatnonzero(model.columns["kind"] == COLUMN_INPUT):
+        col = model.columns[j]
+        c[j] = inputs_per_planet[model_planets[col["planet"]]][model.items[col["item"]]]
+    return c
+
+def module_usage(model: LinearModel) -> dict[str, np.ndarray]:
+    # modules and beacons needed per machine of each recipe column
+    cols = model.columns
+    return {
+        "speed": cols["speed_modules"] + cols["beacons"] * beacon_sharedness * 2,
+        "quality": cols["quality_modules"].astype(float),
+        "productivity": cols["productivity_modules"].astype(float),
+        "beacons": cols["beacons"] * beacon_sharedness,
+    }
+
+def machine_cost(model: LinearModel) -> np.ndarray:
+    return model.machine_vector(1 + sum(module_usage(model).values()))
+
+def space_travel_cost(model: LinearModel) -> np.ndarray:
+    cols = model.columns
+    recipe_machines = np.array([recipe.machine is rocket for recipe in all_recipes])
+    per_machine = (cols["kind"] == COLUMN_RECIPE) \
+        & recipe_machines[cols["recipe"]] \
+        & np.isin(cols["planet"], [model_planets.index(planet) for planet in all_planets]) \
+        & (cols["machine_quality"] == 0)
+    return model.machine_vector(per_machine.astype(float))
+
+def overhead_cost(model: LinearModel) -> np.ndarray:
+    return np.asarray(model.A[model.balance_rows()].sum(axis=0)).ravel()
+
+def amortized_cost(model: LinearModel) -> np.ndarray:
+    # input costs plus machines, modules and beacons priced by the cost matrix
+    cols = model.columns
+    usage = module_usage(model)
+    per_machine = np.zeros(model.num_cols)
+    recipe_cols = model.recipe_columns()
+    for (ri, planet, machine_q), group in group_columns(cols[recipe_cols], ["recipe", "planet", "machine_quality"]):
+        machine = all_recipes[ri].machine
+        planet = model_planets[planet]
+        cost = 0
+        if machine.underlying_item is not None:
+            cost = cost_matrix[planet][machine.underlying_item][machine_q]
+        group = recipe_cols[group]
+        per_machine[group] = cost \
+            + usage["speed"][group] * cost_matrix[planet][speed_module.underlying_item][speed_module.underlying_quality] \
+            + usage["quality"][group] * cost_matrix[planet][quality_module.underlying_item][quality_module.underlying_quality] \
+            + usage["productivity"][group] * cost_matrix[planet][productivity_module.underlying_item][productivity_module.underlying_quality] \
+            + usage["beacons"][group] * cost_matrix[planet][beacon.underlying_item][beacon.underlying_quality]
+    c = input_cost(model) + model.machine_vector(per_machine / (3600 * hours_of_amortization))
+    if reduce_space_travel:
+        c += space_travel_cost(model) * 100000
+    return c
+
+def group_columns(records, fields):
+    # groups record indices by the given fields, yields (key, indices)
+    keys = np.stack([records[f].astype(np.int64) for f in fields], axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(unique)+1))
+    for i, key in enumerate(unique):
+        yield tuple(int(k) for k in key), order[bounds[i]:bounds[i+1]]
+
+def goal_rows(model: LinearModel, goals) -> sp.csr_matrix:
+    # one row per goal, summing the balance rows of all planets if the goal has no planet
+    expressions = []
+    for g in goals:
+        planets = [g["planet"]] if g["planet"] is not None else model_planets
+        expressions.append(model.row_expression([model.balance_row(planet, g["item"], g["quality"]) for planet in planets]))
+    return sp.vstack(expressions, format="csr") if expressions else sp.csr_matrix((0, model.num_cols))
+#endregion
@@ -0,0 +1,139 @@
+import itertools
+import multiprocessing
+import sys
+
+import numpy as np
+
+import common
+import linear_model
+from common import *
+from solver import *
+from linear_model import *
+from presolve import ConfigurationPruning, PresolvedProblem, RecipePruning
+from scaling import ScaledProblem
+
+# Search over the module and beacon tiers (module_search in common.py) instead of the ones fixed in common.py.
+# Every combination gets the LP of its own model, built and solved in one of module_search_processes workers.
+# For the LP objectives this evaluates the whole grid, nothing is pruned. For inputs_cost_matrix, whose machine
+# counts are integer, the LP is a lower bound: the combinations are solved completely in the order of their
+# bounds, a batch per round, until the next bound is not below the best solution found; all combinations after
+# it are pruned.
+
+
+def set_common(**values):
+    # replaces common.<name> in every module that imported it with from common import *
+    for name, value in values.items():
+        old = getattr(common, name)
+        for module in list(sys.modules.values()):
+            if getattr(module, name, None) is old:
+                setattr(module, name, value)
+    # the effects depend on the modules and beacon
+    linear_model._effect_table = None
+
+
+def use_modules(combination):
+    (speed_level, speed_quality), (productivity_level, productivity_quality), (quality_level, quality_quality), beacon_quality = combination
+    set_common(
+        speed_module=speed_modules[speed_level][speed_quality],
+        productivity_module=productivity_modules[productivity_level][productivity_quality],
+        quality_module=quality_modules[quality_level][quality_quality],
+        beacon=beacons[beacon_quality],
+    )
+
+
+def combination_name(combination):
+    (speed_level, speed_quality), (productivity_level, productivity_quality), (quality_level, quality_quality), beacon_quality = combination
+    return ", ".join([
+        speed_modules[speed_level][speed_quality].name,
+        productivity_modules[productivity_level][productivity_quality].name,
+        quality_modules[quality_level][quality_quality].name,
+        beacons[beacon_quality].name,
+    ])
+
+
+def combination_problem():
+    # model and problem of the configured objective and goal with the current modules, objective set
+    from quality_matrix import objective_setup
+
+    recipes = RecipePruning()
+    pruning = ConfigurationPruning(recipes=recipes)
+    model, _ = cached_build_model(
+        (objective == "inputs_cost_matrix", recipes.cache_key(), pruning.cache_key()),
+        select_configurations=pruning,
+        select_recipes=recipes,
+        recipe_quality_cap=recipes.recipe_quality_cap,
+        item_quality_cap=recipes.item_quality_cap,
+        # no worker processes of their own
+        processes=1,
+    )
+    problem_type = PresolvedProblem if matrix_presolve else ScaledProblem if matrix_scaling else MatrixProblem
+    problem = problem_type(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    c, rows = objective_setup(model)
+    for A, sense, rhs in rows:
+        problem.add_rows(A, sense, rhs)
+    problem.set_objective(c)
+    return model, problem
+
+
+def evaluate(combination, complete):
+    # (combination, LP bound or, if complete, objective with whole machine counts), None without a solution
+    from quality_matrix import integer_machine_counts
+
+    # the workers do not share effect_table_file
+    linear_model.effect_table_file = None
+    use_modules(combination)
+    model, problem = combination_problem()
+    if not is_satisfied(problem.check()):
+        return combination, None
+    if complete and objective == "inputs_cost_matrix":
+        integer_machine_counts(model, problem)
+        if not is_satisfied(problem.check()):
+            return combination, None
+    return combination, problem.objective_value
+
+
+def search_modules(processes=None, tolerance=1e-9):
+    # best combination of module_search for the configured goal, as (objective, combination)
+    if processes is None:
+        processes = module_search_processes
+    combinations = list(itertools.product(module_search["speed"], module_search["productivity"], module_search["quality"], module_search["beacon"]))
+    print(f"Module search over {len(combinations)} combinations")
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    with context.Pool(processes) as pool:
+        bounds = sorted((value, combination) for combination, value in pool.starmap(evaluate, [(c, False) for c in combinations]) if value is not None)
+        if not bounds:
+            print("No combination has a solution")
+            return None
+        if objective != "inputs_cost_matrix":
+            best, solved = bounds[0], 0
+        else:
+            best, solved = (np.inf, None), 0
+            # no solution yet leaves best[0] infinite, inf - inf would be nan and end the loop
+            while solved < len(bounds) and (best[1] is None or bounds[solved][0] < best[0] - tolerance * max(1, abs(best[0]))):
+                batch = [combination for value, combination in bounds[solved:solved + processes] if value < best[0]]
+                solved += processes
+                for combination, value in pool.starmap(evaluate, [(c, True) for c in batch]):
+                    if value is not None and value < best[0]:
+                        best = (value, combination)
+            solved = min(solved, len(bounds))
+            print(f"Module search solved {solved} combinations completely, pruned {len(bounds) - solved} by their LP bound")
+    print("Lowest LP bounds:")
+    for value, combination in bounds[:10]:
+        print(f"  {value:.6g}: {combination_name(combination)}")
+    if best[1] is None:
+        print("No combination has a solution with whole machine counts")
+        return None
+    print(f"Best combination ({best[0]:.6g}): {combination_name(best[1])}")
+    return best
+
+
+def search_modules_per_goal():
+    # search_modules for goal or each goal list of goal_batch
+    results = []
+    for goals in [goal] if goal_batch is None else goal_batch:
+        names = [f"{g['amount']} {itemName(g['item'])} ({qualityName(g['quality'], padding=False)})" for g in goals]
+        print(f"Goal: {', '.join(names)}")
+        set_common(goal=goals)
+        results.append(search_modules())
+        print()
+    return results
@@ -0,0 +1,85 @@
+import numpy as np
+
+from common import *
+from solver import *
+from linear_model import *
+
+# Parametric analysis of the LP in one parameter t (parametric in common.py): the right hand side of a goal row
+# or the weight of a cost added to the objective. The optimal objective z(t) is piecewise linear, convex in a
+# right hand side and concave in an objective weight, and the optimal basis stays the same between breakpoints.
+# Each solve gives z(t) and its slope: the dual of the goal row, or the added cost of the solution. Two
+# tangents meet at a point that is a breakpoint if z touches them there, otherwise it splits the interval
+# (Eisner-Severance), so k segments take about 2k solves and the breakpoints are exact up to the LP tolerance.
+
+
+def trace_breakpoints(solve, low, high, tolerance=1e-9):
+    # solve(t) -> (z(t), slope) or None; returns the breakpoints (t, z(t)) between low and high and the solves needed
+    solves = [0]
+
+    def evaluate(t):
+        solves[0] += 1
+        result = solve(t)
+        return None if result is None else (t, *result)
+
+    def between(a, b):
+        (ta, za, sa), (tb, zb, sb) = a, b
+        scale = 1 + max(abs(za), abs(zb))
+        if abs(sa - sb) * (tb - ta) <= tolerance * scale:
+            return []
+        t = (zb - sb * tb - za + sa * ta) / (sa - sb)
+        if not ta < t < tb:
+            return []
+        p = evaluate(t)
+        if p is None:
+            raise ValueError(f"No solution at {t}")
+        if abs(p[1] - (za + sa * (t - ta))) <= tolerance * scale:
+            return [(t, p[1])]
+        return between(a, p) + between(p, b)
+
+    a, b = evaluate(low), evaluate(high)
+    if a is None or b is None:
+        raise ValueError(f"No solution at {low if a is None else high}")
+    return [(low, a[1])] + between(a, b) + [(high, b[1])], solves[0]
+
+
+def active_recipes(model: LinearModel, x: np.ndarray) -> set[str]:
+    # recipes with a machine count above eps, by planet and quality
+    recipe_cols = model.recipe_columns()
+    cols = model.columns
+    active = recipe_cols[np.abs(model.machines_per_craft[recipe_cols] * x[recipe_cols]) > eps]
+    return {
+        f"{all_recipes[cols['recipe'][j]].name} ({planetName(model_planets[cols['planet'][j]])}, {qualityName(int(cols['quality'][j]), padding=False)})"
+        for j in active
+    }
+
+
+def parametric_analysis(model: LinearModel, problem: MatrixProblem, set_parameter, slope, low, high, name):
+    # set_parameter(t) changes the problem, slope() is dz/dt of its last solution; prints z on every segment and
+    # the recipes that start or stop being used at each breakpoint
+    def solve(t):
+        set_parameter(t)
+        if not is_satisfied(problem.check()):
+            return None
+        return problem.objective_value, slope()
+
+    points, solves = trace_breakpoints(solve, low, high)
+    print(f"Parametric analysis of {name} from {low} to {high}: {len(points) - 2} breakpoints after {solves} solves")
+    segments = []
+    previous = set()
+    for (t0, z0), (t1, z1) in zip(points, points[1:]):
+        # the plan in the interior of the segment
+        set_parameter((t0 + t1) / 2)
+        print(f"  {name} {t0:.6g} .. {t1:.6g}: objective {z0:.6g} .. {z1:.6g} ({(z1 - z0) / (t1 - t0) if t1 > t0 else 0:.6g} per unit)")
+        if not is_satisfied(problem.check()):
+            # the next segment compares with the last plan that was solved
+            print("    no solution in the interior, recipes unknown")
+            segments.append({"from": t0, "to": t1, "objective": [z0, z1], "recipes": None})
+            continue
+        recipes = active_recipes(model, problem.x)
+        for recipe in sorted(recipes - previous):
+            print(f"    + {recipe}")
+        for recipe in sorted(previous - recipes):
+            print(f"    - {recipe}")
+        previous = recipes
+        segments.append({"from": t0, "to": t1, "objective": [z0, z1], "recipes": sorted(recipes)})
+    return segments
@@ -0,0 +1,639 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+from common import *
+from linear_model import *
+from solver import *
+from scaling import ScaledProblem
+
+# Reductions applied to the model of linear_model.py.
+#
+# Recipes: a recipe on a planet only needs columns if its inputs can be made from the planet inputs
+# (forward) and one of its outputs is needed for a goal (backward). Items are tracked per planet.
+#
+# Qualities: crafting and recycling never lower the quality, so an item is only needed up to the highest
+# quality a goal or a useful recipe consumes it at. Recipe qualities above that for all outputs and
+# balance rows above it are dropped.
+#
+# Configurations: all module/beacon configurations of a recipe consume the same inputs per
+# recipe amount and only differ in their outputs (productivity, quality split) and in the
+# machines, modules and beacons they need. A configuration whose outputs are at most and whose
+# machine usage is at least that of another configuration never needs a column.
+
+
+def recipe_goal_items(objective_name, goals=None):
+    # (item, planet) -> highest quality the objective asks for, None if every recipe can change the objective
+    if objective_name == "overhead":
+        return None
+    if objective_name == "generate_cost_matrix":
+        return {(item, planet): max_quality for item in compute_cost_for for planet in model_planets}
+    goal_items = {}
+    for g in goal if goals is None else goals:
+        for planet in [g["planet"]] if g["planet"] is not None else model_planets:
+            goal_items[(g["item"], planet)] = max(goal_items.get((g["item"], planet), -1), g["quality"])
+    return goal_items
+
+
+def useful_recipe_planets(goal_items):
+    # set of (recipe index, planet) that can contribute to one of the goal items
+    candidates = []
+    for ri, recipe in enumerate(all_recipes):
+        for planet in recipe_planets(recipe):
+            input_planet = recipe.forced_input_planet if recipe.forced_input_planet is not None else planet
+            output_planet = recipe.forced_output_planet if recipe.forced_output_planet is not None else planet
+            candidates.append((
+                (ri, planet),
+                [(item, input_planet) for item in recipe.inputs],
+                [(item, output_planet) for item in recipe.outputs],
+            ))
+
+    # forward: everything that can be made from the planet inputs
+    available = {(item, planet) for planet, planet_resources in inputs_per_planet.items() for item in planet_resources}
+    feasible = []
+    remaining = candidates
+    while True:
+        blocked = []
+        for candidate in remaining:
+            _, inputs, outputs = candidate
+            if all(item in available for item in inputs):
+                feasible.append(candidate)
+                available.update(outputs)
+            else:
+                blocked.append(candidate)
+        if len(blocked) == len(remaining):
+            break
+        remaining = blocked
+
+    # backward: feasible recipes making something needed, their inputs are needed as well
+    needed = set(goal_items)
+    useful = set()
+    remaining = feasible
+    while True:
+        unused = []
+        for candidate in remaining:
+            key, inputs, outputs = candidate
+            if any(item in needed for item in outputs):
+                useful.add(key)
+                needed.update(inputs)
+            else:
+                unused.append(candidate)
+        if len(unused) == len(remaining):
+            break
+        remaining = unused
+    return useful
+
+
+def quality_caps(goal_items, recipe_planets):
+    # highest useful quality of each (item, planet) and (recipe index, planet), -1 if none
+    item_caps = dict(goal_items)
+    recipe_caps = {}
+    changed = True
+    while changed:
+        changed = False
+        for ri, planet in recipe_planets:
+            recipe = all_recipes[ri]
+            _, quality_range = recipe_quality_range(recipe)
+            input_planet = recipe.forced_input_planet if recipe.forced_input_planet is not None else planet
+            output_planet = recipe.forced_output_planet if recipe.forced_output_planet is not None else planet
+            # outputs leave at the recipe quality or above, forced ones at their own quality
+            highest = -1
+            for resource in recipe.outputs:
+                cap = item_caps.get((resource, output_planet), -1)
+                if resource in recipe.forced_output_quality or resource in fluids:
+                    forced_quality = recipe.forced_output_quality.get(resource, 0) if resource not in fluids else 0
+                    if forced_quality <= cap:
+                        highest = max(quality_range)
+                else:
+                    highest = max(highest, cap)
+            useful_qualities = [q for q in quality_range if q <= highest]
+            recipe_caps[(ri, planet)] = max(useful_qualities, default=-1)
+            if not useful_qualities:
+                continue
+            for resource in recipe.inputs:
+                input_quality = recipe.forced_input_quality.get(resource, max(useful_qualities)) if resource not in fluids else 0
+                if item_caps.get((resource, input_planet), -1) < input_quality:
+                    item_caps[(resource, input_planet)] = input_quality
+                    changed = True
+    return item_caps, recipe_caps
+
+
+class RecipePruning:
+    # recipe/planet filter and quality caps for build_model
+    def __init__(self, enabled=None, qualities=None, objective_name=None, goals=None):
+        # goals replaces goal, e.g. all goals of goal_batch
+        enabled = prune_recipes if enabled is None else enabled
+        qualities = prune_qualities if qualities is None else qualities
+        goal_items = recipe_goal_items(objective if objective_name is None else objective_name, goals)
+        self.total = sum(len(recipe_planets(recipe)) for recipe in all_recipes)
+        self.useful = None
+        self.item_caps = self.recipe_caps = None
+        if goal_items is not None:
+            if enabled:
+                self.useful = useful_recipe_planets(goal_items)
+            if qualities:
+                candidates = self.useful if self.useful is not None else [
+                    (ri, planet) for ri, recipe in enumerate(all_recipes) for planet in recipe_planets(recipe)
+                ]
+                self.item_caps, self.recipe_caps = quality_caps(goal_items, candidates)
+
+    def __call__(self, ri, planet):
+        return (self.useful is None or (ri, planet) in self.useful) and self.recipe_quality_cap(ri, planet) >= 0
+
+    def cache_key(self):
+        # state that decides the columns, see cached_build_model
+        return (
+            sorted(self.useful) if self.useful is not None else None,
+            sorted(self.recipe_caps.items()) if self.recipe_caps is not None else None,
+            sorted(self.item_caps.items()) if self.item_caps is not None else None,
+        )
+
+    def recipe_quality_cap(self, ri, planet):
+        # highest recipe quality that gets columns
+        if self.recipe_caps is None:
+            return len(rarities)
+        return self.recipe_caps.get((ri, planet), -1)
+
+    def item_quality_cap(self, item, planet):
+        # highest quality that gets a balance row
+        if self.item_caps is None:
+            return len(rarities)
+        return self.item_caps.get((item, planet), -1)
+
+    def report(self):
+        if self.useful is not None:
+            print(f"Presolve kept {len(self.useful)} of {self.total} recipe/planet combinations")
+        if self.recipe_caps is not None:
+            recipe_qualities = sum(len(recipe_quality_range(all_recipes[ri])[1]) for ri, planet in self.recipe_caps)
+            kept = sum(
+                sum(1 for q in recipe_quality_range(all_recipes[ri])[1] if q <= cap)
+                for (ri, planet), cap in self.recipe_caps.items()
+            )
+            print(f"Presolve kept {kept} of {recipe_qualities} recipe qualities")
+
+
+def objective_uses_machines(objective_name):
+    # machine, module and beacon usage enters the objective or the constraints
+    return objective_name in ["inputs_cost_matrix", "overhead", "constrained"]
+
+def objective_allows_surplus(objective_name):
+    # more output is never worse: all balance rows are >= and surplus is not penalized
+    return objective_name in ["inputs", "inputs_cost_matrix", "constrained"]
+
+def objective_is_linear(objective_name):
+    # convex combinations of columns are only equivalent if no machine count is integer
+    return objective_name in ["inputs", "constrained"]
+
+
+def configuration_vectors(recipe, q, configurations, effects, with_machines):
+    # one row per configuration, larger is better in every entry
+    speed_bonus, productivity_bonus, quality_bonus = effects
+    accepts_quality, _ = recipe_quality_range(recipe)
+    vectors = [amount for _, _, amount in output_coefficients(recipe, q, accepts_quality, productivity_bonus, quality_bonus)]
+    if with_machines:
+        nq, npr, ns, nb = (configurations[:, i].astype(float) for i in range(4))
+        # machine quality and crafting time only scale all of these by the same factor
+        machines = 1 / speed_bonus
+        vectors += [
+            -machines,
+            -machines * (ns + nb * beacon_sharedness * 2),
+            -machines * nq,
+            -machines * npr,
+            -machines * nb * beacon_sharedness,
+        ]
+    return np.stack(vectors, axis=1)
+
+
+def pareto_configurations(vectors, dominance=True, tolerance=1e-12):
+    # returns (duplicate, dominated) masks, the first of equal configurations is kept
+    scale = tolerance * (1 + np.abs(vectors).max(axis=0))
+    diff = vectors[:, None, :] - vectors[None, :, :]
+    equal = (np.abs(diff) <= scale).all(axis=2)
+    duplicate = np.tril(equal, k=-1).any(axis=1)
+    if not dominance:
+        return duplicate, np.zeros(len(vectors), dtype=bool)
+    # at_least[i, j]: i is at least as good as j in every entry
+    at_least = (diff >= -scale).all(axis=2)
+    dominated = (at_least & ~equal).any(axis=0) & ~duplicate
+    return duplicate, dominated
+
+
+def inside_hull(vectors, candidates, tolerance=1e-9):
+    # candidates that are dominated by a combination of the other candidates: sum(l) <= 1 and
+    # sum(l_k * v_k) >= v_j, as every column consumes the same inputs per recipe amount.
+    # Such points are no vertices of the hull, so all of them can be dropped at once.
+    # One LP for all candidates: each gets its own multipliers and a slack that is zero iff it is dominated
+    K = len(candidates)
+    V = vectors[candidates]
+    D = V.shape[1]
+    rows, cols, vals = [], [], []
+    b_ub = []
+    num_vars = 0
+    slack = []
+    for j in range(K):
+        others = [k for k in range(K) if k != j]
+        lambdas = np.arange(num_vars, num_vars + len(others))
+        slack.append(num_vars + len(others))
+        num_vars += len(others) + 1
+        base = len(b_ub)
+        # -sum(l_k * v_k[d]) - s_j <= -v_j[d]
+        for d in range(D):
+            rows += [base + d] * (len(others) + 1)
+            cols += list(lambdas) + [slack[-1]]
+            vals += list(-V[others, d]) + [-1]
+        b_ub += list(-V[j])
+        # sum(l_k) <= 1
+        rows += [base + D] * len(others)
+        cols += list(lambdas)
+        vals += [1] * len(others)
+        b_ub.append(1)
+    c = np.zeros(num_vars)
+    c[slack] = 1
+    res = linprog(
+        c,
+        A_ub=sp.csr_matrix((vals, (rows, cols)), shape=(len(b_ub), num_vars)),
+        b_ub=b_ub,
+        bounds=(0, None),
+        method="highs",
+    )
+    if res.status != 0:
+        return np.array([], dtype=int)
+    scale = tolerance * (1 + np.abs(V).max(axis=1))
+    return np.asarray(candidates)[res.x[slack] <= scale]
+
+
+class ConfigurationPruning:
+    # select_configurations hook for build_model
+    def __init__(self, mode=None, objective_name=None, recipes=None, with_machines=None):
+        self.mode = prune_configurations if mode is None else mode
+        self.objective = objective if objective_name is None else objective_name
+        self.recipes = recipes # RecipePruning, only for the column counts
+        # machine usage in the dominance vectors, also for objectives that only use it as a criterion of its own
+        self.with_machines = objective_uses_machines(self.objective) if with_machines is None else with_machines
+        self.planets = None # only count the columns on these planets
+        self.total = 0
+        self.removed = {"duplicate": 0, "dominated": 0, "hull": 0}
+
+    def for_planet(self, planet):
+        # fresh counters for the worker building one planet (build_processes > 1), see merge
+        pruning = ConfigurationPruning(self.mode, self.objective, self.recipes, self.with_machines)
+        pruning.planets = [planet]
+        return pruning
+
+    def cache_key(self):
+        return (self.mode, self.objective, self.with_machines)
+
+    def merge(self, other):
+        self.total += other.total
+        for name, count in other.removed.items():
+            self.removed[name] += count
+
+    def __call__(self, ri, recipe, q, configurations, effects):
+        # every configuration becomes a column per planet and machine quality
+        planets = [
+            planet for planet in recipe_planets(recipe)
+            if self.recipes is None or (self.recipes(ri, planet) and q <= self.recipes.recipe_quality_cap(ri, planet))
+            if self.planets is None or planet in self.planets
+        ]
+        columns_per_configuration = len(planets) * (min(max_quality, recipe.machine.max_quality) + 1)
+        self.total += len(configurations) * columns_per_configuration
+        if self.mode is None or len(configurations) <= 1:
+            return np.arange(len(configurations))
+
+        vectors = configuration_vectors(recipe, q, configurations, effects, self.with_machines)
+        duplicate, dominated = pareto_configurations(vectors, dominance=objective_allows_surplus(self.objective))
+        self.removed["duplicate"] += duplicate.sum() * columns_per_configuration
+        self.removed["dominated"] += dominated.sum() * columns_per_configuration
+        keep = np.flatnonzero(~duplicate & ~dominated)
+
+        if self.mode == "hull" and objective_allows_surplus(self.objective) and objective_is_linear(self.objective) and len(keep) > 2:
+            hull = inside_hull(vectors, keep)
+            self.removed["hull"] += len(hull) * columns_per_configuration
+            keep = np.setdiff1d(keep, hull)
+        return keep
+
+    def report(self):
+        removed = sum(self.removed.values())
+        print(f"Presolve removed {removed} of {self.total} configuration columns ({self.removed['duplicate']} duplicate, {self.removed['dominated']} dominated, {self.removed['hull']} inside the convex hull)")
+
+
+# Matrix presolve: reductions of the final problem (after goal and availability rows are added), right
+# before it is handed to the solver. Only needed because some backends (CBC, GLOP, PuLP) presolve weakly.
+# - empty rows and rows that hold for all values within the bounds are dropped
+# - of rows with the same coefficients (up to a positive factor) and sense only the tightest is kept
+# - rows with a single entry become a bound of their column
+# - columns with lb == ub are substituted into the right hand side
+# - columns that can only hurt the objective and the rows are fixed at their lower bound
+# - integer columns whose smallest nonzero value already costs more than a known solution are fixed at zero
+# Costs below the tolerance (relative to the largest one) count as 0. If the reduced problem ends without a proven
+# optimum or infeasibility (unbounded, unknown, time limit), PresolvedProblem solves the full one instead.
+
+class MatrixPresolve:
+    def __init__(self, problem: MatrixProblem, upper_bound=None, tolerance=1e-9, max_passes=50):
+        A = sp.csr_matrix(problem.A, copy=True)
+        A.eliminate_zeros()
+        self.num_rows, self.num_cols = A.shape
+        rhs = problem.rhs.copy()
+        # costs that are negligible next to the largest one are rounding noise, e.g. a tiny weight of a criterion
+        c = problem.c.copy()
+        c[np.abs(c) < tolerance * max(1, np.abs(c).max(initial=0))] = 0
+        lb = problem.lb.copy()
+        ub = problem.ub.copy()
+        integer = problem.integer
+        sense = problem.sense
+        row_kept = np.ones(self.num_rows, dtype=bool)
+        col_kept = np.ones(self.num_cols, dtype=bool)
+        self.values = np.zeros(self.num_cols) # of the removed columns
+        self.singletons = [] # (row, column, coefficient) turned into bounds, in order
+        self.removed = {"empty": 0, "redundant": 0, "duplicate": 0, "singleton": 0, "fixed": 0, "dominated": 0, "cost": 0}
+        tol = tolerance * (1 + np.abs(rhs))
+        AT = A.T.tocsr()
+
+        # the lower bound of the objective for the cost rule, only if it can not be negative
+        use_cost = upper_bound is not None and (c >= 0).all() and np.isfinite(lb[c > 0]).all()
+
+        for _ in range(max_passes):
+            changed = False
+
+            fixed = col_kept & (np.abs(ub - lb) <= tolerance * (1 + np.abs(lb)))
+            if fixed.any():
+                cols = np.flatnonzero(fixed)
+                self.values[cols] = lb[cols]
+                rhs -= A[:, cols] @ lb[cols]
+                col_kept[cols] = False
+                self.removed["fixed"] += len(cols)
+                changed = True
+
+            rows = np.flatnonzero(row_kept)
+            B = A[rows][:, col_kept] if len(rows) else sp.csr_matrix((0, col_kept.sum()))
+            cols = np.flatnonzero(col_kept)
+            counts = np.diff(B.indptr)
+
+            # activity bounds of each row, -inf/inf counted separately to avoid inf * 0
+            B_pos, B_neg = B.maximum(0), B.minimum(0)
+            lb_c, ub_c = lb[cols], ub[cols]
+            lb_inf, ub_inf = ~np.isfinite(lb_c), ~np.isfinite(ub_c)
+            lb_f, ub_f = np.where(lb_inf, 0, lb_c), np.where(ub_inf, 0, ub_c)
+            min_activity = B_pos @ lb_f + B_neg @ ub_f
+            max_activity = B_pos @ ub_f + B_neg @ lb_f
+            min_activity[((B_pos != 0) @ lb_inf + (B_neg != 0) @ ub_inf) > 0] = -np.inf
+            max_activity[((B_pos != 0) @ ub_inf + (B_neg != 0) @ lb_inf) > 0] = np.inf
+            row_sense, row_rhs, row_tol = sense[rows], rhs[rows], tol[rows]
+            holds_ge = min_activity >= row_rhs - row_tol
+            holds_le = max_activity <= row_rhs + row_tol
+            redundant = np.where(row_sense == ">", holds_ge, np.where(row_sense == "<", holds_le, holds_ge & holds_le))
+            empty = counts == 0
+            # violated empty rows stay, the solver reports the problem as infeasible
+            drop = redundant.copy()
+            self.removed["empty"] += (empty & redundant).sum()
+            self.removed["redundant"] += (redundant & (counts > 0)).sum()
+
+            # singleton rows become bounds
+            singleton = np.flatnonzero((counts == 1) & ~drop)
+            if len(singleton):
+                k = B.indices[B.indptr[singleton]]
+                a = B.data[B.indptr[singleton]]
+                i, j = rows[singleton], cols[k]
+                bound = rhs[i] / a
+                # sense of the bound on the column, "<" and ">" swap for negative coefficients
+                flipped = np.where(a > 0, row_sense[singleton], np.where(row_sense[singleton] == ">", "<", np.where(row_sense[singleton] == "<", ">", "=")))
+                lower = np.where(integer[j], np.ceil(bound - tolerance), bound)
+                upper = np.where(integer[j], np.floor(bound + tolerance), bound)
+                has_lower, has_upper = flipped != "<", flipped != ">"
+                np.maximum.at(lb, j[has_lower], lower[has_lower])
+                np.minimum.at(ub, j[has_upper], upper[has_upper])
+                self.singletons += zip(i, j, a)
+                self.removed["singleton"] += len(singleton)
+                drop[singleton] = True
+            if drop.any():
+                row_kept[rows[drop]] = False
+                changed = True
+
+            # rows with the same coefficients up to a positive factor and the same sense: rows are compared
+            # by two random projections of their pattern and normalized coefficients, candidates are verified
+            rest = np.flatnonzero(~drop & (counts > 1))
+            if len(rest):
+                R = B[rest]
+                scale = abs(R).max(axis=1).toarray().ravel()
+                N = sp.diags(1 / scale) @ R
+                rng = np.random.default_rng(0)
+                keys = np.stack([
+                    np.searchsorted(["<", "=", ">"], row_sense[rest]),
+                    np.round(N @ rng.random(R.shape[1]), 9),
+                    np.round((R != 0) @ rng.random(R.shape[1]), 9),
+                ], axis=1)
+                _, inverse, group_counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+                inverse = inverse.ravel()
+                for g in np.flatnonzero(group_counts > 1):
+                    members = np.flatnonzero(inverse == g)
+                    first = N[members[0]]
+                    members = [m for m in members if abs(N[m] - first).max() <= 1e-12]
+                    if len(members) < 2:
+                        continue
+                    bounds = row_rhs[rest[members]] / scale[members]
+                    sense_g = row_sense[rest[members[0]]]
+                    if sense_g == "=":
+                        if np.ptp(bounds) > tolerance * (1 + np.abs(bounds).max()):
+                            continue
+                        keep = 0
+                    else:
+                        keep = np.argmax(bounds) if sense_g == ">" else np.argmin(bounds)
+                    duplicates = rest[np.delete(members, keep)]
+                    row_kept[rows[duplicates]] = False
+                    self.removed["duplicate"] += len(duplicates)
+                    changed = True
+
+            # columns that only hurt: no entry helps a row, fixed at the lower bound, and the opposite
+            helps = np.zeros(len(cols), dtype=bool)
+            hurts = np.zeros(len(cols), dtype=bool)
+            C = B.tocsc()
+            for s, sign in [(">", 1), ("<", -1)]:
+                S = C[(row_sense == s) & ~drop]
+                helps |= np.asarray((S * sign > 0).sum(axis=0)).ravel() > 0
+                hurts |= np.asarray((S * sign < 0).sum(axis=0)).ravel() > 0
+            equality = np.asarray((C[(row_sense == "=") & ~drop] != 0).sum(axis=0)).ravel() > 0
+            c_c = c[cols]
+            to_lb = ~helps & ~equality & (c_c >= 0) & ~lb_inf
+            to_ub = ~hurts & ~equality & (c_c <= 0) & ~ub_inf & ~to_lb
+            if to_lb.any() or to_ub.any():
+                ub[cols[to_lb]] = lb[cols[to_lb]]
+                lb[cols[to_ub]] = ub[cols[to_ub]]
+                self.removed["dominated"] += to_lb.sum() + to_ub.sum()
+                changed = True
+
+            if use_cost:
+                lower = c @ np.where(np.isfinite(lb), lb, 0)
+                # one unit above the lower bound already costs more than the known solution
+                expensive = cols[integer[cols] & (c_c > upper_bound - lower + tolerance * (1 + abs(upper_bound))) & (ub_c > lb_c)]
+                if len(expensive):
+                    ub[expensive] = lb[expensive]
+                    self.removed["cost"] += len(expensive)
+                    changed = True
+
+            if not changed:
+                break
+
+        self.rows = np.flatnonzero(row_kept)
+        self.cols = np.flatnonzero(col_kept)
+        self.A = A[self.rows][:, self.cols]
+        self.sense = sense[self.rows]
+        self.rhs = rhs[self.rows]
+        self.c = c[self.cols]
+        self.lb = lb[self.cols]
+        self.ub = ub[self.cols]
+        self.integer = integer[self.cols]
+        self.full_A = A
+        self.full_sense = sense
+        self.full_c = c
+
+    def postsolve(self, x):
+        full = self.values.copy()
+        full[self.cols] = x
+        return full
+
+    def postsolve_duals(self, duals):
+        # duals of the dropped rows are zero, those of singleton rows take over the reduced cost of their
+        # column if the bound they imply is the one that is active
+        y = np.zeros(self.num_rows)
+        y[self.rows] = duals
+        reduced_cost = self.full_c - self.full_A.T @ y
+        for i, j, a in reversed(self.singletons):
+            d = reduced_cost[j]
+            if abs(d) <= 1e-12:
+                continue
+            dual = d / a
+            sense = self.full_sense[i]
+            if sense == ">" and dual < 0 or sense == "<" and dual > 0:
+                continue
+            y[i] = dual
+            reduced_cost[j] = 0
+        return y
+
+    def report(self):
+        removed = ", ".join(f"{count} {name}" for name, count in self.removed.items() if count)
+        print(f"Presolve reduced the matrix to {len(self.rows)} of {self.num_rows} rows and {len(self.cols)} of {self.num_cols} columns ({removed or 'nothing removed'})")
+
+
+class PresolvedProblem(MatrixProblem):
+    # presolves on every check and solves the reduced problem, the arrays of MatrixProblem hold the full one
+    def __init__(self, A, sense, rhs, c, lb, ub):
+        super().__init__(A, sense, rhs, c, lb, ub)
+        self.incumbent = None # any solution, its objective value bounds the useful columns
+
+    def upper_bound(self):
+        x = self.incumbent
+        if x is None or len(x) != self.num_cols:
+            return None
+        return float(self.c @ x) if self.is_feasible(x) else None
+
+    def check(self):
+        reduction = MatrixPresolve(self, upper_bound=self.upper_bound())
+        reduction.report()
+        reduced = (ScaledProblem if matrix_scaling else MatrixProblem)(reduction.A, reduction.sense, reduction.rhs, reduction.c, reduction.lb, reduction.ub)
+        reduced.set_integer(np.arange(len(reduction.cols)), reduction.integer)
+        if self.start is not None:
+            reduced.set_start(self.start[reduction.cols])
+        res = reduced.check()
+        self.x = self.duals = self.objective_value = None
+        if not is_optimal(res) and not is_infeasible(res):
+            print("The presolved problem has no proven optimum, solving it without presolve")
+            return super().check()
+        if is_satisfied(res):
+            self.x = reduction.postsolve(reduced.x)
+            if reduced.duals is not None:
+                self.duals = reduction.postsolve_duals(reduced.duals)
+            self.objective_value = float(self.c @ self.x)
+        return res
+
+
+# Bound propagation, used before the integer phase of inputs_cost_matrix: the preoptimized caps bound the recipe
+# amounts and the rows carry these bounds on to the other columns.
+# - activity: a row can only hold if each of its columns stays within what the other columns can make up for
+# - cost: a column with cost >= 0 that is never needed above the amount that satisfies every row it helps on its
+#   own (whatever the other columns do) can be bounded there, an optimal solution never needs more.
+#   This bounds machine counts (m >= machines_per_craft * x) and inputs by the recipe amounts.
+
+def row_activity_residuals(A: sp.coo_matrix, num_rows, lb, ub, use_lower):
+    # per nonzero the min (use_lower) or max activity of its row without its own column, nan if unbounded
+    low_value = np.where(A.data > 0, lb[A.col], ub[A.col]) if use_lower else np.where(A.data > 0, ub[A.col], lb[A.col])
+    contribution = A.data * low_value
+    infinite = ~np.isfinite(contribution)
+    finite_sum = np.bincount(A.row, np.where(infinite, 0, contribution), minlength=num_rows)
+    infinite_count = np.bincount(A.row, infinite, minlength=num_rows)
+    residual = finite_sum[A.row] - np.where(infinite, 0, contribution)
+    residual[infinite_count[A.row] - infinite > 0] = np.nan
+    return residual
+
+
+def propagate_bounds(A, sense, rhs, c, lb, ub, integer, max_passes=20, tolerance=1e-9):
+    A = sp.coo_matrix(A)
+    A.eliminate_zeros()
+    num_rows = A.shape[0]
+    lb, ub = lb.astype(float), ub.astype(float)
+    row_sense = sense[A.row]
+    b = rhs[A.row]
+    a = A.data
+    helps = (row_sense == ">") & (a > 0) | (row_sense == "<") & (a < 0)
+    in_equality = np.bincount(A.col, row_sense == "=", minlength=A.shape[1]) > 0
+    cost_bounded = (c >= 0) & ~in_equality
+
+    def tighten(cols, values, upper):
+        # keeps the tightest value per column, rounded for integer columns and slightly relaxed otherwise
+        valid = np.isfinite(values)
+        cols, values = cols[valid], values[valid]
+        slack = tolerance * (1 + np.abs(values))
+        if upper:
+            values = np.where(integer[cols], np.floor(values + slack), values + slack)
+            new = np.full(len(ub), np.inf)
+            np.minimum.at(new, cols, values)
+            better = new < ub - tolerance * (1 + np.abs(np.where(np.isfinite(ub), ub, 0)))
+            ub[better] = new[better]
+        else:
+            values = np.where(integer[cols], np.ceil(values - slack), values - slack)
+            new = np.full(len(lb), -np.inf)
+            np.maximum.at(new, cols, values)
+            better = new > lb + tolerance * (1 + np.abs(np.where(np.isfinite(lb), lb, 0)))
+            lb[better] = new[better]
+        return better.sum()
+
+    for _ in range(max_passes):
+        changed = 0
+        # a x_j <= b - (min activity of the others) for "<" and "=" rows
+        residual = row_activity_residuals(A, num_rows, lb, ub, use_lower=True)
+        rows = row_sense != ">"
+        bound = (b - residual) / a
+        changed += tighten(A.col[rows & (a > 0)], bound[rows & (a > 0)], upper=True)
+        changed += tighten(A.col[rows & (a < 0)], bound[rows & (a < 0)], upper=False)
+        # a x_j >= b - (max activity of the others) for ">" and "=" rows
+        residual = row_activity_residuals(A, num_rows, lb, ub, use_lower=False)
+        rows = row_sense != "<"
+        bound = (b - residual) / a
+        changed += tighten(A.col[rows & (a > 0)], bound[rows & (a > 0)], upper=False)
+        changed += tighten(A.col[rows & (a < 0)], bound[rows & (a < 0)], upper=True)
+
+        # cost: the largest amount any helped row needs, whatever the other columns do
+        residual = np.where(
+            row_sense == ">",
+            row_activity_residuals(A, num_rows, lb, ub, use_lower=True),
+            row_activity_residuals(A, num_rows, lb, ub, use_lower=False),
+        )
+        needed = np.where(helps, (b - residual) / a, -np.inf)
+        most = np.full(len(ub), -np.inf)
+        np.maximum.at(most, A.col, needed)
+        unknown = np.bincount(A.col, helps & np.isnan(needed), minlength=A.shape[1]) > 0
+        most = np.maximum(most, lb)
+        cols = np.flatnonzero(cost_bounded & ~unknown & np.isfinite(most))
+        changed += tighten(cols, np.where(integer[cols], np.ceil(most[cols] - tolerance * (1 + np.abs(most[cols]))), most[cols]), upper=True)
+
+        if not changed:
+            break
+    return lb, ub
+
+
+def tighten_bounds(problem: MatrixProblem):
+    lb, ub = propagate_bounds(problem.A, problem.sense, problem.rhs, problem.c, problem.lb, problem.ub, problem.integer)
+    changed = np.flatnonzero((lb != problem.lb) | (ub != problem.ub))
+    bounded = np.isfinite(ub[problem.integer]).sum()
+    print(f"Bound propagation tightened {len(changed)} columns, {bounded} of {problem.integer.sum()} integer columns have an upper bound")
+    if len(changed):
+        problem.set_bounds(changed, lb[changed], ub[changed])
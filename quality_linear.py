@@ -5,6 +5,16 @@ import time
 from typing import Any
 import os
 
+if builder == "matrix":
+    from quality_matrix import main
+    main()
+    exit(0)
+
+# only the loop builder needs these here, the matrix builder imports them itself
+import numpy as np
+from linear_model import COLUMN_RECIPE, column_dtype, effect_table, group_columns, model_planets, quality_distribution, save_effect_table
+from presolve import RecipePruning
+
 def deepsum(d):
     if isinstance(d, dict):
         return sum(deepsum(v) for v in d.values())
@@ -25,44 +35,21 @@ for planet, planet_resources in inputs_per_planet.items():
         scaled_inputs[planet][resource][0] = v * scaling
         resources[planet][resource][0] = v
 
-# map from planet -> machine -> quality -> amount
-machines: defaultdict[str, defaultdict[Machine, defaultdict[int, Any]]] = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0)))
-
-# planet -> recipe -> recipe quality -> machine quality -> #quality_modules -> #prod_modules -> #speed_modules -> #speed_beacons -> amount
-recipe_amounts = \
-    defaultdict(lambda: # planet
-        defaultdict(lambda: # recipe
-            defaultdict(lambda: # recipe quality
-                defaultdict(lambda: # machine quality
-                    defaultdict(lambda: # #quality_modules
-                        defaultdict(lambda: # #prod_modules
-                            defaultdict(lambda: # #speed_modules
-                                {} #speed_beacons -> amount
-                            )
-                        )
-                    )
-                )
-            )
-        )
-    )
-true_machines_per_recipe = \
-    defaultdict(lambda: # planet
-        defaultdict(lambda: # recipe
-            defaultdict(lambda: # recipe quality
-                defaultdict(lambda: # machine quality
-                    defaultdict(lambda: # #quality_modules
-                        defaultdict(lambda: # #prod_modules
-                            defaultdict(lambda: # #speed_modules
-                                defaultdict(lambda: #speed_beacons
-                                    0 # amount
-                                )
-                            )
-                        )
-                    )
-                )
-            )
-        )
-    )
+# machines are referred to by their index, hashing the dataclass is slow
+all_machines = list(dict.fromkeys(recipe.machine for recipe in all_recipes))
+machine_index = {machine: mi for mi, machine in enumerate(all_machines)}
+rocket_index = machine_index.get(rocket)
+
+# map from planet -> machine index -> quality -> amount
+machines: defaultdict[str, defaultdict[int, defaultdict[int, Any]]] = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0)))
+
+# one column per recipe configuration (planet, recipe, recipe quality, machine quality, #quality_modules,
+# #prod_modules, #speed_modules, #speed_beacons), keys in the column_dtype layout of linear_model.py
+column_keys = []
+recipe_amounts = [] # column -> amount
+true_machines_per_recipe = [] # column -> integer machine count, 0 if there is none
+machines_per_craft = [] # column -> machines needed per recipe amount
+productivity_bonuses = [] # column -> productivity bonus
 
 # each is planet -> count
 speed_modules_used = defaultdict(lambda: 0)
@@ -72,24 +59,35 @@ beacons_used = defaultdict(lambda: 0)
 
 
 tstart = time.time()
+recipe_pruning = RecipePruning()
+recipe_pruning.report()
 for ri, recipe in enumerate(all_recipes):
     accepts_quality = not(all(out in fluids for out in recipe.outputs)) and not(all(inp in fluids for inp in recipe.inputs)) and recipe.accepts_quality
     # if output can not have quality => skip all stages
     quality_range = range(max_quality+1) if accepts_quality else [0]
     if recipe.forced_quality is not None:
         quality_range = [recipe.forced_quality]
+    _, _, recipe_productivity_bonuses, quality_bonuses, machine_time = (values.tolist() for values in effect_table().lookup(recipe))
 
     for planet in recipe.allowed_planets:
         if planet not in recipe.machine.allowed_planets:
             continue 
         if planet in exclude_planets:
             continue
+        if not recipe_pruning(ri, planet):
+            continue
 
         #print(f"Processing recipe {recipe.name} on planet {planet}. Machine allowed on {recipe.machine.allowed_planets}")
+        planet_index = model_planets.index(planet)
+        mi = machine_index[recipe.machine]
 
         for q in quality_range:
+            if q > recipe_pruning.recipe_quality_cap(ri, planet):
+                continue
             max_machine_quality = min(max_quality, recipe.machine.max_quality) # if objective == "constrained" else 0
             for machine_q in range(max_machine_quality+1):
+                # configurations in the order of the effect table
+                k = -1
                 max_quality_modules = recipe.machine.module_slots if not(all(out in fluids for out in recipe.outputs)) and recipe.accepts_quality_module else 0
                 for num_quality_modules in range(max_quality_modules+1):
                     max_prod_modules = recipe.machine.module_slots - num_quality_modules if recipe.accepts_productivity else 0
@@ -99,42 +97,31 @@ for ri, recipe in enumerate(all_recipes):
                             max_beacons = max_beacons_per_machine if recipe.accepts_speed else 0
                             for num_beacons in range(max_beacons+1):
                                 recipe_amount = Real(f"recipe_{ri}_{recipe.name.replace(' ', '-')}_{planet}_qr{q}_qm{machine_q}_nq{num_quality_modules}_np{num_productivity_modules}_ns{num_speed_modules}_nb{num_beacons}")
-                                recipe_amounts[planet][ri][q][machine_q][num_quality_modules][num_productivity_modules][num_speed_modules][num_beacons] = recipe_amount
-                                s.add(recipe_amount >= 0)
-
-                                effective_num_speed_modules = num_speed_modules + math.sqrt(num_beacons) * beacon.distribution_efficiency * 2
-
-                                speed_bonus = 1
-                                speed_bonus += speed_module.speed_bonus * effective_num_speed_modules
-                                speed_bonus += quality_module.speed_bonus * num_quality_modules
-                                speed_bonus += productivity_module.speed_bonus * num_productivity_modules
-                                speed_bonus = max(0.2, speed_bonus)
-
-                                productivity_bonus = 1
-                                productivity_bonus += recipe.productivity
-                                productivity_bonus += recipe.machine.productivity
-                                productivity_bonus += productivity_module.productivity_bonus * num_productivity_modules
-                                productivity_bonus += quality_module.productivity_bonus * num_quality_modules
-                                productivity_bonus += speed_module.productivity_bonus * effective_num_speed_modules
-                                productivity_bonus = max(1.0, productivity_bonus)
+                                column_keys.append((COLUMN_RECIPE, ri, -1, planet_index, q, machine_q, num_quality_modules, num_productivity_modules, num_speed_modules, num_beacons, -1))
+                                recipe_amounts.append(recipe_amount)
+                                if not nonnegative_reals:
+                                    s.add(recipe_amount >= 0)
 
-                                quality_bonus = 0
-                                quality_bonus += quality_module.quality_bonus * num_quality_modules
-                                quality_bonus += productivity_module.quality_bonus * num_productivity_modules
-                                quality_bonus += speed_module.quality_bonus * effective_num_speed_modules
-                                quality_bonus = max(0, quality_bonus)
+                                k += 1
+                                productivity_bonus = recipe_productivity_bonuses[k]
+                                quality_bonus = quality_bonuses[k]
+                                distribution = quality_distribution(q, quality_bonus).tolist()
 
-                                machine_count = recipe_amount * recipe.crafting_time / recipe.machine.qspeed[machine_q] / speed_bonus
+                                machines_per_craft.append(recipe.crafting_time * machine_time[machine_q][k])
+                                productivity_bonuses.append(productivity_bonus)
+                                machine_count = recipe_amount * machines_per_craft[-1]
 
+                                true_machine_count = 0
                                 if objective == "inputs_cost_matrix" and recipe.machine.underlying_item is not None:
                                     # initially not an integer, will be made one in a later step
                                     integer_machine_count = Real(f"machine_count_{ri}_{recipe.machine.name.replace(' ', '-')}_{planet}_qr{q}_qm{machine_q}_nq{num_quality_modules}_np{num_productivity_modules}_ns{num_speed_modules}_nb{num_beacons}")
                                     s.add(integer_machine_count >= machine_count)
                                     # s.add(integer_machine_count <= machine_count + 1 + 1e-6)
                                     machine_count = integer_machine_count
-                                    true_machines_per_recipe[planet][ri][q][machine_q][num_quality_modules][num_productivity_modules][num_speed_modules][num_beacons] = integer_machine_count
+                                    true_machine_count = integer_machine_count
+                                true_machines_per_recipe.append(true_machine_count)
 
-                                machines[planet][recipe.machine][machine_q] += machine_count
+                                machines[planet][mi][machine_q] += machine_count
 
                                 speed_modules_used[planet] += machine_count * (num_speed_modules + num_beacons * beacon_sharedness * 2)
                                 quality_modules_used[planet] += machine_count * num_quality_modules
@@ -154,23 +141,29 @@ for ri, recipe in enumerate(all_recipes):
                                     base_amount *= recipe_amount
 
                                     
-                                    percent_sum = 0
                                     output_quality = recipe.forced_output_quality.get(resource, q) if resource not in fluids else 0
                                     is_forced_quality = resource in recipe.forced_output_quality or resource in fluids
+                                    # surplus above the highest useful quality can not be used
+                                    max_output_quality = min(max_quality, recipe_pruning.item_quality_cap(resource, output_planet))
                                     if accepts_quality and not is_forced_quality:
-                                        # TODO: better sum directly instead of iterative
-                                        percentage = quality_bonus
-                                        for q2 in range(q+1,max_quality+1):
-                                            actual_percentage = percentage * (0.9 if q2 != max_quality else 1)
-                                            percent_sum += actual_percentage
-                                            resources[output_planet][resource][q2] += base_amount * actual_percentage
-                                            percentage /= 10
-                                    resources[output_planet][resource][output_quality] += base_amount * (1-percent_sum)
+                                        for q2 in range(q+1, max_output_quality+1):
+                                            resources[output_planet][resource][q2] += base_amount * distribution[q2]
+                                        resources[output_planet][resource][q] += base_amount * distribution[q]
+                                    elif output_quality <= recipe_pruning.item_quality_cap(resource, output_planet):
+                                        resources[output_planet][resource][output_quality] += base_amount
+
+save_effect_table()
+columns = np.array(column_keys, dtype=column_dtype)
+machines_per_craft = np.array(machines_per_craft)
+productivity_bonuses = np.array(productivity_bonuses)
 
 # no resource can be negative
 for planet in all_planets + ["space"]:
     for resource, quality_amounts in resources[planet].items():
         for quality, amount in quality_amounts.items():
+            # untouched entries are the constant 0
+            if isinstance(amount, (int, float)):
+                continue
             s.add(amount >= 0)
             
 goal_resources = []
@@ -185,7 +178,7 @@ for g in goal:
 input_cost = deepsum(scaled_inputs)
 overhead_cost = deepsum(resources)
 machine_cost = deepsum(machines) + deepsum(beacons_used) + deepsum(speed_modules_used) + deepsum(quality_modules_used) + deepsum(prod_modules_used)
-space_travel_cost = sum(machines[planet][rocket][0] for planet in all_planets)
+space_travel_cost = sum(machines[planet][rocket_index][0] for planet in all_planets if rocket_index in machines[planet])
 
 org_objective =  objective
 if objective == "inputs":
@@ -196,7 +189,8 @@ elif objective == "inputs_cost_matrix":
     objective = input_cost
     hours_of_amortization = 1
     for planet, planet_machines in machines.items():
-        for machine, quality_amounts in planet_machines.items():
+        for mi, quality_amounts in planet_machines.items():
+            machine = all_machines[mi]
             for quality, amount in quality_amounts.items():
                 if machine.underlying_item is not None:
                     objective += amount * cost_matrix[planet][machine.underlying_item][quality] / (3600 * hours_of_amortization)
@@ -229,28 +223,39 @@ elif objective == "inputs_cost_matrix":
 
     m = s.model()
 
+    def set_upper_bound(variable, value):
+        # Gurobi variables take the bound directly, the other modes get it as a constraint
+        if mode == "gurobi":
+            variable.UB = value
+        else:
+            s.add(variable <= value)
+
     # make machine counts integers and fix recipe counts
     
-    for per_planet in recipe_amounts.values():
-        for per_recipe in per_planet.values():
-            for per_quality in per_recipe.values():
-                current_usage = get_float(m.evaluate(deepsum(per_quality)))
-                if current_usage < 1e-6:
-                    s.add(deepsum(per_quality) == 0)
-                else:
-                    s.add(deepsum(per_quality) <= current_usage)
-
-    for per_planet in true_machines_per_recipe.values():
-        for per_recipe in per_planet.values():
-            for per_quality in per_recipe.values():
-                for per_machine_q in per_quality.values():
-                    for per_quality_modules in per_machine_q.values():
-                        for per_prod_modules in per_quality_modules.values():
-                            for per_speed_modules in per_prod_modules.values():
-                                for per_beacons in per_speed_modules.values():
-                                    if isinstance(per_beacons, int):
-                                        continue
-                                    per_beacons.vtype = GRB.INTEGER
+    for _, group in group_columns(columns, ["planet", "recipe", "quality"]):
+        usage = sum(recipe_amounts[j] for j in group)
+        current_usage = get_float(m.evaluate(usage))
+        if current_usage < 1e-6:
+            s.add(usage == 0)
+        else:
+            s.add(usage <= current_usage)
+        if bound_propagation:
+            # each recipe amount is at most the cap, its machines at most what the cap needs
+            cap = current_usage if current_usage >= 1e-6 else 0
+            for j in group:
+                set_upper_bound(recipe_amounts[j], cap)
+                if not isinstance(true_machines_per_recipe[j], int):
+                    set_upper_bound(true_machines_per_recipe[j], math.ceil(machines_per_craft[j] * cap - 1e-9))
+
+    # the preoptimized solution with machine counts rounded up solves the integer problem, start from it (Gurobi)
+    for recipe_amount, true_machine_count in zip(recipe_amounts, true_machines_per_recipe):
+        if mode == "gurobi":
+            recipe_amount.Start = get_float(m.evaluate(recipe_amount))
+        if isinstance(true_machine_count, int):
+            continue
+        true_machine_count.vtype = GRB.INTEGER
+        if mode == "gurobi":
+            true_machine_count.Start = math.ceil(get_float(m.evaluate(true_machine_count)) - 1e-9)
 
     s.update()
 
@@ -268,9 +273,9 @@ elif objective == "constrained":
         s.add(prod_modules_used[planet] <= available_prod_modules[planet])
         s.add(beacons_used[planet] <= available_beacons[planet])
     for planet, planet_machines in machines.items():
-        for machine, quality_amounts in planet_machines.items():
+        for mi, quality_amounts in planet_machines.items():
             for quality, amount in quality_amounts.items():
-                s.add(amount <= available_machines[planet][machine][quality])
+                s.add(amount <= available_machines[planet][all_machines[mi].name][quality])
 elif objective == "generate_cost_matrix":
     s.minimize(input_cost)
     result = defaultdict(lambda: defaultdict(lambda: [1e10 for _ in range(max_quality+1)]))
@@ -352,109 +357,85 @@ if is_satisfied(res):
     print()
     print("Machines:")
     outdata["machines"] = {}
+    x = np.array([get_float(m[recipe_amount]) for recipe_amount in recipe_amounts])
+    machine_counts = x * machines_per_craft
+    order = np.lexsort([columns[f] for f in ["beacons", "speed_modules", "productivity_modules", "quality_modules", "quality", "machine_quality", "recipe", "planet"]])
     for planet in all_planets + ["space"]:
-        if planet not in recipe_amounts:
-            continue
-        if abs(m.evaluate(deepsum(recipe_amounts[planet]))) < eps:
+        planet_columns = order[columns["planet"][order] == model_planets.index(planet)]
+        if abs(x[planet_columns].sum()) < eps:
             continue
 
         print(f"  {planetName(planet)}: ")
         outdata["machines"][planet] = []
-        for ri, recipe in enumerate(all_recipes):
-            for machine_q in range(max_quality+1):
-                machine_str = []
-                for q in range(max_quality+1):
-                    if q not in recipe_amounts[planet][ri]:
-                        continue
-                    if machine_q not in recipe_amounts[planet][ri][q]:
-                        continue
-                    for num_quality_modules in range(recipe.machine.module_slots+1):
-                        if num_quality_modules not in recipe_amounts[planet][ri][q][machine_q]:
-                            continue
-                        for num_productivity_modules in range(recipe.machine.module_slots - num_quality_modules + 1):
-                            if num_productivity_modules not in recipe_amounts[planet][ri][q][machine_q][num_quality_modules]:
-                                continue
-                            for num_speed_modules in range(recipe.machine.module_slots - num_quality_modules - num_productivity_modules + 1):
-                                if num_speed_modules not in recipe_amounts[planet][ri][q][machine_q][num_quality_modules][num_productivity_modules]:
-                                    continue
-                                for num_beacons in range(max_beacons_per_machine+1):
-                                    if num_beacons not in recipe_amounts[planet][ri][q][machine_q][num_quality_modules][num_productivity_modules][num_speed_modules]:
-                                        continue
-
-                                    effective_num_speed_modules = num_speed_modules + math.sqrt(num_beacons) * beacon.distribution_efficiency * 2
-
-                                    speed_bonus = 1
-                                    speed_bonus += speed_module.speed_bonus * effective_num_speed_modules
-                                    speed_bonus += quality_module.speed_bonus * num_quality_modules
-                                    speed_bonus += productivity_module.speed_bonus * num_productivity_modules
-                                    speed_bonus = max(0.2, speed_bonus)
-
-                                    productivity_bonus = 1
-                                    productivity_bonus += recipe.productivity
-                                    productivity_bonus += recipe.machine.productivity
-                                    productivity_bonus += productivity_module.productivity_bonus * num_productivity_modules
-                                    productivity_bonus += quality_module.productivity_bonus * num_quality_modules
-                                    productivity_bonus += speed_module.productivity_bonus * effective_num_speed_modules
-                                    productivity_bonus = max(1.0, productivity_bonus)
-
-                                    recipe_amount = get_float(m[recipe_amounts[planet][ri][q][machine_q][num_quality_modules][num_productivity_modules][num_speed_modules][num_beacons]])
-                                    machine_count = recipe_amount * recipe.crafting_time / recipe.machine.qspeed[machine_q] / speed_bonus
-                                    if abs(machine_count) > eps:
-                                        s = ""
-                                        s+=("      ")
-                                        s+=(f"{qualityName(q)}: {recipe_amount:6.2f}")
-                                        prod_module_str = f"{itemName(productivity_module.name)}: {num_productivity_modules}"
-                                        if num_productivity_modules == 0:
-                                            prod_module_str = " " * len(prod_module_str)
-                                        quality_module_str = f"{itemName(quality_module.name)}: {num_quality_modules}"
-                                        if num_quality_modules == 0:
-                                            quality_module_str = " " * len(quality_module_str)
-                                        speed_module_str = f"{itemName(speed_module.name)}: {num_speed_modules}"
-                                        if num_speed_modules == 0:
-                                            speed_module_str = " " * len(speed_module_str)
-                                        beacon_str = f"{beacon.name}: {num_beacons}"
-                                        if num_beacons == 0:
-                                            beacon_str = " " * len(beacon_str)
-                                        s+=(f" ({prod_module_str}, {quality_module_str}, {speed_module_str}, {beacon_str})")
-                                        s+=("  => ")
-                                        if org_objective == "inputs_cost_matrix":
-                                            # print(planet, ri, q, machine_q, num_quality_modules, num_productivity_modules, num_speed_modules, num_beacons)
-                                            true_machine_count = get_float(m.evaluate(true_machines_per_recipe[planet][ri][q][machine_q][num_quality_modules][num_productivity_modules][num_speed_modules][num_beacons]))
-                                            machine_cost = true_machine_count * cost_matrix[planet][recipe.machine.underlying_item][machine_q] 
-                                            s+=(f"{machine_count:4.2f} ({true_machine_count}) {recipe.machine.name:}: ")
-                                        else:
-                                            s+=(f"{machine_count:4.2f} {recipe.machine.name:}: ")
-                                        s+=" + ".join( [f"{recipe_amount*resource_amount:.2f}/s {itemName(resource)}" for resource, resource_amount in recipe.inputs.items()])
-                                        s+=" -> "
-                                        s+=" + ".join( [f"{recipe_amount*resource_amount*productivity_bonus:.2f}/s {itemName(resource)}" for resource, resource_amount in recipe.outputs.items()])
-                                        
-                                        outdata["machines"][planet].append({
-                                            "recipe": recipe.name,
-                                            "machine": recipe.machine.name,
-                                            "machine_quality": qualityName(machine_q, padding=False),
-                                            "quality": qualityName(q, padding=False),
-                                            "modules": {
-                                                "quality": num_quality_modules,
-                                                "productivity": num_productivity_modules,
-                                                "speed": num_speed_modules,
-                                                "beacons": num_beacons,
-                                            },
-                                            "machine_count": machine_count,
-                                            "true_machine_count": true_machine_count,
-                                            "input": {resource: recipe_amount*resource_amount for resource, resource_amount in recipe.inputs.items()},
-                                            "output": {resource: recipe_amount*resource_amount*productivity_bonus for resource, resource_amount in recipe.outputs.items()},
-                                        })
-                                        
-                                        machine_str.append(s)
-                if machine_str:
-                    print(f"    {recipe.name} in {recipe.machine.name} ({qualityName(machine_q, padding=False)}): ")
-                    print("\n".join(machine_str))
-            
+        for (ri, machine_q), group in group_columns(columns[planet_columns], ["recipe", "machine_quality"]):
+            recipe = all_recipes[ri]
+            machine_str = []
+            for j in planet_columns[np.sort(group)]:
+                if abs(machine_counts[j]) <= eps:
+                    continue
+                col = columns[j]
+                q = int(col["quality"])
+                num_quality_modules = int(col["quality_modules"])
+                num_productivity_modules = int(col["productivity_modules"])
+                num_speed_modules = int(col["speed_modules"])
+                num_beacons = int(col["beacons"])
+                productivity_bonus = productivity_bonuses[j]
+                recipe_amount = x[j]
+                machine_count = machine_counts[j]
+                true_machine_count = get_float(m.evaluate(true_machines_per_recipe[j]))
+
+                s = ""
+                s+=("      ")
+                s+=(f"{qualityName(q)}: {recipe_amount:6.2f}")
+                prod_module_str = f"{itemName(productivity_module.name)}: {num_productivity_modules}"
+                if num_productivity_modules == 0:
+                    prod_module_str = " " * len(prod_module_str)
+                quality_module_str = f"{itemName(quality_module.name)}: {num_quality_modules}"
+                if num_quality_modules == 0:
+                    quality_module_str = " " * len(quality_module_str)
+                speed_module_str = f"{itemName(speed_module.name)}: {num_speed_modules}"
+                if num_speed_modules == 0:
+                    speed_module_str = " " * len(speed_module_str)
+                beacon_str = f"{beacon.name}: {num_beacons}"
+                if num_beacons == 0:
+                    beacon_str = " " * len(beacon_str)
+                s+=(f" ({prod_module_str}, {quality_module_str}, {speed_module_str}, {beacon_str})")
+                s+=("  => ")
+                if org_objective == "inputs_cost_matrix":
+                    s+=(f"{machine_count:4.2f} ({true_machine_count}) {recipe.machine.name:}: ")
+                else:
+                    s+=(f"{machine_count:4.2f} {recipe.machine.name:}: ")
+                s+=" + ".join( [f"{recipe_amount*resource_amount:.2f}/s {itemName(resource)}" for resource, resource_amount in recipe.inputs.items()])
+                s+=" -> "
+                s+=" + ".join( [f"{recipe_amount*resource_amount*productivity_bonus:.2f}/s {itemName(resource)}" for resource, resource_amount in recipe.outputs.items()])
+
+                outdata["machines"][planet].append({
+                    "recipe": recipe.name,
+                    "machine": recipe.machine.name,
+                    "machine_quality": qualityName(machine_q, padding=False),
+                    "quality": qualityName(q, padding=False),
+                    "modules": {
+                        "quality": num_quality_modules,
+                        "productivity": num_productivity_modules,
+                        "speed": num_speed_modules,
+                        "beacons": num_beacons,
+                    },
+                    "machine_count": float(machine_count),
+                    "true_machine_count": true_machine_count,
+                    "input": {resource: float(recipe_amount*resource_amount) for resource, resource_amount in recipe.inputs.items()},
+                    "output": {resource: float(recipe_amount*resource_amount*productivity_bonus) for resource, resource_amount in recipe.outputs.items()},
+                })
+
+                machine_str.append(s)
+            if machine_str:
+                print(f"    {recipe.name} in {recipe.machine.name} ({qualityName(machine_q, padding=False)}): ")
+                print("\n".join(machine_str))
     print()
     print(f"Total machines used ({get_float(m.evaluate(deepsum(machines))):.2f}):")
     for planet, planet_machines in machines.items():
         planet_str = []
-        for machine, quality_amounts in planet_machines.items():
+        for mi, quality_amounts in planet_machines.items():
+            machine = all_machines[mi]
             machine_str = []
             for quality, amount in sorted(quality_amounts.items(), key=lambda x: x[0]):
                 amount = get_float(m.evaluate(amount))
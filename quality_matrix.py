@@ -0,0 +1,678 @@
+import json
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from common import *
+from solver import *
+from linear_model import *
+from presolve import ConfigurationPruning, PresolvedProblem, RecipePruning, tighten_bounds
+from column_generation import GeneratedProblem, ProgressiveProblem, configuration_groups, quality_levels
+from scaling import ScaledProblem
+from decomposition import DantzigWolfeProblem, DecomposedProblem
+from compact_model import compact_selection
+from what_if import ParameterChanges, sweep
+from parametric import parametric_analysis
+from module_search import search_modules_per_goal
+
+# Same planning problem as quality_linear.py but built with linear_model.py
+# and handed to the solver as one matrix (builder = "matrix").
+
+
+def machine_counts(model: LinearModel, x: np.ndarray) -> np.ndarray:
+    # machines per column, the integer machine count if there is one
+    counts = model.machines_per_craft * x
+    link = model.columns["link"]
+    linked = (model.columns["kind"] == COLUMN_RECIPE) & (link >= 0)
+    counts[linked] = x[link[linked]]
+    return counts
+
+
+def availability_rows(model: LinearModel):
+    # module, beacon and machine limits of the constrained objective
+    usage = module_usage(model)
+    cols = model.columns
+    blocks, rhs = [], []
+    for name, available in [
+        ("speed", available_speed_modules),
+        ("quality", available_quality_modules),
+        ("productivity", available_prod_modules),
+        ("beacons", available_beacons),
+    ]:
+        # one row per planet
+        blocks.append(model.machine_matrix(cols["planet"].astype(int), usage[name], len(model_planets)))
+        rhs += [available[planet] for planet in model_planets]
+    recipe_cols = model.recipe_columns()
+    row_of_column = np.full(model.num_cols, -1)
+    machine_rhs = []
+    for (ri, planet, machine_q), group in group_columns(cols[recipe_cols], ["recipe", "planet", "machine_quality"]):
+        row_of_column[recipe_cols[group]] = len(machine_rhs)
+        machine_rhs.append(available_machines[model_planets[planet]][all_recipes[ri].machine.name][machine_q])
+    blocks.append(model.machine_matrix(row_of_column, np.ones(model.num_cols), len(machine_rhs)))
+    return sp.vstack(blocks, format="csr"), np.array(rhs + machine_rhs, dtype=float)
+
+
+def fix_recipe_counts(model: LinearModel, problem: MatrixProblem):
+    # after the preoptimization, each recipe may be used at most as much as before
+    recipe_cols = model.recipe_columns()
+    x = problem.x
+    zero, caps, usages = [], [], []
+    for _, group in group_columns(model.columns[recipe_cols], ["planet", "recipe", "quality"]):
+        group = recipe_cols[group]
+        current_usage = x[group].sum()
+        if current_usage < 1e-6:
+            zero.append(group)
+        else:
+            caps.append(group)
+            usages.append(current_usage)
+    if zero:
+        zero = np.concatenate(zero)
+        link = model.columns["link"][zero]
+        zero = np.concatenate([zero, link[link >= 0]])
+        problem.set_bounds(zero, 0, 0)
+    if caps:
+        rows = np.repeat(np.arange(len(caps)), [len(group) for group in caps])
+        cap_matrix = sp.csr_matrix((np.ones(len(rows)), (rows, np.concatenate(caps))), shape=(len(caps), model.num_cols))
+        problem.add_rows(cap_matrix, "<", usages)
+    problem.set_integer(np.flatnonzero(model.columns["kind"] == COLUMN_MACHINE))
+    if bound_propagation:
+        tighten_bounds(problem)
+
+
+def rounded_solution(model: LinearModel, x: np.ndarray) -> np.ndarray:
+    # the preoptimized solution with machine counts rounded up solves the integer problem
+    x = x.copy()
+    machine_cols = model.columns["kind"] == COLUMN_MACHINE
+    x[machine_cols] = np.ceil(x[machine_cols] - 1e-9)
+    return x
+
+
+def round_machine_counts(model: LinearModel, problem: MatrixProblem, polish_steps=None):
+    # LP rounding instead of the integer phase (integer_phase = "rounding"), only LP solves on a copy of the
+    # problem: the machine counts are fixed at the rounded up preoptimized ones, the recipe amounts solved
+    # again with them and each count lowered to what the new amounts need until nothing changes. Then single
+    # machines are taken from the most expensive counts while the objective improves. Only proven optimal LP
+    # solves count, any other status keeps the counts of the last one. The counts found are fixed in problem,
+    # so that its next check returns the rounded solution; without any it stays unchanged.
+    if polish_steps is None:
+        polish_steps = rounding_polish_steps
+    lower = problem.objective_value
+    machine_cols = np.flatnonzero(model.columns["kind"] == COLUMN_MACHINE)
+    recipe_cols = model.columns["link"][machine_cols]
+    lp = MatrixProblem(problem.A, problem.sense, problem.rhs, problem.c, problem.lb, problem.ub)
+    counts = np.ceil(problem.x[machine_cols] - 1e-9)
+    solves = 0
+
+    def solve(counts):
+        nonlocal solves
+        solves += 1
+        lp.set_bounds(machine_cols, counts, counts)
+        return is_optimal(lp.check())
+
+    best, solved = None, None
+    while solve(counts):
+        best, solved = lp.objective_value, counts.copy()
+        needed = np.ceil(model.machines_per_craft[recipe_cols] * lp.x[recipe_cols] - 1e-9)
+        if (needed >= counts).all():
+            break
+        counts = np.minimum(counts, needed)
+    if best is None:
+        print("Rounding found no proven optimal LP solution, the problem is left unchanged")
+        return
+    counts = solved
+    tolerance = 1e-9 * max(1, abs(best))
+
+    order = machine_cols[np.argsort(-problem.c[machine_cols])]
+    position = {j: i for i, j in enumerate(machine_cols)}
+    steps = 0
+    for j in order:
+        if steps >= polish_steps:
+            break
+        i = position[j]
+        if counts[i] == 0 or problem.c[j] <= 0:
+            continue
+        steps += 1
+        counts[i] -= 1
+        # a value below the LP bound of the preoptimization is a solver error, not an improvement
+        if solve(counts) and lower - tolerance <= lp.objective_value < best - tolerance:
+            best = lp.objective_value
+        else:
+            counts[i] += 1
+    problem.set_bounds(machine_cols, counts, counts)
+    print(f"Rounding: objective {best:.6g}, LP bound {lower:.6g}, gap {(best - lower) / max(abs(best), 1e-12):.1%} after {solves} LP solves")
+
+
+# cost functions of objective_setup, other models pass their own (see compact_model.py)
+model_costs = {
+    "input": input_cost,
+    "amortized": amortized_cost,
+    "machine": machine_cost,
+    "overhead": overhead_cost,
+    "space_travel": space_travel_cost,
+    "availability": availability_rows,
+}
+
+
+def objective_setup(model, objective_name=None, goal_list=None, lexicographic=False, costs=None):
+    # objective vector of objective_name for goal_list (the criteria in order of priority if lexicographic) and the
+    # rows it adds to the model as (matrix, sense, right hand side)
+    objective_name = objective if objective_name is None else objective_name
+    goal_list = goal if goal_list is None else goal_list
+    costs = model_costs if costs is None else costs
+
+    def cost(name):
+        if name not in costs:
+            raise ValueError(f"Objective {objective_name} is not supported by this model")
+        return costs[name](model)
+
+    goals = goal_rows(model, goal_list)
+    amounts = [g["amount"] for g in goal_list]
+    if objective_name == "inputs":
+        c = cost("input")
+        if lexicographic:
+            c = [c, cost("machine")] + ([cost("space_travel")] if reduce_space_travel else [])
+        return c, [(goals, ">", amounts)]
+    if objective_name == "inputs_cost_matrix":
+        return cost("amortized"), [(goals, ">", amounts)]
+    if objective_name == "overhead":
+        if len(goal_list) > 1:
+            raise ValueError("Only one goal allowed for objective overhead")
+        overhead = cost("overhead")
+        c = [overhead, cost("machine")] if lexicographic else overhead + cost("machine") * 10
+        return c, [(overhead[None, :], ">", goal_list[0]["amount"])]
+    if objective_name == "constrained":
+        production = -np.asarray(goals.sum(axis=0)).ravel()
+        c = [production, cost("machine")] if lexicographic else production + cost("machine") / 1e6
+        A, rhs = cost("availability")
+        return c, [(A, "<", rhs)]
+    raise ValueError(f"Unknown objective {objective_name}")
+
+
+def weighted_objective(model: LinearModel) -> np.ndarray:
+    # objective inputs, overhead or constrained with its criteria weighted into one vector
+    return objective_setup(model)[0]
+
+
+def objective_rows(model: LinearModel) -> list:
+    # matrices of the rows the objective inputs, overhead or constrained adds to the model
+    return [A for A, _, _ in objective_setup(model)[1]]
+
+
+def run_parametric(model: LinearModel, problem: MatrixProblem, added):
+    # parametric analysis of the goal amount or objective weight given by parametric in common.py
+    if parametric[0] == "goal":
+        _, index, low, high = parametric
+        row = added[0][index]
+
+        def set_parameter(t):
+            problem.set_rows([row], ">", t)
+
+        def slope():
+            if problem.duals is None:
+                raise ValueError("Parametric analysis of a goal needs the duals of the solution")
+            return problem.duals[row]
+        name = f"amount of {itemName(goal[index]['item'])}"
+    else:
+        kind, low, high = parametric
+        c = weighted_objective(model)
+        d = {"machines": machine_cost, "space_travel": space_travel_cost}[kind](model)
+
+        def set_parameter(t):
+            problem.set_objective(c + t * d)
+
+        def slope():
+            return float(d @ problem.x)
+        name = f"weight of {kind}"
+    return parametric_analysis(model, problem, set_parameter, slope, low, high, name)
+
+
+def integer_machine_counts(model: LinearModel, problem: MatrixProblem):
+    # after the preoptimization of inputs_cost_matrix, the next check gives whole machine counts
+    if integer_phase == "rounding":
+        round_machine_counts(model, problem)
+    else:
+        # make machine counts integers and fix recipe counts
+        start = rounded_solution(model, problem.x)
+        fix_recipe_counts(model, problem)
+        if isinstance(problem, PresolvedProblem):
+            problem.incumbent = start
+        problem.set_start(start)
+
+
+def explicit_cost(model: LinearModel, problem: MatrixProblem, planet, item, quality):
+    # input cost of exactly one item on the planet, None if it can not be made
+    eq = problem.add_rows(model.row_expression([model.balance_row(planet, item, quality)]), "=", 1)
+    res = problem.check()
+    # the row can not be removed, relax it instead
+    problem.set_rows(eq, ">", 0)
+    return problem.objective_value if is_satisfied(res) else None
+
+
+def dual_costs(model: LinearModel, problem: MatrixProblem, targets, tolerance=1e-7, chunk=64):
+    # input costs of one item of each target balance row from a single solve (cost_matrix_mode = "duals"), as
+    # row -> cost for the rows whose cost it proves. All targets are demanded at once, with an expensive artificial
+    # column per target so that items which can not be made do not make the solve infeasible. Its optimal basis
+    # stays dual feasible when only the right hand side changes, so for target r the basic solution with the
+    # demand of r alone (right hand side ranging, B z = b_r - N x_N) is optimal for it if it is primal feasible:
+    # within the bounds and row bounds of the problem, row r exactly 1 and the artificial columns at 0. The rows of
+    # A x - s = 0 carry the row bounds in s, so B has the basic columns of A and -e_i for every basic row i. Targets
+    # whose row is basic (not tight) or whose basic solution is infeasible are left to the explicit solves, as are
+    # all of them if the backend has no basis hook (only Gurobi and HiGHS have one).
+    c = input_cost(model)
+    n = model.num_cols
+    penalty = 1e6 * max(1, np.abs(c).max())
+    targets = np.asarray(targets, dtype=int)
+    master = MatrixProblem(problem.A, problem.sense, problem.rhs, c, problem.lb, problem.ub)
+    master.set_rows(targets, ">", problem.rhs[targets] + 1)
+    artificial = sp.csc_matrix((np.ones(len(targets)), (targets, np.arange(len(targets)))), shape=(master.num_rows, len(targets)))
+    master.add_columns(artificial, penalty, 0, np.inf)
+    if not is_optimal(master.check()):
+        return {}
+    basis = master.basis()
+    if basis is None:
+        print(f"Mode {mode} gives no basis, solving every item explicitly")
+        return {}
+    basic_cols, basic_rows = basis
+    m = master.num_rows
+    if basic_cols.sum() + basic_rows.sum() != m:
+        return {}
+    A = master.A.tocsc()
+    B = sp.hstack([A[:, basic_cols], -sp.identity(m, format="csc")[:, basic_rows]], format="csc")
+    try:
+        lu = spla.splu(B)
+    except RuntimeError:
+        # singular, the basis of the backend does not match the stored problem
+        return {}
+    # nonbasic columns stay at their values, nonbasic rows at their right hand side (0 for the other targets)
+    x = master.x.copy()
+    z0 = lu.solve(np.where(basic_rows, 0, problem.rhs) - A[:, ~basic_cols] @ x[~basic_cols])
+    lower = np.where(problem.sense == "<", -np.inf, problem.rhs)
+    upper = np.where(problem.sense == ">", np.inf, problem.rhs)
+    candidates = targets[~basic_rows[targets]]
+    costs = {}
+    for start in range(0, len(candidates), chunk):
+        block = candidates[start:start+chunk]
+        unit = np.zeros((m, len(block)))
+        unit[block, np.arange(len(block))] = 1
+        z = z0[:, None] + lu.solve(unit)
+        for i, row in enumerate(block):
+            xr = x.copy()
+            xr[basic_cols] = z[:basic_cols.sum(), i]
+            activity = problem.A @ xr[:n]
+            lo, up = lower.copy(), upper.copy()
+            lo[row] = up[row] = problem.rhs[row] + 1
+            row_tol = tolerance * (1 + np.abs(problem.rhs))
+            feasible = (xr[n:] <= tolerance).all() and (xr[:n] >= problem.lb - tolerance).all() and (xr[:n] <= problem.ub + tolerance).all() \
+                and (activity >= lo - row_tol).all() and (activity <= up + row_tol).all()
+            if feasible:
+                costs[row] = float(c @ xr[:n])
+    return costs
+
+
+def generate_cost_matrix(model: LinearModel, problem: MatrixProblem):
+    problem.set_objective(input_cost(model))
+    result = defaultdict(lambda: defaultdict(lambda: [1e10 for _ in range(max_quality+1)]))
+    keys = [(planet, item, quality) for planet in all_planets + ["space"] for item in compute_cost_for for quality in range(max_quality+1)]
+    known = {}
+    if cost_matrix_mode == "duals":
+        rows = {key: model.balance_row(*key) for key in keys}
+        targets = sorted({row for row in rows.values() if row is not None})
+        costs = dual_costs(model, problem, targets)
+        print(f"The basis of one solve proved {len(costs)} of {len(targets)} costs, solving the others explicitly")
+        known = {key: costs[row] for key, row in rows.items() if row in costs}
+        # items without a balance row can not be made
+        known.update({key: None for key, row in rows.items() if row is None})
+    for planet, item, quality in keys:
+        if (planet, item, quality) in known:
+            cost = known[(planet, item, quality)]
+        else:
+            cost = explicit_cost(model, problem, planet, item, quality)
+        if cost is not None:
+            result[planet][item][quality] = cost
+            print(f"{planetName(planet)}: {itemName(item)} ({qualityName(quality, padding=False)}) costs {result[planet][item][quality]}")
+        else:
+            print(f"{planetName(planet)}: {itemName(item)} ({qualityName(quality, padding=False)}) is unsolveable")
+    return result
+
+
+def solve_goal_batch(model: LinearModel, problem: MatrixProblem, goal_lists):
+    # objective inputs: one row per goal item of all lists, inactive rows have right hand side 0 and are implied by
+    # the balance rows, so each list only changes right hand sides and the backend solves again from its last basis.
+    # objective constrained: as in a single solve the goals are only the objective, which each list changes
+    keys = {}
+    for goals in goal_lists:
+        for g in goals:
+            keys.setdefault((g["item"], g["planet"], g["quality"]), len(keys))
+    goals = goal_rows(model, [{"item": item, "planet": planet, "quality": quality} for item, planet, quality in keys])
+    if objective == "constrained":
+        A, rhs = availability_rows(model)
+        problem.add_rows(A, "<", rhs)
+    else:
+        rows = problem.add_rows(goals, ">", 0)
+        problem.set_objective(input_cost(model))
+    results = []
+    for goals_of_list in goal_lists:
+        active = np.array([keys[(g["item"], g["planet"], g["quality"])] for g in goals_of_list], dtype=int)
+        list_goals = goals[active]
+        if objective == "constrained":
+            problem.set_objective(objective_setup(model, goal_list=goals_of_list)[0])
+        else:
+            rhs = np.zeros(len(rows))
+            np.maximum.at(rhs, active, [g["amount"] for g in goals_of_list])
+            problem.set_rows(rows, ">", rhs)
+        t0 = time.time()
+        res = problem.check()
+        print(f"Optimization took {time.time()-t0:.2f} seconds")
+        if is_satisfied(res):
+            report(model, problem, list_goals, objective, goals_of_list)
+            results.append(problem.objective_value)
+        else:
+            print("No solution found")
+            results.append(None)
+        print()
+
+    print("Batch results:")
+    for goals_of_list, value in zip(goal_lists, results):
+        name = ", ".join(f"{g['amount']} {itemName(g['item'])} ({qualityName(g['quality'], padding=False)})" for g in goals_of_list)
+        print(f"  {name}: {'no solution' if value is None else f'{value:.2f}'}")
+    return results
+
+
+def report(model: LinearModel, problem: MatrixProblem, goals: sp.csr_matrix, org_objective, goal_list=None):
+    # goal_list are the goals of the rows in goals, goal if not given
+    if goal_list is None:
+        goal_list = goal
+    x = problem.x
+    cols = model.columns
+    recipe_cols = model.recipe_columns()
+    counts = machine_counts(model, x)
+    print("Solution found")
+    print()
+    print("Producing:")
+    outname = []
+    outdata = {}
+    outdata["goal"] = []
+    goal_amounts = goals @ x
+    for amount, g in zip(goal_amounts, goal_list):
+        quantity = f"{amount:.2f}"
+        print(f"  {quantity} {itemName(g['item'])} at quality {qualityName(g['quality'], padding=False)}")
+        outname.append(f"{quantity}_{itemName(g['item'])}_{qualityName(g['quality'], padding=False)}")
+        outdata["goal"].append({
+            "quantity": float(amount),
+            "item": itemName(g['item']),
+            "quality": qualityName(g['quality'], padding=False),
+            "planet": planetName(g['planet']) if g['planet'] is not None else None,
+        })
+    outname = "__".join(outname)+".json"
+    print(f"Objective ({org_objective}): {problem.objective_value:.2f}")
+    if problem.objective_values is not None:
+        print(f"Objectives in order of priority: {', '.join(f'{value:.2f}' for value in problem.objective_values)}")
+
+    input_cols = np.flatnonzero(cols["kind"] == COLUMN_INPUT)
+    print()
+    print(f"Resources ({x[input_cols].sum():0.2f}):")
+    outdata["resources"] = {}
+    for planet in all_planets + ["space"]:
+        planet_cols = input_cols[cols["planet"][input_cols] == model_planets.index(planet)]
+        if abs(x[planet_cols].sum()) < eps:
+            continue
+        print(f"  {planetName(planet)}: ")
+        outdata["resources"][planet] = {}
+        for j in planet_cols:
+            if abs(x[j]) < eps:
+                continue
+            resource = model.items[cols["item"][j]]
+            print(f"    {itemName(resource)}: ")
+            print(f"      {qualityName(0)}: {x[j]:.2f}")
+            outdata["resources"][planet][resource] = {0: float(x[j])}
+
+    print()
+    print("Machines:")
+    outdata["machines"] = {}
+    active = recipe_cols[np.abs(model.machines_per_craft[recipe_cols] * x[recipe_cols]) > eps]
+    order = np.lexsort([cols[f][active] for f in ["beacons", "speed_modules", "productivity_modules", "quality_modules", "quality", "machine_quality", "recipe", "planet"]])
+    active = active[order]
+    for planet in all_planets + ["space"]:
+        planet_active = active[cols["planet"][active] == model_planets.index(planet)]
+        if len(planet_active) == 0:
+            continue
+        print(f"  {planetName(planet)}: ")
+        outdata["machines"][planet] = []
+        for (ri, machine_q), group in group_columns(cols[planet_active], ["recipe", "machine_quality"]):
+            recipe = all_recipes[ri]
+            machine_str = []
+            for j in planet_active[np.sort(group)]:
+                col = cols[j]
+                q = int(col["quality"])
+                num_quality_modules = int(col["quality_modules"])
+                num_productivity_modules = int(col["productivity_modules"])
+                num_speed_modules = int(col["speed_modules"])
+                num_beacons = int(col["beacons"])
+                recipe_amount = float(x[j])
+                productivity_bonus = float(model.productivity[j])
+                machine_count = recipe_amount * model.machines_per_craft[j]
+                true_machine_count = float(counts[j])
+                line = ""
+                line += ("      ")
+                line += (f"{qualityName(q)}: {recipe_amount:6.2f}")
+                prod_module_str = f"{itemName(productivity_module.name)}: {num_productivity_modules}"
+                if num_productivity_modules == 0:
+                    prod_module_str = " " * len(prod_module_str)
+                quality_module_str = f"{itemName(quality_module.name)}: {num_quality_modules}"
+                if num_quality_modules == 0:
+                    quality_module_str = " " * len(quality_module_str)
+                speed_module_str = f"{itemName(speed_module.name)}: {num_speed_modules}"
+                if num_speed_modules == 0:
+                    speed_module_str = " " * len(speed_module_str)
+                beacon_str = f"{beacon.name}: {num_beacons}"
+                if num_beacons == 0:
+                    beacon_str = " " * len(beacon_str)
+                line += (f" ({prod_module_str}, {quality_module_str}, {speed_module_str}, {beacon_str})")
+                line += ("  => ")
+                if col["link"] >= 0:
+                    line += (f"{machine_count:4.2f} ({true_machine_count}) {recipe.machine.name:}: ")
+                else:
+                    line += (f"{machine_count:4.2f} {recipe.machine.name:}: ")
+                line += " + ".join([f"{recipe_amount*resource_amount:.2f}/s {itemName(resource)}" for resource, resource_amount in recipe.inputs.items()])
+                line += " -> "
+                line += " + ".join([f"{recipe_amount*resource_amount*productivity_bonus:.2f}/s {itemName(resource)}" for resource, resource_amount in recipe.outputs.items()])
+
+                outdata["machines"][planet].append({
+                    "recipe": recipe.name,
+                    "machine": recipe.machine.name,
+                    "machine_quality": qualityName(machine_q, padding=False),
+                    "quality": qualityName(q, padding=False),
+                    "modules": {
+                        "quality": num_quality_modules,
+                        "productivity": num_productivity_modules,
+                        "speed": num_speed_modules,
+                        "beacons": num_beacons,
+                    },
+                    "machine_count": machine_count,
+                    "true_machine_count": true_machine_count,
+                    "input": {resource: recipe_amount*resource_amount for resource, resource_amount in recipe.inputs.items()},
+                    "output": {resource: recipe_amount*resource_amount*productivity_bonus for resource, resource_amount in recipe.outputs.items()},
+                })
+                machine_str.append(line)
+            print(f"    {recipe.name} in {recipe.machine.name} ({qualityName(machine_q, padding=False)}): ")
+            print("\n".join(machine_str))
+
+    # planet -> machine -> quality -> amount, machines in order of their first recipe
+    machines = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0)))
+    for j in recipe_cols[np.abs(counts[recipe_cols]) > eps]:
+        machine = all_recipes[cols["recipe"][j]].machine
+        machines[model_planets[cols["planet"][j]]][machine][int(cols["machine_quality"][j])] += counts[j]
+    print()
+    print(f"Total machines used ({counts[recipe_cols].sum():.2f}):")
+    for planet in all_planets + ["space"]:
+        planet_str = []
+        for machine in dict.fromkeys(recipe.machine for recipe in all_recipes):
+            machine_str = []
+            for quality, amount in sorted(machines[planet][machine].items(), key=lambda x: x[0]):
+                if amount > eps:
+                    machine_str.append(f"    {qualityName(quality)}: {amount:.2f}")
+            if machine_str:
+                planet_str.append(f"    {machine.name}: ")
+                planet_str += machine_str
+        if planet_str:
+            print(f"  {planetName(planet)}: ")
+            print("\n".join(planet_str))
+
+    usage = module_usage(model)
+    used = {name: counts[recipe_cols] * values[recipe_cols] for name, values in usage.items()}
+    recipe_planets = cols["planet"][recipe_cols]
+    print()
+    print(f"Total modules used ({used['speed'].sum() + used['quality'].sum() + used['productivity'].sum():0.2f}):")
+    for planet in all_planets + ["space"]:
+        on_planet = recipe_planets == model_planets.index(planet)
+        planet_used = {name: values[on_planet].sum() for name, values in used.items()}
+        if abs(sum(planet_used.values())) < eps:
+            continue
+        print(f"  {planetName(planet)} ({planet_used['speed'] + planet_used['quality'] + planet_used['productivity']:0.2f}): ")
+        print(f"    {itemName(speed_module.name)}: {planet_used['speed']:.2f}")
+        print(f"    {itemName(quality_module.name)}: {planet_used['quality']:.2f}")
+        print(f"    {itemName(productivity_module.name)}: {planet_used['productivity']:.2f}")
+        print(f"    {beacon.name}: {planet_used['beacons']:.2f}")
+
+    balance_rows = model.balance_rows()
+    leftover = model.A[balance_rows] @ x
+    rows = model.rows[balance_rows]
+    print()
+    print(f"Leftover resources ({leftover.sum():0.2f}):")
+    for planet in all_planets + ["space"]:
+        on_planet = rows["planet"] == model_planets.index(planet)
+        if abs(leftover[on_planet].sum()) < eps:
+            continue
+        print(f"  {planetName(planet)}: ")
+        planet_rows = np.flatnonzero(on_planet)
+        for item in np.unique(rows["item"][planet_rows]):
+            resource_str = []
+            item_rows = planet_rows[rows["item"][planet_rows] == item]
+            for i in item_rows[np.argsort(rows["quality"][item_rows])]:
+                if abs(leftover[i]) > eps:
+                    resource_str.append(f"      {qualityName(int(rows['quality'][i]))}: {leftover[i]:.2f}")
+            if resource_str:
+                print(f"    {itemName(model.items[item])}: ")
+                print("\n".join(resource_str))
+
+    if not os.path.exists("output"):
+        os.makedirs("output")
+    with open(f"output/{outname}", "w") as f:
+        json.dump(outdata, f, indent=4)
+    print()
+    print(f"Output written to output/{outname}")
+
+
+def pruning_uses_machines():
+    # lexicographic criteria after the first (machines, space travel) and a parametric weight of one of them need
+    # the machine usage in the dominance vectors even if the objective itself does not, None keeps what the
+    # objective needs
+    if objective_combination == "lexicographic" or (parametric is not None and parametric[0] in ["machines", "space_travel"]):
+        return True
+    return None
+
+
+def main():
+    tstart = time.time()
+    if module_search is not None:
+        search_modules_per_goal()
+        exit(0)
+    if goal_batch is not None and (objective not in ["inputs", "constrained"] or configuration_model == "compact"):
+        raise ValueError("goal_batch needs the objective inputs or constrained and configuration_model = \"enumerated\"")
+    recipes = RecipePruning(goals=None if goal_batch is None else [g for goals in goal_batch for g in goals])
+    recipes.report()
+    if configuration_model == "compact":
+        pruning = compact_selection(recipes)
+        if pruning is None:
+            print("No solution found")
+            exit(0)
+    else:
+        pruning = ConfigurationPruning(recipes=recipes, with_machines=pruning_uses_machines())
+    model, cached = cached_build_model(
+        (objective == "inputs_cost_matrix", recipes.cache_key(), pruning.cache_key()),
+        select_configurations=pruning,
+        select_recipes=recipes,
+        recipe_quality_cap=recipes.recipe_quality_cap,
+        item_quality_cap=recipes.item_quality_cap,
+    )
+    if not cached:
+        pruning.report()
+    print(f"Model with {model.num_cols} columns, {model.num_rows} rows and {model.A.nnz} nonzeros")
+    if configuration_columns == "generated":
+        problem = GeneratedProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub, *configuration_groups(model))
+    elif quality_resolution == "progressive" and objective != "generate_cost_matrix":
+        problem = ProgressiveProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub, quality_levels(model))
+    elif decomposition == "scc" and objective == "inputs":
+        problem = DecomposedProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    elif decomposition == "planets" and objective != "generate_cost_matrix":
+        problem = DantzigWolfeProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub, model.columns["planet"])
+    elif matrix_presolve and objective != "generate_cost_matrix":
+        # generate_cost_matrix solves one model many times, warm starts are worth more there
+        problem = PresolvedProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    elif matrix_scaling and objective != "generate_cost_matrix":
+        problem = ScaledProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    else:
+        problem = MatrixProblem(model.A, model.sense, model.rhs, np.zeros(model.num_cols), model.lb, model.ub)
+    if goal_batch is not None:
+        solve_goal_batch(model, problem, goal_batch)
+        exit(0)
+    goals = goal_rows(model, goal)
+    if objective == "generate_cost_matrix":
+        result = generate_cost_matrix(model, problem)
+        print(json.dumps(result, indent=4))
+        with open("cost_matrix.json", "w") as f:
+            json.dump(result, f, indent=4)
+        exit(0)
+
+    org_objective = objective
+    c, rows = objective_setup(model, lexicographic=objective_combination == "lexicographic")
+    added = [problem.add_rows(A, sense, rhs) for A, sense, rhs in rows]
+    if objective == "inputs_cost_matrix":
+        problem.set_objective(c)
+
+        # preoptimize the actual recipes used
+        print("Preoptimize recipe counts...")
+        t0 = time.time()
+        res = problem.check()
+        t1 = time.time()
+        print(f"Preoptimization took {t1-t0:.2f} seconds")
+        if not is_satisfied(res):
+            print("No solution found")
+            exit(0)
+
+        integer_machine_counts(model, problem)
+    if not isinstance(c, list):
+        problem.set_objective(c)
+    if what_if is not None and (org_objective not in ["inputs", "overhead", "constrained"] or isinstance(c, list)):
+        raise ValueError("what_if needs the objective inputs, overhead or constrained with weighted criteria")
+    if parametric is not None and (org_objective not in ["inputs", "overhead", "constrained"] or isinstance(c, list) or (parametric[0] == "goal" and org_objective != "inputs")):
+        raise ValueError("parametric needs the objective inputs, overhead or constrained with weighted criteria, a goal amount only inputs")
+
+    t0 = time.time()
+    print(f"Building solver problem took {t0-tstart:.2f} seconds")
+    print("Solving...")
+    t0 = time.time()
+    if isinstance(c, list):
+        res = problem.check_lexicographic(c, lexicographic_tolerance)
+    else:
+        res = problem.check()
+    t1 = time.time()
+    print(f"Optimization took {t1-t0:.2f} seconds")
+
+    if is_satisfied(res):
+        report(model, problem, goals, org_objective)
+        if what_if is not None:
+            print()
+            sweep(ParameterChanges(model, problem, weighted_objective, objective_rows, added), *what_if)
+        if parametric is not None:
+            print()
+            run_parametric(model, problem, added)
+    else:
+        print("No solution found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import numpy as np
+import scipy.sparse as sp
+
+from common import *
+from solver import *
+
+# Scaling of a matrix problem before it is handed to the solver (matrix_scaling).
+# Rows and columns (with the objective as one more row) are scaled by geometric means of their coefficients,
+# then the objective and, if no column is integer, the right hand side and bounds (goal amounts like 1/30) by
+# one factor each. All factors are powers of 2, so scaling and unscaling are exact. With x = C x' / rho the
+# scaled problem is
+#   min sigma (C c)' x'  s.t.  (R A C) x' ? rho R b,  rho lb / C <= x' <= rho ub / C
+# and the duals of the original rows are R y' / sigma.
+# Integer columns keep a column factor of 1 and the right hand side is not scaled if there are any.
+# Coefficients below negligible_coefficient of the largest one do not count for the factors and every factor stays
+# within 2^-max_scale_exponent .. 2^max_scale_exponent, otherwise a rounding residue like 1e-18 scales its row up
+# until it dominates, the same holds for the costs. The unscaled solution is checked against the original rows,
+# if it violates them or the scaled problem ends without a proven optimum or infeasibility (unbounded, unknown,
+# time limit) the problem is solved again without scaling.
+
+numerics_range_warning = 1e9 # ratio of the largest to the smallest coefficient that gets a warning
+numerics_value_warning = 1e9 # largest coefficient that gets a warning
+negligible_coefficient = 1e-9 # share of the largest coefficient below which a coefficient does not count for the factors
+max_scale_exponent = 20
+unscaled_tolerance = 1e-5 # violation of the original rows that the unscaled solution may have (relative to the right hand side)
+
+
+def clamp_scale(values):
+    return np.clip(values, 2.0 ** -max_scale_exponent, 2.0 ** max_scale_exponent)
+
+
+def power_of_two(values):
+    return np.exp2(np.round(np.log2(values)))
+
+
+def nonzero_range(values):
+    values = np.abs(values[np.isfinite(values)])
+    values = values[values > 0]
+    if len(values) == 0:
+        return None
+    return values.min(), values.max()
+
+
+def significant_range(values):
+    # nonzero_range without the values below negligible_coefficient of the largest one
+    span = nonzero_range(values)
+    if span is None:
+        return None
+    values = np.abs(values[np.isfinite(values)])
+    return nonzero_range(values[values >= negligible_coefficient * span[1]])
+
+
+def sparse_ranges(A: sp.csr_matrix, axis):
+    # smallest and largest absolute nonzero per row (axis=1) or column (axis=0), 1 if there is none
+    A = abs(A)
+    largest = np.asarray(A.max(axis=axis).todense()).ravel()
+    inverse = A.copy()
+    inverse.data = 1 / inverse.data
+    smallest = 1 / np.maximum(np.asarray(inverse.max(axis=axis).todense()).ravel(), 1e-300)
+    empty = largest == 0
+    largest[empty] = smallest[empty] = 1
+    return smallest, largest
+
+
+def coefficient_report(name, A, c, rhs, lb, ub):
+    lines = []
+    warnings = []
+    for label, values in [("Matrix", A.data), ("Objective", c), ("Bounds", np.concatenate([lb, ub])), ("RHS", rhs)]:
+        span = nonzero_range(values)
+        if span is None:
+            lines.append(f"  {label:9} empty")
+            continue
+        low, high = span
+        lines.append(f"  {label:9} [{low:.0e}, {high:.0e}]")
+        if high / low > numerics_range_warning:
+            warnings.append(f"  Warning: {label.lower()} coefficients span {high / low:.0e}, the solution may be inaccurate")
+        if high > numerics_value_warning:
+            warnings.append(f"  Warning: {label.lower()} coefficients up to {high:.0e}, consider a smaller penalty or cost")
+    print(f"Coefficient ranges {name}:")
+    print("\n".join(lines + warnings))
+
+
+class MatrixScaling:
+    def __init__(self, problem: MatrixProblem, passes=8):
+        A = sp.csr_matrix(problem.A)
+        significant = A.copy()
+        if significant.nnz:
+            significant.data[np.abs(significant.data) < negligible_coefficient * np.abs(significant.data).max()] = 0
+            significant.eliminate_zeros()
+        integer = problem.integer
+        row_scale = np.ones(A.shape[0])
+        col_scale = np.ones(A.shape[1])
+        for _ in range(passes):
+            scaled = sp.diags(row_scale) @ significant @ sp.diags(col_scale)
+            smallest, largest = sparse_ranges(scaled, axis=1)
+            row_scale = clamp_scale(row_scale / np.sqrt(smallest * largest))
+            # the objective counts as one more row for the columns
+            scaled = sp.diags(row_scale) @ significant @ sp.diags(col_scale)
+            c = problem.c * col_scale
+            span = significant_range(c)
+            if span:
+                scaled = sp.vstack([scaled, sp.csr_matrix(c / np.sqrt(span[0] * span[1]))], format="csr")
+            smallest, largest = sparse_ranges(scaled, axis=0)
+            col_scale = clamp_scale(col_scale / np.where(integer, 1, np.sqrt(smallest * largest)))
+        self.row_scale = power_of_two(row_scale)
+        self.col_scale = power_of_two(col_scale)
+
+        c = problem.c * self.col_scale
+        span = significant_range(c)
+        self.objective_scale = clamp_scale(1 / power_of_two(np.sqrt(span[0] * span[1]))) if span else 1
+        rhs = problem.rhs * self.row_scale
+        span = nonzero_range(np.concatenate([rhs, problem.lb / self.col_scale, problem.ub / self.col_scale]))
+        self.rhs_scale = clamp_scale(1 / power_of_two(np.sqrt(span[0] * span[1]))) if span and not integer.any() else 1
+
+        self.A = sp.diags(self.row_scale) @ A @ sp.diags(self.col_scale)
+        self.sense = problem.sense
+        self.rhs = self.rhs_scale * rhs
+        self.c = self.objective_scale * c
+        self.lb = self.rhs_scale * problem.lb / self.col_scale
+        self.ub = self.rhs_scale * problem.ub / self.col_scale
+        self.integer = integer
+        self.original = problem
+
+    def scale(self, x):
+        return x * self.rhs_scale / self.col_scale
+
+    def unscale(self, x):
+        return x * self.col_scale / self.rhs_scale
+
+    def unscale_duals(self, duals):
+        return duals * self.row_scale / self.objective_scale
+
+    def report(self):
+        p = self.original
+        coefficient_report("before scaling", p.A, p.c, p.rhs, p.lb, p.ub)
+        coefficient_report("after scaling", self.A, self.c, self.rhs, self.lb, self.ub)
+
+
+class ScaledProblem(MatrixProblem):
+    # scales on every check and solves the scaled problem, the arrays of MatrixProblem hold the original one
+    def check(self):
+        scaling = MatrixScaling(self)
+        scaling.report()
+        scaled = MatrixProblem(scaling.A, scaling.sense, scaling.rhs, scaling.c, scaling.lb, scaling.ub)
+        scaled.set_integer(np.arange(self.num_cols), scaling.integer)
+        if self.start is not None:
+            scaled.set_start(scaling.scale(self.start))
+        res = scaled.check()
+        self.x = self.duals = self.objective_value = None
+        if not is_optimal(res) and not is_infeasible(res):
+            print("The scaled problem has no proven optimum, solving it without scaling")
+            return super().check()
+        if is_satisfied(res):
+            x = scaling.unscale(scaled.x)
+            if not self.is_feasible(x, unscaled_tolerance):
+                print("The solution of the scaled problem violates the original one, solving it without scaling")
+                return super().check()
+            self.x = x
+            if scaled.duals is not None:
+                self.duals = scaling.unscale_duals(scaled.duals)
+            self.objective_value = float(self.c @ self.x)
+        return res
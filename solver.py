@@ -4,11 +4,19 @@ mode = "gurobi"
 # mode = "ortools"
 # mode = "minizinc"
 # mode = "pulp"
+# mode = "highs"
+
+# SOLVER_MODE in the environment overrides the mode above (the tests pin an installed backend with it)
+import os
+mode = os.environ.get("SOLVER_MODE", mode)
 
 no_output = False
 
 eps = 1e-6
 
+# Real() has a lower bound of 0 in every mode but z3, where x >= 0 has to be a constraint
+nonnegative_reals = mode != "z3"
+
 class Wrapper:
     def __init__(self, obj):
         self.obj = obj
@@ -48,6 +56,8 @@ if mode == "mip":
     s.minimize = minimize_objective
     s.check = lambda: s.optimize()
     sat = OptimizationStatus.OPTIMAL
+    optimal = OptimizationStatus.OPTIMAL
+    infeasible = OptimizationStatus.INFEASIBLE
     
     class Model:
         def __init__(self, s):
@@ -64,10 +74,44 @@ if mode == "mip":
             return self.evaluate(key)
         
     s.model = lambda: Model(s)
-        
+
+    import numpy as np
+    from mip import Model as MipModel, LinExpr
+
+    class MatrixBackend:
+        # rebuilt by MatrixProblem on every change
+        def __init__(self, problem):
+            self.model = MipModel(sense=MINIMIZE, solver_name=CBC)
+            self.model.verbose = 0 if no_output else 1
+            self.vars = [
+                self.model.add_var(lb=lb, ub=ub, obj=c, var_type=INTEGER if is_int else CONTINUOUS)
+                for lb, ub, c, is_int in zip(problem.lb, problem.ub, problem.c, problem.integer)
+            ]
+            A = problem.A
+            self.constrs = []
+            for i in range(A.shape[0]):
+                row = slice(A.indptr[i], A.indptr[i+1])
+                expr = LinExpr([self.vars[j] for j in A.indices[row]], A.data[row].tolist(), const=-problem.rhs[i], sense=problem.sense[i])
+                self.constrs.append(self.model.add_constr(expr))
+
+        def optimize(self):
+            return self.model.optimize()
+
+        def values(self):
+            return np.array([v.x for v in self.vars])
+
+        def duals(self):
+            return np.array([c.pi for c in self.constrs])
+
+        def set_start(self, x):
+            self.model.start = [(v, value) for v, value in zip(self.vars, x) if value != 0]
+
 elif mode == "z3":
     from z3 import *
     s = Optimize()
+    optimal = sat
+    infeasible = unsat
+    MatrixBackend = None
     
 elif mode == "gurobi":
     
@@ -106,6 +150,8 @@ elif mode == "gurobi":
     s.minimize = minimize_objective
     s.check = check
     sat = [2,9] # 2 = optimal, 9 = suboptimal
+    optimal = 2
+    infeasible = 3
     
     class Model:
         def __init__(self, s):
@@ -131,6 +177,82 @@ elif mode == "gurobi":
     
     s.Params.TimeLimit = 60 # in seconds
     s.Params.Heuristics = 0.5
+
+    import numpy as np
+    import gurobipy
+
+    class MatrixBackend:
+        def __init__(self, problem):
+            self.model = gurobipy.Model(env=env)
+            self.model.Params.TimeLimit = s.Params.TimeLimit
+            self.model.Params.Heuristics = s.Params.Heuristics
+            vtype = np.where(problem.integer, GRB.INTEGER, GRB.CONTINUOUS)
+            self.x = self.model.addMVar(problem.num_cols, lb=problem.lb, ub=problem.ub, obj=problem.c, vtype=vtype)
+            self.constrs = self.model.addMConstr(problem.A, self.x, problem.sense, problem.rhs).tolist()
+            self.model.ModelSense = GRB.MINIMIZE
+
+        def optimize(self):
+            self.model.optimize()
+            print("Status:", self.model.Status)
+            return self.model.Status
+
+        def values(self):
+            return self.x.X
+
+        def duals(self):
+            return np.array(self.model.getAttr("Pi", self.constrs))
+
+        def basis(self):
+            # basic columns and rows (basic slack), there is none after a MIP or barrier without crossover
+            try:
+                return np.array(self.x.VBasis) == 0, np.array(self.model.getAttr("CBasis", self.constrs)) == 0
+            except gurobipy.GurobiError:
+                return None
+
+        def set_objective(self, c):
+            self.x.Obj = c
+
+        def set_bounds(self, cols, lb, ub):
+            variables = self.x[cols].tolist()
+            self.model.setAttr("LB", variables, lb.tolist())
+            self.model.setAttr("UB", variables, ub.tolist())
+
+        def set_integer(self, cols, integer):
+            self.model.setAttr("VType", self.x[cols].tolist(), np.where(integer, GRB.INTEGER, GRB.CONTINUOUS).tolist())
+
+        def set_start(self, x):
+            self.x.Start = x
+
+        def set_objectives(self, objectives, tolerance):
+            # native multi-objective: higher priority first, each may lose tolerance (relative) for the later ones
+            self.model.NumObj = len(objectives)
+            for k, c in enumerate(objectives):
+                self.model.Params.ObjNumber = k
+                self.x.ObjN = c
+                self.model.ObjNPriority = len(objectives) - k
+                self.model.ObjNRelTol = tolerance
+
+        def set_coefficients(self, rows, cols, values):
+            variables = self.x.tolist()
+            for i, j, coef in zip(rows, cols, values):
+                self.model.chgCoeff(self.constrs[i], variables[j], coef)
+
+        def set_rows(self, rows, sense, rhs):
+            constrs = [self.constrs[i] for i in rows]
+            self.model.setAttr("Sense", constrs, sense.tolist())
+            self.model.setAttr("RHS", constrs, rhs.tolist())
+
+        def add_rows(self, A, sense, rhs):
+            self.constrs += self.model.addMConstr(A, self.x, sense, rhs).tolist()
+
+        def add_columns(self, A, c, lb, ub, integer):
+            vtype = np.where(integer, GRB.INTEGER, GRB.CONTINUOUS)
+            x = self.model.addMVar(A.shape[1], lb=lb, ub=ub, obj=c, vtype=vtype)
+            variables = x.tolist()
+            A = A.tocoo()
+            for i, j, coef in zip(A.row, A.col, A.data):
+                self.model.chgCoeff(self.constrs[i], variables[j], coef)
+            self.x = gurobipy.MVar.fromlist(self.x.tolist() + variables)
     
 elif mode == "ortools":
     from ortools.linear_solver import pywraplp 
@@ -143,6 +265,8 @@ elif mode == "ortools":
     s.minimize = s.Minimize
     s.check = lambda: s.Solve() 
     sat = pywraplp.Solver.OPTIMAL
+    optimal = pywraplp.Solver.OPTIMAL
+    infeasible = pywraplp.Solver.INFEASIBLE
     
     class Model:
         def __init__(self, s):
@@ -165,6 +289,69 @@ elif mode == "ortools":
             return self.access(key, lambda x: x.solution_value())
         
     s.model = lambda: Model(s)
+
+    import numpy as np
+
+    class MatrixBackend:
+        def __init__(self, problem):
+            # GLOP can not handle integers
+            self.mip = problem.integer.any()
+            self.solver = pywraplp.Solver.CreateSolver("CBC" if self.mip else "GLOP")
+            self.vars = [
+                self.solver.IntVar(lb, ub, "") if is_int else self.solver.NumVar(lb, ub, "")
+                for lb, ub, is_int in zip(problem.lb, problem.ub, problem.integer)
+            ]
+            self.set_objective(problem.c)
+            self.constrs = []
+            self.add_rows(problem.A, problem.sense, problem.rhs)
+
+        def optimize(self):
+            return self.solver.Solve()
+
+        def values(self):
+            return np.array([v.solution_value() for v in self.vars])
+
+        def duals(self):
+            return np.array([c.dual_value() for c in self.constrs])
+
+        def set_objective(self, c):
+            objective = self.solver.Objective()
+            for v, coef in zip(self.vars, c):
+                objective.SetCoefficient(v, coef)
+            objective.SetMinimization()
+
+        def set_bounds(self, cols, lb, ub):
+            for j, l, u in zip(cols, lb, ub):
+                self.vars[j].SetBounds(l, u)
+
+        def set_coefficients(self, rows, cols, values):
+            for i, j, coef in zip(rows, cols, values):
+                self.constrs[i].SetCoefficient(self.vars[j], coef)
+
+        def set_rows(self, rows, sense, rhs):
+            inf = self.solver.infinity()
+            for i, sen, b in zip(rows, sense, rhs):
+                self.constrs[i].SetBounds(b if sen != "<" else -inf, b if sen != ">" else inf)
+
+        def add_rows(self, A, sense, rhs):
+            inf = self.solver.infinity()
+            for i in range(A.shape[0]):
+                constr = self.solver.Constraint(rhs[i] if sense[i] != "<" else -inf, rhs[i] if sense[i] != ">" else inf)
+                for j, coef in zip(A.indices[A.indptr[i]:A.indptr[i+1]], A.data[A.indptr[i]:A.indptr[i+1]]):
+                    constr.SetCoefficient(self.vars[j], coef)
+                self.constrs.append(constr)
+
+        def add_columns(self, A, c, lb, ub, integer):
+            if integer.any() and not self.mip:
+                raise NotImplementedError("GLOP can not handle integers")
+            A = A.tocsc()
+            objective = self.solver.Objective()
+            for k in range(A.shape[1]):
+                v = self.solver.IntVar(lb[k], ub[k], "") if integer[k] else self.solver.NumVar(lb[k], ub[k], "")
+                objective.SetCoefficient(v, c[k])
+                for i, coef in zip(A.indices[A.indptr[k]:A.indptr[k+1]], A.data[A.indptr[k]:A.indptr[k+1]]):
+                    self.constrs[i].SetCoefficient(v, coef)
+                self.vars.append(v)
     
 elif mode == "minizinc":
     
@@ -177,10 +364,11 @@ elif mode == "minizinc":
         return name
     
     raise NotImplementedError("Not implemented yet")
+    MatrixBackend = None
 
 elif mode == "pulp":
     
-    from pulp import LpProblem, LpVariable, LpMinimize, LpStatus, value
+    from pulp import LpProblem, LpVariable, LpMinimize, LpStatus, value, LpAffineExpression, LpConstraint, LpConstraintGE, LpConstraintLE, LpConstraintEQ, LpInteger, LpContinuous
     
     s = LpProblem("factorio", LpMinimize)
     
@@ -200,6 +388,8 @@ elif mode == "pulp":
     s.check = lambda: LpStatus[s.solve()]
     
     sat = "Optimal"
+    optimal = "Optimal"
+    infeasible = "Infeasible"
     
     class Model:
         def __init__(self, s):
@@ -222,7 +412,177 @@ elif mode == "pulp":
             return self.access(key, value)
         
     s.model = lambda: Model(s)
-    
+
+    import numpy as np
+
+    class MatrixBackend:
+        # rebuilt by MatrixProblem on every change
+        def __init__(self, problem):
+            self.problem = LpProblem("factorio", LpMinimize)
+            self.vars = [
+                LpVariable(f"x{j}", lb, ub if ub != np.inf else None, LpInteger if is_int else LpContinuous)
+                for j, (lb, ub, is_int) in enumerate(zip(problem.lb, problem.ub, problem.integer))
+            ]
+            self.problem += LpAffineExpression([(v, c) for v, c in zip(self.vars, problem.c) if c != 0])
+            senses = {">": LpConstraintGE, "<": LpConstraintLE, "=": LpConstraintEQ}
+            A = problem.A
+            self.constrs = []
+            for i in range(A.shape[0]):
+                row = slice(A.indptr[i], A.indptr[i+1])
+                expr = LpAffineExpression([(self.vars[j], coef) for j, coef in zip(A.indices[row], A.data[row])])
+                constr = LpConstraint(expr, senses[problem.sense[i]], f"r{i}", problem.rhs[i])
+                self.problem += constr
+                self.constrs.append(constr)
+
+        def optimize(self):
+            return LpStatus[self.problem.solve()]
+
+        def values(self):
+            return np.array([v.varValue or 0 for v in self.vars])
+
+        def duals(self):
+            return np.array([c.pi if c.pi is not None else 0 for c in self.constrs])
+
+elif mode == "highs":
+
+    import highspy
+    import numpy as np
+
+    s = Wrapper(highspy.Highs())
+    if no_output:
+        s.silent()
+    time_limit = 60.0 # in seconds
+    s.setOptionValue("time_limit", time_limit)
+
+    def Real(name):
+        return s.addVariable(lb=0, name=name)
+
+    def Int(name):
+        return s.addVariable(lb=0, type=highspy.HighsVarType.kInteger, name=name)
+
+    def add_constraint(expr):
+        # addConstr rejects rows with tiny coefficients, addRow only warns and drops them
+        idxs, vals = expr.unique_elements()
+        s.addRow(expr.bounds[0], expr.bounds[1], len(idxs), idxs, vals)
+        return highspy.highs_cons(s.getNumRow() - 1, s.obj)
+
+    def minimize_objective(obj):
+        s.setObjective(obj, sense=highspy.ObjSense.kMinimize)
+
+    def check():
+        # the run time of a Highs instance adds up over all runs
+        s.setOptionValue("time_limit", s.getRunTime() + time_limit)
+        s.run()
+        print("Status:", s.modelStatusToString(s.getModelStatus()))
+        return s.getModelStatus()
+
+    s.add = add_constraint
+    s.minimize = minimize_objective
+    s.check = check
+    s.remove = s.removeConstr
+    sat = [highspy.HighsModelStatus.kOptimal, highspy.HighsModelStatus.kTimeLimit]
+    optimal = highspy.HighsModelStatus.kOptimal
+    infeasible = highspy.HighsModelStatus.kInfeasible
+
+    class Model:
+        def __init__(self, s):
+            # s.val copies the whole solution on every call
+            self.col_value = np.array(s.getSolution().col_value)
+
+        def access(self, e, f):
+            if isinstance(e, (int, float)):
+                return e
+            value = f(e)
+            return value
+
+        def value(self, e):
+            return highspy.Highs.internal_get_value(self.col_value, e)
+
+        def evaluate(self, expr):
+            return self.access(expr, self.value)
+
+        # make subscripting work
+        def __getitem__(self, key):
+            return self.access(key, self.value)
+
+    s.model = lambda: Model(s)
+
+    class MatrixBackend:
+        def __init__(self, problem):
+            self.highs = highspy.Highs()
+            if no_output:
+                self.highs.silent()
+            n = problem.num_cols
+            A = problem.A.tocsc()
+            self.highs.addRows(A.shape[0], *self.row_bounds(problem.sense, problem.rhs), 0, [], [], [])
+            self.highs.addCols(n, problem.c, problem.lb, problem.ub, A.nnz, A.indptr[:-1], A.indices, A.data)
+            if problem.integer.any():
+                self.set_integer(np.arange(n), problem.integer)
+
+        @staticmethod
+        def row_bounds(sense, rhs):
+            lower = np.where(sense == "<", -highspy.kHighsInf, rhs)
+            upper = np.where(sense == ">", highspy.kHighsInf, rhs)
+            return lower, upper
+
+        def optimize(self):
+            self.highs.setOptionValue("time_limit", self.highs.getRunTime() + time_limit)
+            self.highs.run()
+            status = self.highs.getModelStatus()
+            print("Status:", self.highs.modelStatusToString(status))
+            return status
+
+        def values(self):
+            return np.array(self.highs.getSolution().col_value)
+
+        def duals(self):
+            solution = self.highs.getSolution()
+            return np.array(solution.row_dual) if solution.dual_valid else None
+
+        def basis(self):
+            # basic columns and rows (basic slack)
+            basis = self.highs.getBasis()
+            if not basis.valid:
+                return None
+            basic = highspy.HighsBasisStatus.kBasic
+            return np.array([s == basic for s in basis.col_status]), np.array([s == basic for s in basis.row_status])
+
+        def set_objective(self, c):
+            self.highs.changeColsCost(len(c), np.arange(len(c), dtype=np.int32), np.asarray(c, dtype=float))
+
+        def set_bounds(self, cols, lb, ub):
+            self.highs.changeColsBounds(len(cols), np.asarray(cols, dtype=np.int32), np.asarray(lb, dtype=float), np.asarray(ub, dtype=float))
+
+        def set_integer(self, cols, integer):
+            integrality = np.where(integer, highspy.HighsVarType.kInteger, highspy.HighsVarType.kContinuous)
+            self.highs.changeColsIntegrality(len(cols), np.asarray(cols, dtype=np.int32), integrality)
+
+        def set_start(self, x):
+            solution = highspy.HighsSolution()
+            solution.col_value = list(x)
+            solution.value_valid = True
+            self.highs.setSolution(solution)
+
+        def set_coefficients(self, rows, cols, values):
+            for i, j, coef in zip(rows, cols, values):
+                self.highs.changeCoeff(int(i), int(j), float(coef))
+
+        def set_rows(self, rows, sense, rhs):
+            lower, upper = self.row_bounds(sense, rhs)
+            for i, l, u in zip(rows, lower, upper):
+                self.highs.changeRowBounds(int(i), l, u)
+
+        def add_rows(self, A, sense, rhs):
+            lower, upper = self.row_bounds(sense, rhs)
+            self.highs.addRows(A.shape[0], lower, upper, A.nnz, A.indptr[:-1], A.indices, A.data)
+
+        def add_columns(self, A, c, lb, ub, integer):
+            n = self.highs.getNumCol()
+            A = A.tocsc()
+            self.highs.addCols(A.shape[1], c, lb, ub, A.nnz, A.indptr[:-1], A.indices, A.data)
+            if integer.any():
+                self.set_integer(np.arange(n, n + A.shape[1]), integer)
+
 else:
     raise ValueError(f"Unknown mode {mode}")
 
@@ -239,4 +599,205 @@ def is_satisfied(res):
     if isinstance(sat, list):
         return res in sat
     else:
-        return res == sat
\ No newline at end of file
+        return res == sat
+
+def is_optimal(res):
+    # is_satisfied also accepts solutions at the time limit
+    return res == optimal
+
+def is_infeasible(res):
+    # proven infeasible, not unbounded or unknown
+    return res == infeasible
+
+#region Matrix models
+# bulk interface for models given as  minimize c x  s.t.  A x (sense) rhs,  lb <= x <= ub
+# (see linear_model.py), sense is one of "<", ">", "=" per row
+# backends may implement incremental updates (set_objective, set_bounds, ...),
+# otherwise they are rebuilt from the stored arrays on the next solve
+
+def matrix_entries(A, rows, cols):
+    # A[rows[k], cols[k]] as a flat array, scipy returns a sparse matrix instead if there are none
+    rows, cols = np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+    if len(rows) == 0:
+        return np.zeros(0)
+    return np.asarray(A.tocsr()[rows, cols]).ravel()
+
+
+class MatrixProblem:
+    def __init__(self, A, sense, rhs, c, lb, ub):
+        if MatrixBackend is None:
+            raise NotImplementedError(f"Matrix models are not supported in mode {mode}")
+        import scipy.sparse as sp
+        self.A = sp.csr_matrix(A)
+        self.sense = np.array(sense, dtype="U1")
+        self.rhs = np.array(rhs, dtype=float)
+        self.c = np.array(c, dtype=float)
+        self.lb = np.array(lb, dtype=float)
+        self.ub = np.array(ub, dtype=float)
+        self.integer = np.zeros(self.num_cols, dtype=bool)
+        self.backend = None
+        self.start = None
+        self.x = None
+        self.duals = None
+        self.objective_value = None
+        self.objective_values = None
+
+    @property
+    def num_rows(self):
+        return self.A.shape[0]
+
+    @property
+    def num_cols(self):
+        return self.A.shape[1]
+
+    def _update(self, hook, *args):
+        if self.backend is None:
+            return
+        if not hasattr(self.backend, hook):
+            self.backend = None
+            return
+        getattr(self.backend, hook)(*args)
+
+    def set_objective(self, c):
+        self.c = np.array(c, dtype=float)
+        self._update("set_objective", self.c)
+
+    def set_bounds(self, cols, lb, ub):
+        cols = np.asarray(cols)
+        self.lb[cols] = lb
+        self.ub[cols] = ub
+        self._update("set_bounds", cols, self.lb[cols], self.ub[cols])
+
+    def set_integer(self, cols, integer=True):
+        cols = np.asarray(cols)
+        self.integer[cols] = integer
+        self._update("set_integer", cols, self.integer[cols])
+
+    def set_rows(self, rows, sense, rhs):
+        rows = np.asarray(rows)
+        self.sense[rows] = sense
+        self.rhs[rows] = rhs
+        self._update("set_rows", rows, self.sense[rows], self.rhs[rows])
+
+    def set_coefficients(self, rows, cols, values):
+        # A[rows[k], cols[k]] = values[k], entries may be new to the structure of A
+        import scipy.sparse as sp
+        rows, cols = np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+        values = np.broadcast_to(np.array(values, dtype=float), len(rows))
+        if len(rows) == 0:
+            return
+        delta = values - matrix_entries(self.A, rows, cols)
+        self.A = sp.csr_matrix(self.A + sp.csr_matrix((delta, (rows, cols)), shape=self.A.shape))
+        self._update("set_coefficients", rows, cols, values)
+
+    def add_rows(self, A, sense, rhs):
+        import scipy.sparse as sp
+        A = sp.csr_matrix(A)
+        sense = np.broadcast_to(np.array(sense, dtype="U1"), A.shape[0])
+        rhs = np.broadcast_to(np.array(rhs, dtype=float), A.shape[0])
+        rows = np.arange(self.num_rows, self.num_rows + A.shape[0])
+        self.A = sp.vstack([self.A, A], format="csr")
+        self.sense = np.concatenate([self.sense, sense])
+        self.rhs = np.concatenate([self.rhs, rhs])
+        self._update("add_rows", A, sense, rhs)
+        return rows
+
+    def add_columns(self, A, c, lb, ub, integer=False):
+        # A has a row for every existing row, returns the indices of the new columns
+        import scipy.sparse as sp
+        A = sp.csc_matrix(A)
+        k = A.shape[1]
+        c, lb, ub = (np.broadcast_to(np.array(v, dtype=float), k) for v in (c, lb, ub))
+        integer = np.broadcast_to(np.array(integer, dtype=bool), k)
+        cols = np.arange(self.num_cols, self.num_cols + k)
+        self.A = sp.hstack([self.A, A], format="csr")
+        self.c = np.concatenate([self.c, c])
+        self.lb = np.concatenate([self.lb, lb])
+        self.ub = np.concatenate([self.ub, ub])
+        self.integer = np.concatenate([self.integer, integer])
+        self._update("add_columns", A, c, lb, ub, integer)
+        return cols
+
+    def set_start(self, x):
+        # a solution to start the integer search from, backends without a hook for it ignore it
+        self.start = None if x is None else np.array(x, dtype=float)
+        if self.backend is not None and self.start is not None and hasattr(self.backend, "set_start"):
+            self.backend.set_start(self.start)
+
+    def basis(self):
+        # (basic columns, basic rows) of the last solve as boolean masks, None if the backend has no hook for it
+        if self.backend is None or not hasattr(self.backend, "basis"):
+            return None
+        return self.backend.basis()
+
+    def is_feasible(self, x, tolerance=1e-6):
+        # whether x satisfies the rows, bounds and integrality up to the tolerance (relative to the right hand side)
+        activity = self.A @ x
+        tol = tolerance * (1 + np.abs(self.rhs))
+        feasible = np.where(self.sense == ">", activity >= self.rhs - tol, np.where(self.sense == "<", activity <= self.rhs + tol, np.abs(activity - self.rhs) <= tol)).all()
+        feasible &= (x >= self.lb - tolerance).all() and (x <= self.ub + tolerance).all()
+        feasible &= (np.abs(x[self.integer] - np.round(x[self.integer])) <= tolerance).all()
+        return bool(feasible)
+
+    def check(self):
+        if self.backend is None:
+            self.backend = MatrixBackend(self)
+            if self.start is not None and hasattr(self.backend, "set_start"):
+                self.backend.set_start(self.start)
+        res = self.backend.optimize()
+        self.x = self.duals = self.objective_value = None
+        if is_satisfied(res):
+            self.x = self.backend.values()
+            self.duals = None if self.integer.any() else self.backend.duals()
+            self.objective_value = float(self.c @ self.x)
+        return res
+
+    def check_lexicographic(self, objectives, tolerance=1e-6):
+        # minimize the objectives in order of priority, each only among the optima of the ones before up to
+        # a relative tolerance. Backends with native multi-objective support (set_objectives) get all at once,
+        # otherwise every objective is a warm started solve of the same problem, the earlier ones kept as rows
+        # that are relaxed again afterwards. Then c is the first objective again and objective_values holds the
+        # value of each.
+        objectives = [np.array(c, dtype=float) for c in objectives]
+        if type(self).check is MatrixProblem.check and hasattr(MatrixBackend, "set_objectives"):
+            self.set_objective(objectives[0])
+            res = self.check_native(objectives, tolerance)
+        else:
+            added = []
+            for k, c in enumerate(objectives):
+                self.set_objective(c)
+                res = self.check()
+                if not is_satisfied(res) or k == len(objectives) - 1:
+                    break
+                value = self.objective_value
+                added.extend(self.add_rows(c[None, :], "<", value + tolerance * max(1, abs(value))))
+                if self.integer.any():
+                    self.set_start(self.x)
+            self.set_objective(objectives[0])
+            # the rows can not be removed, relax them instead
+            if added:
+                self.set_rows(added, "<", np.inf)
+        self.objective_values = None
+        if is_satisfied(res):
+            self.objective_value = float(self.c @ self.x)
+            self.objective_values = [float(c @ self.x) for c in objectives]
+        return res
+
+    def check_native(self, objectives, tolerance):
+        if self.backend is None:
+            self.backend = MatrixBackend(self)
+            if self.start is not None and hasattr(self.backend, "set_start"):
+                self.backend.set_start(self.start)
+        self.backend.set_objectives(objectives, tolerance)
+        res = self.backend.optimize()
+        self.x = self.duals = self.objective_value = None
+        if is_satisfied(res):
+            self.x = self.backend.values()
+        # the next solve has a single objective again
+        self.backend = None
+        return res
+
+    def evaluate(self, expr):
+        # value of a vector or (sparse) matrix of coefficients over the columns
+        return expr @ self.x
+#endregion
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+# pinned to HiGHS instead of the configured mode, which may need a license
+os.environ["SOLVER_MODE"] = "highs"
+pytest.importorskip("highspy")
+import solver
+
+import common
+import linear_model
+import module_search
+import quality_matrix
+from what_if import ParameterChanges, sweep
+
+
+@pytest.fixture
+def inputs_problem(monkeypatch):
+    # model and solved problem of objective inputs for the configured goal, the sweeps restore what they change
+    for module in [module_search, quality_matrix]:
+        monkeypatch.setattr(module, "objective", "inputs")
+    monkeypatch.setattr(common, "beacon_sharedness", common.beacon_sharedness)
+    monkeypatch.setattr(linear_model, "beacon_sharedness", linear_model.beacon_sharedness)
+    model, problem = module_search.combination_problem()
+    added = [np.arange(model.num_rows, problem.num_rows)]
+    assert solver.is_satisfied(problem.check())
+    return model, problem, added, problem.objective_value
+
+
+def test_set_coefficients_without_changes(inputs_problem):
+    _, problem, _, _ = inputs_problem
+    A = problem.A.copy()
+    problem.set_coefficients([], [], [])
+    rows, cols = A.nonzero()
+    problem.set_coefficients(rows[:10], cols[:10], solver.matrix_entries(A, rows[:10], cols[:10]))
+    assert (problem.A != A).nnz == 0
+
+
+def test_sweep_with_unchanged_rows(inputs_problem):
+    model, problem, added, optimum = inputs_problem
+    changes = ParameterChanges(model, problem, quality_matrix.weighted_objective, quality_matrix.objective_rows, added)
+
+    # no row or objective term of objective inputs depends on beacon_sharedness
+    sharedness = common.beacon_sharedness
+    results = sweep(changes, "beacon_sharedness", [sharedness / 2, sharedness])
+    assert [value for _, value in results] == pytest.approx([optimum, optimum], rel=1e-6)
+
+    # the same productivity leaves every row as it is, more can only make the inputs cheaper
+    mining = common.item_productivity["mining"]
+    results = sweep(changes, "mining", [mining, mining + 0.5, mining])
+    assert results[0][1] == pytest.approx(optimum, rel=1e-6)
+    assert results[1][1] <= optimum * (1 + 1e-6)
+    assert results[2][1] == pytest.approx(optimum, rel=1e-6)
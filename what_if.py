@@ -0,0 +1,140 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import common
+import linear_model
+from common import *
+from solver import *
+from linear_model import *
+
+# What-if changes of research and beacon parameters on a built model (what_if in common.py).
+# Productivity research only enters the balance coefficients of the recipes that take their productivity from
+# item_productivity[key] (Recipe.productivity_research), beacon_sharedness only the modules and beacons counted
+# per machine. A change rewrites the affected entries of the model and passes only the entries that differ to
+# the problem, as well as those of the rows and the objective that the objective derives from the model.
+# Backends with incremental updates keep their basis, so the next solve is warm started. With matrix_presolve or
+# matrix_scaling every solve presolves or scales the changed problem again and the sweep runs cold.
+# The configurations were pruned for the original parameters. Productivity research scales the outputs and
+# beacon_sharedness the module and beacon usage of the configurations differently, so with any
+# prune_configurations (also "dominance") a configuration dropped then may be part of the optimum after a
+# change: the objectives of the sweep are then upper bounds, exact only with prune_configurations = None.
+
+
+def recipe_column_entries(model: LinearModel, recipes):
+    # (rows, columns, values) of the balance entries of the recipe columns of the given recipes that change with
+    # the current productivity of these recipes, model.productivity is updated on the way. Entries outside the
+    # structure of A belong to outputs dropped by the quality caps and stay dropped.
+    cols = model.columns
+    recipe_cols = model.recipe_columns()
+    recipe_cols = recipe_cols[np.isin(cols["recipe"][recipe_cols], recipes)]
+    entry_rows, entry_cols, entry_vals = [], [], []
+    for (ri, planet, q), group in group_columns(cols[recipe_cols], ["recipe", "planet", "quality"]):
+        group = recipe_cols[group]
+        recipe = all_recipes[ri]
+        accepts_quality, _ = recipe_quality_range(recipe)
+        configurations = np.stack([cols[name][group] for name in ["quality_modules", "productivity_modules", "speed_modules", "beacons"]], axis=1)
+        _, productivity_bonus, _ = configuration_effects(recipe, configurations)
+        model.productivity[group] = productivity_bonus
+        planet = model_planets[planet]
+        input_planet = recipe.forced_input_planet if recipe.forced_input_planet is not None else planet
+        output_planet = recipe.forced_output_planet if recipe.forced_output_planet is not None else planet
+        entries = [
+            (input_planet, resource, recipe.forced_input_quality.get(resource, q) if resource not in fluids else 0, np.full(len(group), -resource_amount))
+            for resource, resource_amount in recipe.inputs.items()
+        ] + [
+            (output_planet, resource, output_quality, amount)
+            for resource, output_quality, amount in output_coefficients(recipe, q, accepts_quality, productivity_bonus, model.quality_bonus[group])
+        ]
+        for resource_planet, resource, resource_quality, values in entries:
+            row = model.balance_row(resource_planet, resource, resource_quality)
+            if row is None:
+                continue
+            entry_rows.append(np.full(len(group), row))
+            entry_cols.append(group)
+            entry_vals.append(np.asarray(values, dtype=float))
+    if not entry_rows:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+    new = sp.csr_matrix((np.concatenate(entry_vals), (np.concatenate(entry_rows), np.concatenate(entry_cols))), shape=model.A.shape)
+    balance = np.zeros(model.num_rows)
+    balance[model.balance_rows()] = 1
+    selected = np.zeros(model.num_cols)
+    selected[recipe_cols] = 1
+    old = sp.diags(balance) @ model.A @ sp.diags(selected)
+    pattern = old.copy()
+    pattern.data[:] = 1
+    difference = (new.multiply(pattern) - old).tocoo()
+    changed = np.abs(difference.data) > 1e-12 * (1 + np.abs(matrix_entries(old, difference.row, difference.col)))
+    rows, columns = difference.row[changed], difference.col[changed]
+    return rows, columns, matrix_entries(old, rows, columns) + difference.data[changed]
+
+
+class ParameterChanges:
+    # objective(model) is the objective vector, objective_rows(model) the matrices of the rows the objective
+    # added to the model, in the order of added_rows (their indices in problem)
+    def __init__(self, model: LinearModel, problem: MatrixProblem, objective, objective_rows, added_rows):
+        self.model = model
+        self.problem = problem
+        self.objective = objective
+        self.objective_rows = objective_rows
+        self.added_rows = added_rows
+
+    def set_item_productivity(self, key, value):
+        if key not in item_productivity:
+            raise ValueError(f"Unknown productivity research {key}")
+        item_productivity[key] = value
+        recipes = [ri for ri, recipe in enumerate(all_recipes) if recipe.productivity_research == key]
+        for ri in recipes:
+            all_recipes[ri].productivity = value
+        rows, cols, values = recipe_column_entries(self.model, recipes)
+        if len(rows):
+            self.model.A = sp.csr_matrix(self.model.A + sp.csr_matrix((values - matrix_entries(self.model.A, rows, cols), (rows, cols)), shape=self.model.A.shape))
+        self.apply(rows, cols, values)
+
+    def set_beacon_sharedness(self, value):
+        # module_usage reads the copy of linear_model
+        common.beacon_sharedness = linear_model.beacon_sharedness = value
+        self.apply(np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0))
+
+    def set(self, parameter, value):
+        if parameter == "beacon_sharedness":
+            self.set_beacon_sharedness(value)
+        else:
+            self.set_item_productivity(parameter, value)
+
+    def apply(self, rows, cols, values):
+        # the model rows are the first rows of the problem
+        rows, cols, values = [rows], [cols], [values]
+        for added, A in zip(self.added_rows, self.objective_rows(self.model)):
+            A = sp.csr_matrix(A)
+            difference = (A - self.problem.A[added]).tocoo()
+            changed = difference.data != 0
+            rows.append(added[difference.row[changed]])
+            cols.append(difference.col[changed])
+            values.append(matrix_entries(A, difference.row[changed], difference.col[changed]))
+        rows, cols, values = np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+        self.problem.set_coefficients(rows, cols, values)
+        c = self.objective(self.model)
+        changed = np.flatnonzero(c != self.problem.c)
+        if len(changed):
+            self.problem.set_objective(c)
+        print(f"Changed {len(rows)} coefficients and {len(changed)} objective terms")
+
+
+def sweep(changes: ParameterChanges, parameter, values):
+    # objective at each value of the parameter, the parameter keeps the last value
+    if prune_configurations is not None:
+        print(f"The configurations were pruned ({prune_configurations}) for the original {parameter}, the objectives are upper bounds")
+    results = []
+    for value in values:
+        t0 = time.time()
+        changes.set(parameter, value)
+        res = changes.problem.check()
+        objective_value = changes.problem.objective_value if is_satisfied(res) else None
+        results.append((value, objective_value))
+        if objective_value is None:
+            print(f"{parameter} = {value}: no solution ({time.time() - t0:.3f} seconds)")
+        else:
+            print(f"{parameter} = {value}: objective {objective_value:.6g} ({time.time() - t0:.3f} seconds)")
+    return results